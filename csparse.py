@@ -22,10 +22,24 @@
 @author: Richard Lincoln
 """
 
+import gzip
+import hashlib
+import heapq
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+import tempfile
+from ast import literal_eval
+from collections import OrderedDict
+from itertools import islice
 from math import sqrt
 from random import randint
 from sys import stdout
 
+import numpy
+
 
 CS_VER = 1 # CSparse.py Version 1.0.0
 CS_SUBVER = 0
@@ -33,6 +47,9 @@ CS_SUBSUB = 0
 CS_DATE = "May 14, 2012" # CSparse.py release date
 CS_COPYRIGHT = "Copyright (C) Timothy A. Davis, 2006-2011"
 
+CS_INT = numpy.int64 # dtype of column pointers and row indices
+CS_FLOAT = numpy.float64 # dtype of numerical values
+
 
 class cs(object):
     """Matrix in compressed-column or triplet form.
@@ -45,11 +62,11 @@ class cs(object):
         #: number of columns
         self.n = 0
         #: column pointers (size n+1) or col indices (size nzmax)
-        self.p = []
+        self.p = ialloc(0)
         #: row indices, size nzmax
-        self.i = []
+        self.i = ialloc(0)
         #: numerical values, size nzmax
-        self.x = []
+        self.x = xalloc(0)
         #: # of entries in triplet matrix, -1 for compressed-col
         self.nz = 0
 
@@ -84,10 +101,22 @@ class csn(object):
         self.L = None
         #: U for LU, R for QR, not used for Cholesky
         self.U = None
-        #: partial pivoting for LU
+        #: partial pivoting for LU, row permutation for QR
         self.pinv = []
         #: beta [0..n-1] for QR
         self.B = []
+        #: row patterns of L and map of A into C=triu(PAP'), for Cholesky
+        #: refactorization, see cs_cholrefactor
+        self.rows = None
+        #: supernodes, map of A into C=tril(PAP') and positions of the
+        #: frontal matrices, for supernodal refactorization, see
+        #: cs_superrefactor
+        self.fronts = None
+        #: level schedules of the triangular solves with L and U, by name
+        #: and transposition, see csf.levels
+        self.levels = None
+        #: L' and U' by name, for solves with many right hand sides
+        self.T = None
 
 
 class csd(object):
@@ -110,13 +139,262 @@ class csd(object):
         self.cc = []
 
 
+class csb(object):
+    """Output of banded Cholesky or LU factorization, see cs_bandfactor.
+    """
+    def __init__(self):
+        #: Cholesky if true, LU otherwise
+        self.chol = False
+        #: order of the factorized matrix
+        self.n = 0
+        #: block size, at least the bandwidth
+        self.w = 0
+        #: number of diagonal blocks
+        self.nb = 0
+        #: diagonal blocks of L for Cholesky; for LU, the diagonal blocks of
+        #: U with those of the unit lower triangular L below their diagonal
+        self.D = None
+        #: subdiagonal blocks of L
+        self.L = None
+        #: two superdiagonal blocks of U for each block row, for LU
+        self.U = None
+        #: row permutation of each pair of block rows, for LU
+        self.piv = None
+
+
+class csf(object):
+    """Cholesky, LU, or QR factorization kept for repeated solves and for
+    refactorization of matrices with the same pattern.
+    """
+    def __init__(self):
+        #: 'chol', 'lu' or 'qr'
+        self.kind = None
+        #: partial pivoting tolerance for LU
+        self.tol = 1
+        #: number of rows of the factorized matrix
+        self.m = 0
+        #: number of columns of the factorized matrix
+        self.n = 0
+        #: column pointers of the analyzed pattern, size n+1
+        self.Ap = None
+        #: row indices of the analyzed pattern, size Ap[n]
+        self.Ai = None
+        #: symbolic analysis, of A' for an underdetermined QR
+        self.S = None
+        #: numeric factorization, None if the last refactor failed
+        self.N = None
+        #: dense workspace used by the solves
+        self.x = None
+        #: pattern workspace of the sparse solves, size 2*n
+        self.xi = None
+        #: row of the solution for each row of the solution of the
+        #: triangular systems, for the sparse solves
+        self.q = None
+        #: bandwidth of the permuted matrix if N is a banded factorization
+        #: (csb, see cs_bandfactor), None otherwise
+        self.band = None
+
+    def refactor(self, A):
+        """Numeric factorization of A, reusing the symbolic analysis. A must
+        have the pattern the factorization was created with.
+
+        @param A: column-compressed matrix
+        @return: true if successful, false on error
+        """
+        if not CS_CSC(A) or A.m != self.m or A.n != self.n:
+            return False # check inputs
+        n = A.n
+        if not numpy.array_equal(A.p[:n + 1], self.Ap) or \
+                not numpy.array_equal(A.i[:self.Ap[n]], self.Ai):
+            return False # pattern has changed
+        if self.band is not None:
+            S, chol = self.S, self.kind == 'chol'
+            C = cs_symperm(A, S.pinv, True) if chol else \
+                cs_permute(A, S.pinv, S.q, True) # C = A(p,p)
+            self.N = cs_bandfactor(C, self.band, chol)
+        elif self.kind == 'chol' and self.N is not None:
+            self.N = cs_superrefactor(A, self.S, self.N) # reuse the fronts
+        elif self.kind == 'chol':
+            self.N = cs_superchol(A, self.S)
+        elif self.kind == 'lu' and self.N is not None:
+            self.N = cs_lurefactor(A, self.S, self.N, self.tol) # reuse pivots
+        elif self.kind == 'lu':
+            self.N = cs_lu(A, self.S, self.tol)
+        elif self.m >= n:
+            self.N = cs_superqr(A, self.S)
+        else:
+            self.N = cs_superqr(cs_transpose(A, True), self.S) # QR of A'
+        return self.N is not None
+
+    def levels(self, name, trans):
+        """Level schedule of a triangular solve with N.L or N.U, computed on
+        first use and cached on N.
+
+        @param name: 'L' or 'U'
+        @param trans: schedule for the transposed solve if true
+        @return: level schedule, see cs_levels
+        """
+        N = self.N
+        if N.levels is None:
+            N.levels = {}
+        if (name, trans) not in N.levels:
+            N.levels[name, trans] = cs_levels(getattr(N, name), name == 'L', trans)
+        return N.levels[name, trans]
+
+    def _trisolve(self, name, trans, x):
+        """x = G\\x or x = G'\\x for G = N.L or N.U; level scheduled for a
+        vector, by columns of G or G' for a block so that each column costs a
+        single dot product with the rows of x
+        """
+        N = self.N
+        if x.ndim == 1:
+            return cs_levelsolve(self.levels(name, trans), x)
+        G, lo = getattr(N, name), name == 'L'
+        if not trans: # Gx=b is (G')'x=b
+            G, lo = self._transpose(name), not lo
+        return cs_ltsolve(G, x) if lo else cs_utsolve(G, x)
+
+    def _transpose(self, name):
+        """N.L' or N.U', computed on first use and cached on N
+        """
+        N = self.N
+        if N.T is None:
+            N.T = {}
+        if name not in N.T:
+            G = getattr(N, name)
+            N.T[name] = cs_transpose(G, True)
+            N.T[name].n = G.n # R' of QR has empty columns beyond n
+        return N.T[name]
+
+    def solve(self, b):
+        """Solves Ax=b (min ||Ax-b||_2 or the underdetermined system for QR,
+        see cs_qrsol); b is overwritten with the solution.
+
+        @param b: right hand side, size n (max(m,n) for QR), or an array with
+                  one right hand side per column
+        @return: true if successful, false on error
+        """
+        S, N = self.S, self.N
+        if N is None or b is None:
+            return False # check inputs
+        m, n = self.m, self.n
+        if self.kind == 'qr' and len(self.x) < N.L.m:
+            self.x = xalloc(N.L.m) # V has more rows than S.m2
+        x = self.x
+        if numpy.ndim(b) > 1:
+            x = numpy.zeros((len(x),) + b.shape[1:], CS_FLOAT) # block workspace
+        if self.band is not None:
+            cs_ipvec(S.pinv, b, x, n) # x = b(p)
+            cs_bandsolve(N, x) # x = A(p,p)\x
+            cs_pvec(S.pinv, x, b, n) # b(p) = x
+        elif self.kind == 'chol':
+            cs_ipvec(S.pinv, b, x, n) # x = P*b
+            self._trisolve('L', False, x) # x = L\x
+            self._trisolve('L', True, x) # x = L'\x
+            cs_pvec(S.pinv, x, b, n) # b = P'*x
+        elif self.kind == 'lu':
+            cs_ipvec(N.pinv, b, x, n) # x = b(p)
+            self._trisolve('L', False, x) # x = L\x
+            self._trisolve('U', False, x) # x = U\x
+            cs_ipvec(S.q, x, b, n) # b(q) = x
+        elif m >= n:
+            x[m:] = 0 # clear the fictitious rows
+            cs_ipvec(N.pinv, b, x, m) # x(0:m-1) = b(p(0:m-1)
+            for k in range(n): # apply Householder refl. to x
+                cs_happly(N.L, k, N.B[k], x)
+            self._trisolve('U', False, x) # x = R\x
+            cs_ipvec(S.q, x, b, n) # b(q(0:n-1)) = x(0:n-1)
+        else:
+            x[m:] = 0
+            cs_pvec(S.q, b, x, m) # x(q(0:m-1)) = b(0:m-1)
+            self._trisolve('U', True, x) # x = R'\x
+            for k in range(m - 1, -1, -1): # apply Householder refl. to x
+                cs_happly(N.L, k, N.B[k], x)
+            cs_pvec(N.pinv, x, b, n) # b(0:n-1) = x(p(0:n-1))
+        return True
+
+    def solve_many(self, B):
+        """Solves AX=B for all columns of B at once; B is overwritten with the
+        solution.
+
+        @param B: 2-D array with one right hand side per column
+        @return: true if successful, false on error
+        """
+        if B is None or numpy.ndim(B) != 2:
+            return False # check inputs
+        return self.solve(B)
+
+    def spsolve(self, B, k=0):
+        """Solves Ax=b for a sparse b = B(:,k) in time proportional to the
+        number of floating-point operations, using cs_spsolve on the factors.
+        The workspaces are kept between calls. Sparse Cholesky and LU only.
+
+        @param B: column-compressed matrix with n rows
+        @param k: use kth column of B
+        @return: x as an n-by-1 column-compressed matrix with sorted row
+                 indices, null on error
+        """
+        S, N, n = self.S, self.N, self.n
+        if N is None or self.kind == 'qr' or self.band is not None:
+            return None # check inputs
+        if not CS_CSC(B) or B.m != n:
+            return None # check inputs
+        if B.x is None:
+            return None
+        if k < 0 or k >= B.n:
+            return None
+        chol = self.kind == 'chol'
+        if self.xi is None:
+            self.xi = ialloc(2 * n) # get workspace
+            self.q = cs_pinv(S.pinv, n) if chol else S.q
+        pinv = S.pinv if chol else N.pinv
+        xi, x, q = self.xi, self.x, self.q
+        p = slice(B.p[k], B.p[k + 1])
+        Bi = B.i[p] if pinv is None else pinv[B.i[p]]
+        C = _cs_column(n, Bi, B.x[p]) # C = P*b
+        U = self._transpose('L') if chol else N.U
+        for G, lo in ((N.L, True), (U, False)):
+            top = cs_spsolve(G, C, 0, xi, x, None, lo) # x = G\C
+            if top < 0:
+                return None
+            Ci = numpy.array(xi[top:n])
+            C = _cs_column(n, Ci, x[Ci])
+        if q is not None:
+            C.i = q[C.i] # x(q) = C
+        order = numpy.argsort(C.i)
+        C.i, C.x = C.i[order], C.x[order]
+        return C
+
+    def spsolve_many(self, B):
+        """Solves AX=B for sparse B, one column at a time with spsolve.
+
+        @param B: column-compressed matrix with n rows
+        @return: X as a column-compressed matrix, null on error
+        """
+        if not CS_CSC(B):
+            return None # check inputs
+        cols = []
+        for k in range(B.n):
+            C = self.spsolve(B, k)
+            if C is None:
+                return None
+            cols.append(C)
+        X = cs_spalloc(self.n, B.n, 0, True, False) # allocate result
+        X.p[1:] = numpy.cumsum([C.p[1] for C in cols])
+        if X.p[B.n] > 0:
+            X.i = numpy.concatenate([C.i for C in cols])
+            X.x = numpy.concatenate([C.x for C in cols])
+            X.nzmax = max(len(X.i), 1)
+        return X
+
+
 def CS_CSC(A):
     """Returns true if A is in column-compressed form, false otherwise.
 
     @param A: sparse matrix
     @return: true if A is in column-compressed form, false otherwise
     """
-    return A != None and A.nz == -1
+    return A is not None and A.nz == -1
 
 
 def CS_TRIPLET(A):
@@ -125,7 +403,7 @@ def CS_TRIPLET(A):
     @param A: sparse matrix
     @return: true if A is in triplet form, false otherwise
     """
-    return A != None and A.nz >= 0
+    return A is not None and A.nz >= 0
 
 
 def CS_FLIP(i):
@@ -169,26 +447,27 @@ def cs_add(A, B, alpha, beta):
     @param beta: scalar beta
     @return: C=alpha*A + beta*B, null on error
     """
-    nz = 0
     if not CS_CSC(A) or not CS_CSC(B):
         return None # check inputs
     if A.m != B.m or A.n != B.n:
         return None
-    m, anz, n, Bp, Bx = A.m, A.p[A.n], B.n, B.p, B.x
-    bnz = Bp[n]
-    w = ialloc(m) # get workspace
-    values = A.x != None and Bx != None
-    x = xalloc(m) if values else None # get workspace
-    C = cs_spalloc(m, n, anz + bnz, values, False) # allocate result
-    Cp, Ci, Cx = C.p, C.i, C.x
-    for j in range(n):
-        Cp[j] = nz # column j of C starts here
-        nz = cs_scatter(A, j, alpha, w, x, j + 1, C, nz) # alpha*A(:,j)
-        nz = cs_scatter(B, j, beta, w, x, j + 1, C, nz) # beta*B(:,j)
-        if values:
-            for p in range(Cp[j], nz):
-                Cx[p] = x[Ci[p]];
-    Cp[n] = nz # finalize the last column of C
+    m, n = A.m, A.n
+    Ap, Bp = numpy.asarray(A.p[:n + 1]), numpy.asarray(B.p[:n + 1])
+    values = A.x is not None and B.x is not None
+    cols = numpy.concatenate((numpy.repeat(numpy.arange(n), numpy.diff(Ap)),
+                              numpy.repeat(numpy.arange(n), numpy.diff(Bp))))
+    order = numpy.argsort(cols, kind='mergesort') # A(:,j) then B(:,j)
+    rows = numpy.concatenate((A.i[:Ap[n]], B.i[:Bp[n]]))[order]
+    x = None
+    if values:
+        x = numpy.concatenate((alpha * numpy.asarray(A.x[:Ap[n]]),
+                               beta * numpy.asarray(B.x[:Bp[n]])))[order]
+    cols, rows, x = _cs_sumdupl(cols[order], rows, x, m) # as cs_scatter
+    C = cs_spalloc(m, n, len(rows), values, False) # allocate result
+    C.p[1:] = numpy.cumsum(numpy.bincount(cols, minlength=n))
+    C.i[:len(rows)] = rows
+    if values:
+        C.x[:len(rows)] = x
     return C # success; free workspace, return C
 
 
@@ -226,10 +505,10 @@ def cs_amd(order, A):
     if not CS_CSC(A) or order <= 0 or order > 3:
         return None # check
     AT = cs_transpose(A, False) # compute A'
-    if AT == None:
+    if AT is None:
         return None
     m, n = A.m, A.n
-    dense = max(16, 10 * int(sqrt(n))) # find dense threshold
+    dense = max(16, int(10 * sqrt(n))) # find dense threshold
     dense = min(n - 2, dense)
     if order == 1 and n == m:
         C = cs_add(A, AT, 0, 0) # C = A+A'
@@ -248,19 +527,20 @@ def cs_amd(order, A):
                 p+=1
         ATp[m] = p2 # finalize AT
         A2 = cs_transpose(AT, False) # A2 = AT'
-        C = cs_multiply(AT, A2) if A2 != None else None # C=A'*A with no dense rows
+        C = cs_multiply(AT, A2) if A2 is not None else None # C=A'*A with no dense rows
         A2 = None
     else:
         C = cs_multiply(AT, A) # C=A'*A
     AT = None
-    if C == None:
+    if C is None:
         return None
     cs_fkeep(C, _cs_diag(), None) # drop diagonal entries
-    Cp = C.p
+    C.x = None # only the pattern of C is used
+    Cp = _cs_list(C.p[:n + 1]) # n-vector, for the scalar loops
     cnz = Cp[n]
-    P = ialloc(n + 1) # allocate result
-    W = ialloc(8 * (n + 1)) # get workspace
-    t = cnz + cnz / 5 + 2 * n # add elbow room to C
+    P = [0] * (n + 1) # allocate result
+    W = [0] * (8 * (n + 1)) # get workspace
+    t = cnz + cnz // 5 + 2 * n # add elbow room to C
     cs_sprealloc(C, t)
     len = W
     nv = W
@@ -321,8 +601,10 @@ def cs_amd(order, A):
 
         # --- Select node of minimum approximate degree --------------------
         k = -1
-        while mindeg < n and k == -1:
+        while mindeg < n:
             k = head[head_offset + mindeg]
+            if k != -1:
+                break
             mindeg += 1
         if next[next_offset + k] != -1:
             last[next[next_offset + k]] = -1
@@ -410,7 +692,7 @@ def cs_amd(order, A):
                     w[w_offset + e] = degree[degree_offset + e] + wnvi # 1st time e seen in scan 1
                 p += 1
         # --- Degree update ------------------------------------------------
-        for pk in range(pk2): # scan2: degree update
+        for pk in range(pk1, pk2): # scan2: degree update
             i = Ci[pk] # consider node i in Lk
             p1 = Cp[i]
             p2 = p1 + elen[elen_offset + i] - 1
@@ -432,7 +714,7 @@ def cs_amd(order, A):
             elen[elen_offset + i] = pn - p1 + 1 # elen[elen_offset+i] = |Ei|
             p3 = pn
             p4 = p1 + len[i]
-            for p in range(p2 + 1, p < p4): # prune edges in Ai
+            for p in range(p2 + 1, p4): # prune edges in Ai
                 j = Ci[p]
                 nvj = nv[nv_offset + j]
                 if nvj <= 0:
@@ -553,7 +835,565 @@ def cs_amd(order, A):
         if Cp[i] == -1:
             k = cs_tdfs(i, k, head, head_offset, next, next_offset, P, 0, w, w_offset)
         i+=1
-    return P
+    return numpy.array(P, dtype=CS_INT)
+
+
+# Symbolic analysis report.
+
+class css_report(object):
+    """Predicted size and cost of a factorization, see cs_report.
+    """
+    def __init__(self):
+        #: 'chol', 'lu' or 'qr'
+        self.kind = None
+        #: number of columns of the analyzed matrix
+        self.n = 0
+        #: # entries in L for Cholesky, in V for QR, bound on L for LU
+        self.lnz = 0
+        #: # entries in R for QR, bound on U for LU, 0 for Cholesky
+        self.unz = 0
+        #: true if lnz and unz are exact, false if they are upper bounds
+        self.exact = True
+        #: # floating-point operations, an upper bound for LU
+        self.flops = 0.0
+        #: bytes of the factors
+        self.nbytes = 0
+        #: bytes of the workspace of the numeric factorization
+        self.work = 0
+        #: peak memory of the numeric factorization, nbytes + work
+        self.peak = 0
+        #: largest # entries in a column of L (Cholesky) or V (QR, LU)
+        self.maxcol = 0
+        #: height of the elimination tree, in nodes
+        self.height = 0
+        #: largest # nodes at the same depth of the elimination tree
+        self.width = 0
+        #: # leaves of the elimination tree
+        self.leaves = 0
+        #: # trees in the elimination forest
+        self.roots = 0
+
+
+def cs_analyze(kind, order, A, cache=None):
+    """Orders and analyzes A as cs_factor does, and reports the predicted
+    size and cost of the factorization, see cs_report.
+
+    @param kind: 'chol' (only the upper triangular part of A is used), 'lu'
+                 (A square) or 'qr' (of A' if A has fewer rows than columns)
+    @param order: ordering method to use, see cs_schol and cs_sqr
+    @param A: column-compressed matrix
+    @param cache: css_cache to look the analysis up in, or None
+    @return: (S, R) with S the symbolic analysis and R the css_report, null
+             on error
+    """
+    if not CS_CSC(A) or kind not in ('chol', 'lu', 'qr'):
+        return None # check inputs
+    if kind != 'qr' and A.m != A.n:
+        return None
+    if kind == 'qr' and A.m < A.n:
+        A = cs_transpose(A, False) # analyze A'
+    if kind == 'chol':
+        S = cs_schol(order, A, cache)
+    else:
+        S = cs_sqr(order, A, kind == 'qr', cache)
+    R = cs_report(kind, A, S)
+    return (S, R) if R is not None else None
+
+
+def cs_report(kind, A, S):
+    """Predicts the size and cost of a factorization from its symbolic
+    analysis, before the numeric factorization. The counts are exact for
+    Cholesky and for QR as computed by cs_qr. cs_sqr does not predict the
+    fill of LU, so the report uses the QR analysis of A(:,q) instead, whose
+    V and R hold the patterns of L and U for any row pivoting; the counts
+    are then upper bounds.
+
+    @param kind: 'chol', 'lu' or 'qr'
+    @param A: column-compressed matrix given to cs_schol or cs_sqr
+    @param S: symbolic analysis of A for kind
+    @return: css_report, null on error
+    """
+    if not CS_CSC(A) or S is None or kind not in ('chol', 'lu', 'qr'):
+        return None # check inputs
+    m, n = A.m, A.n
+    ib, xb = numpy.dtype(CS_INT).itemsize, numpy.dtype(CS_FLOAT).itemsize
+    R = css_report() # allocate result
+    R.kind, R.n = kind, n
+    if kind == 'chol':
+        if S.cp is None or S.parent is None:
+            return None
+        parent = numpy.asarray(S.parent[:n])
+        c = numpy.diff(numpy.asarray(S.cp[:n + 1], CS_INT)) # col counts of L
+        R.lnz = int(c.sum())
+        R.flops = float((c.astype(CS_FLOAT) ** 2).sum())
+        R.nbytes = (n + 1) * ib + R.lnz * (ib + xb)
+        R.work = int(c.max()) ** 2 * xb + n * xb if n > 0 else 0 # largest front
+        R.maxcol = int(c.max()) if n > 0 else 0
+    else:
+        C = cs_permute(A, None, S.q, False) if S.q is not None else A # A(:,q)
+        if kind == 'qr':
+            if S.parent is None or S.cp is None:
+                return None
+            parent, rc = S.parent, S.cp
+        else:
+            parent = cs_etree(C, True) # etree of C'*C
+            post = cs_post(parent, n)
+            rc = cs_counts(C, parent, post, True) # row counts of R
+            if rc is None:
+                return None
+        T = css()
+        T.parent = parent
+        vc = ialloc(n)
+        _cs_vcount(C, T, vc) # column counts of V
+        parent = numpy.asarray(parent[:n])
+        vc, rc = vc.astype(CS_FLOAT), numpy.asarray(rc[:n], CS_FLOAT)
+        R.lnz, R.unz = int(vc.sum()), int(rc.sum())
+        R.maxcol = int(vc.max()) if n > 0 else 0
+        R.nbytes = 2 * (n + 1) * ib + (R.lnz + R.unz) * (ib + xb)
+        if kind == 'qr':
+            R.flops = float(4 * (vc * rc).sum()) # Householder k on R(k,:)
+            R.nbytes += n * xb + T.m2 * ib # beta and pinv
+            R.work = int((vc * rc).max()) * xb + T.m2 * xb if n > 0 else 0
+        else:
+            R.exact = False
+            R.flops = float(((vc - 1) * (2 * rc - 1)).sum()) # L(:,k) and rank-1 update
+            R.nbytes += n * ib # pinv
+            R.work = n * xb + 2 * n * ib # x and xi of cs_lu
+    R.peak = R.nbytes + R.work
+    depth = numpy.zeros(n, CS_INT)
+    for j in range(n - 1, -1, -1): # parents come after their children
+        depth[j] = depth[parent[j]] + 1 if parent[j] >= 0 else 1
+    if n > 0:
+        R.height = int(depth.max())
+        R.width = int(numpy.bincount(depth).max())
+        R.roots = int(numpy.count_nonzero(parent < 0))
+        R.leaves = n - len(numpy.unique(parent[parent >= 0]))
+    return R
+
+
+# Process pools.
+
+CS_SHM = '/dev/shm' if os.path.isdir('/dev/shm') else None # in-memory directory for cs_parchol
+
+_cs_pools = {} # pools of cs_autoorder and cs_parchol, by number of processes
+
+def _cs_pool(nproc):
+    """pool of nproc worker processes, created on first use and kept for the
+    following calls until cs_pool_close; None in a daemonic process, which
+    cannot start one
+    """
+    if multiprocessing.current_process().daemon:
+        return None
+    if nproc not in _cs_pools:
+        _cs_pools[nproc] = multiprocessing.Pool(nproc)
+    return _cs_pools[nproc]
+
+def cs_pool_close():
+    """Closes the pools of worker processes that cs_autoorder and cs_parchol
+    keep between calls when no pool is passed to them, and waits for their
+    processes to exit. Later calls start new pools.
+
+    @return: true
+    """
+    while _cs_pools:
+        pool = _cs_pools.popitem()[1]
+        pool.close()
+        pool.join()
+    return True
+
+
+# Automatic ordering selection.
+
+CS_AUTO_MIN = 20000 # matrices with fewer entries are analyzed in one process
+
+def _cs_autotask(args):
+    """_cs_predict in a worker process
+    """
+    return _cs_predict(*args)
+
+def _cs_predict(kind, order, A):
+    """(nnz, flops) predicted by the symbolic analysis of A with the
+    given ordering, from the column counts of L (Cholesky) or R (QR, and LU
+    where nnz(V+R) bounds nnz(L+U)); None if the ordering fails
+    """
+    if kind == 'chol':
+        S = cs_schol(order, A)
+        if S is None:
+            return None
+        c = numpy.diff(numpy.asarray(S.cp[:A.n + 1], CS_FLOAT))
+        return S.lnz, float((c * c).sum())
+    if kind == 'lu':
+        q = _cs_ordering(order, A, False) # column ordering for LU
+        if order > 0 and q is None:
+            return None
+        A = cs_permute(A, None, q, False) if q is not None else A
+        order = 0
+    S = cs_sqr(order, A, True)
+    if S is None:
+        return None
+    c = numpy.asarray(S.cp[:A.n], CS_FLOAT)
+    return S.lnz + S.unz, float((c * c).sum())
+
+def cs_autoorder(kind, A, flops=False, nproc=None, pool=None):
+    """Selects the ordering with the least predicted fill. Each candidate
+    ordering (all of 0 to 6 that apply) is run through the symbolic
+    analysis (cs_etree, cs_post and cs_counts), by a pool of processes for
+    matrices of at least CS_AUTO_MIN entries, and the one with the fewest
+    predicted entries in the factors or floating-point operations is kept.
+    For LU, candidates are compared by the QR analysis of A(:,q), whose V+R
+    holds the pattern of L+U.
+
+    @param kind: 'chol' (only the upper triangular part of A is used),
+                 'lu' or 'qr'
+    @param A: column-compressed matrix
+    @param flops: minimize the floating-point operations if true, the
+                  entries in the factors otherwise
+    @param nproc: number of processes, number of CPUs if None
+    @param pool: multiprocessing pool to use; if None, a pool of nproc
+                 processes is created on first use and kept in this module
+                 for later calls with the same nproc, also by cs_parchol,
+                 until cs_pool_close. In a daemonic process, which cannot
+                 start a pool, the orderings are analyzed in this process
+    @return: (order, S), the selected ordering and its symbolic analysis
+             (see cs_schol and cs_sqr), null on error
+    """
+    if not CS_CSC(A) or kind not in ('chol', 'lu', 'qr'):
+        return None # check inputs
+    if kind != 'qr' and A.m != A.n:
+        return None
+    orders = (0, 1, 4, 6) if kind == 'chol' else (0, 1, 2, 3, 4, 5, 6)
+    if nproc is None:
+        nproc = multiprocessing.cpu_count()
+    if pool is None and nproc > 1 and A.p[A.n] >= CS_AUTO_MIN:
+        pool = _cs_pool(nproc) # None in a daemonic process
+    if pool is None or A.p[A.n] < CS_AUTO_MIN:
+        results = [_cs_predict(kind, order, A) for order in orders]
+    else:
+        results = pool.map(_cs_autotask, [(kind, order, A) for order in orders], 1)
+    results = [(r[1], r[0], order) if flops else (r[0], r[1], order)
+               for order, r in zip(orders, results) if r is not None]
+    if not results:
+        return None
+    order = min(results)[2] # ties go to the simplest ordering
+    if kind == 'chol':
+        S = cs_schol(order, A)
+    else:
+        S = cs_sqr(order, A, kind == 'qr')
+    return (order, S) if S is not None else None
+
+
+# Banded factorization.
+
+def _cs_banded(kind, A, S):
+    """reverse Cuthill-McKee analysis for a banded factorization in
+    cs_factor: css with pinv and q = p, and the bandwidth of A(p,p); null
+    if the dense blocks of cs_bandfactor would take more memory than the
+    sparse factorization predicted from its symbolic analysis S
+    """
+    chol, n = kind == 'chol', A.n
+    P = cs_rcm(A)
+    if P is None:
+        return None
+    T = css()
+    T.pinv, T.q = cs_pinv(P, n), P
+    Ap, Ai = numpy.asarray(A.p[:n + 1]), numpy.asarray(A.i[:A.p[n]])
+    Aj = numpy.repeat(numpy.arange(n), numpy.diff(Ap))
+    if chol:
+        Ai, Aj = Ai[Ai <= Aj], Aj[Ai <= Aj] # triu(A)
+    d = numpy.abs(T.pinv[Ai] - T.pinv[Aj]) # distances to the diagonal of A(p,p)
+    w = int(d.max()) if len(d) else 0 # bandwidth of A(p,p)
+    b = max(w, 1)
+    nt = (n + b - 1) // b + 2 # blocks of cs_bandfactor
+    nbytes = (2 if chol else 4) * nt * b * b * numpy.dtype(CS_FLOAT).itemsize
+    R = cs_report(kind, A, S) # predicted size of the sparse factors
+    if R is None or nbytes > R.nbytes:
+        return None
+    return T, w
+
+def cs_bandfactor(A, w, chol):
+    """Banded Cholesky or LU factorization. Split into dense w-by-w blocks,
+    a matrix of bandwidth at most w is block tridiagonal; the factorization
+    works on these blocks with dense matrix products, and keeps the
+    triangular diagonal blocks of the factors for dense triangular solves.
+    LU uses partial pivoting, which adds a second superdiagonal block to U.
+
+    @param A: column-compressed matrix, square, with all entries within w
+              of the diagonal; only the upper triangular part is used for
+              Cholesky
+    @param w: bandwidth, see cs_bandwidth
+    @param chol: Cholesky if true (A symmetric positive definite), LU
+                 otherwise
+    @return: csb factorization, null on error
+    """
+    if not CS_CSC(A) or A.m != A.n or A.x is None or w < 0:
+        return None # check inputs
+    n, Ap = A.n, A.p
+    i = numpy.asarray(A.i[:Ap[n]])
+    j = numpy.repeat(numpy.arange(n), numpy.diff(Ap[:n + 1]))
+    x = numpy.asarray(A.x[:Ap[n]])
+    if chol: # A = triu(A) + triu(A,1)'
+        up = i <= j
+        i, j, x = i[up], j[up], x[up]
+        off = i < j
+        i, j = numpy.concatenate((i, j[off])), numpy.concatenate((j, i[off]))
+        x = numpy.concatenate((x, x[off]))
+    if len(i) > 0 and numpy.abs(i - j).max() > w:
+        return None # band too narrow
+    w = max(w, 1)
+    nb = (n + w - 1) // w
+    nt = nb + 2 # two empty blocks at the end keep every step alike
+    D = numpy.zeros((nt, w, w), CS_FLOAT) # D[k] = A(k,k), by blocks
+    L = numpy.zeros((nt, w, w), CS_FLOAT) # L[k] = A(k+1,k)
+    U = numpy.zeros((nt, w, w), CS_FLOAT) # U[k] = A(k,k+1)
+    bi, bj, ri, rj = i // w, j // w, i % w, j % w
+    for blocks, k, s in ((D, bi, bi == bj), (L, bj, bi > bj), (U, bi, bi < bj)):
+        numpy.add.at(blocks, (k[s], ri[s], rj[s]), x[s])
+    pad = numpy.arange(n, nt * w)
+    D[pad // w, pad % w, pad % w] = 1 # identity beyond the last row
+    B = csb() # allocate result
+    B.chol, B.n, B.w, B.nb = chol, n, w, nb
+    if chol:
+        for k in range(nb):
+            if k > 0:
+                D[k] -= L[k - 1].dot(L[k - 1].T) # A(k,k) - L(k,k-1)*L(k,k-1)'
+            try:
+                D[k] = numpy.linalg.cholesky(D[k]) # L(k,k)
+            except numpy.linalg.LinAlgError:
+                return None # not positive definite
+            L[k] = numpy.linalg.solve(D[k], L[k].T).T # L(k+1,k) = A(k+1,k)/L(k,k)'
+        B.D, B.L = D, L
+        return B
+    B.U = numpy.zeros((nt, w, 2 * w), CS_FLOAT)
+    B.piv = numpy.zeros((nt, 2 * w), CS_INT)
+    for k in range(nb):
+        G = numpy.zeros((2 * w, 3 * w), CS_FLOAT) # block rows k and k+1
+        G[:w, :w], G[:w, w:2 * w] = D[k], U[k]
+        G[w:, :w], G[w:, w:2 * w], G[w:, 2 * w:] = L[k], D[k + 1], U[k + 1]
+        p = numpy.arange(2 * w)
+        for c in range(w):
+            r = c + numpy.argmax(numpy.abs(G[c:, c])) # partial pivoting
+            if G[r, c] == 0:
+                return None # singular
+            if r != c:
+                G[[c, r]], p[[c, r]] = G[[r, c]], p[[r, c]]
+            G[c + 1:, c] /= G[c, c]
+            G[c + 1:, c + 1:] -= numpy.outer(G[c + 1:, c], G[c, c + 1:])
+        D[k + 1], U[k + 1] = G[w:, w:2 * w], G[w:, 2 * w:] # Schur complement
+        B.piv[k] = p
+        D[k] = G[:w, :w] # L(k,k) below the diagonal, U(k,k) on and above
+        L[k] = G[w:, :w]
+        B.U[k] = G[:w, w:]
+    B.D, B.L = D, L
+    return B
+
+
+def cs_bandsolve(B, x):
+    """Solves Ax=b with a banded factorization of A; x is overwritten with
+    the solution.
+
+    @param B: csb factorization, see cs_bandfactor
+    @param x: size n, or n-by-k for k right hand sides, b on input, x on
+              output
+    @return: true if successful, false on error
+    """
+    if B is None or x is None:
+        return False # check inputs
+    n, w, nb = B.n, B.w, B.nb
+    rest = x.shape[1:]
+    y = numpy.zeros(((nb + 2) * w,) + rest, CS_FLOAT)
+    y[:n] = x[:n]
+    y = y.reshape((nb + 2, w) + rest) # y[k] is block k of x
+    if B.chol:
+        for k in range(nb): # y = L\y
+            if k > 0:
+                y[k] -= B.L[k - 1].dot(y[k - 1])
+            y[k] = numpy.linalg.solve(B.D[k], y[k])
+        for k in range(nb - 1, -1, -1): # y = L'\y
+            y[k] = numpy.linalg.solve(B.D[k].T, y[k] - B.L[k].T.dot(y[k + 1]))
+    else:
+        eye = numpy.eye(w)
+        for k in range(nb): # y = L\(P*y)
+            z = y[k:k + 2].reshape((2 * w,) + rest)[B.piv[k]]
+            y[k] = numpy.linalg.solve(numpy.tril(B.D[k], -1) + eye, z[:w])
+            y[k + 1] = z[w:] - B.L[k].dot(y[k])
+        for k in range(nb - 1, -1, -1): # y = U\y
+            z = y[k + 1:k + 3].reshape((2 * w,) + rest)
+            y[k] = numpy.linalg.solve(numpy.triu(B.D[k]), y[k] - B.U[k].dot(z))
+    x[:n] = y.reshape(((nb + 2) * w,) + rest)[:n]
+    return True
+
+
+def cs_bandwidth(A):
+    """Bandwidth and profile of a sparse matrix. The profile is the number
+    of positions in the envelope of A: from the first entry of each row up
+    to the diagonal, and from the first entry of each column down to the
+    diagonal.
+
+    @param A: column-compressed matrix
+    @return: (kl, ku, profile) with kl the largest i-j and ku the largest
+             j-i over the entries A(i,j), both at least 0; null on error
+    """
+    if not CS_CSC(A):
+        return None # check inputs
+    m, n, Ap = A.m, A.n, A.p
+    i = numpy.asarray(A.i[:Ap[n]])
+    j = numpy.repeat(numpy.arange(n), numpy.diff(Ap[:n + 1]))
+    kl = max(int((i - j).max()), 0) if len(i) > 0 else 0
+    ku = max(int((j - i).max()), 0) if len(i) > 0 else 0
+    first = numpy.arange(m) # first column of each row, up to the diagonal
+    numpy.minimum.at(first, i, j)
+    top = numpy.arange(n) # first row of each column, up to the diagonal
+    numpy.minimum.at(top, j, i)
+    profile = int((numpy.arange(m) - first).sum() + (numpy.arange(n) - top).sum())
+    return kl, ku, profile
+
+
+# Solve Ax=b using the block triangular form.
+
+def cs_btfsol(order, A, b, tol):
+    """Solves Ax=b, where A is square and nonsingular, by permuting A to
+    block upper triangular form with cs_dmperm. Only the diagonal blocks
+    are factorized, with cs_lu (singletons are divided by directly), and
+    the off-diagonal blocks are used in a block back substitution, so there
+    is no fill between blocks. b overwritten with solution.
+
+    @param order: ordering method to use for each diagonal block (0 to 7)
+    @param A: column-compressed matrix
+    @param b: size n, or n-by-k for k right hand sides, b on input, x on
+              output
+    @param tol: partial pivoting tolerance
+    @return: true if successful, false on error
+    """
+    if not CS_CSC(A) or b is None or A.m != A.n:
+        return False # check inputs
+    n = A.n
+    D = cs_dmperm(A, 0) # block triangular form
+    if D is None or D.rr[3] < n:
+        return False # structurally singular
+    C = cs_permute(A, cs_pinv(D.p, n), D.q, True) # C = A(p,q)
+    Cp, Ci, Cx = numpy.asarray(C.p), numpy.asarray(C.i), numpy.asarray(C.x)
+    x = numpy.asarray(b, dtype=CS_FLOAT)[numpy.asarray(D.p)] # x = b(p)
+    shape = (-1,) + (1,) * (x.ndim - 1) # broadcast over the k columns
+    for k in range(D.nb - 1, -1, -1):
+        f, l = D.r[k], D.r[k + 1] # block k is C(f:l-1,f:l-1)
+        p = slice(Cp[f], Cp[l])
+        rows = Ci[p]
+        cols = numpy.repeat(numpy.arange(f, l), numpy.diff(Cp[f:l + 1]))
+        diag = rows >= f # rows of later blocks are all zero
+        if l - f == 1:
+            d = Cx[p][diag].sum()
+            if d == 0:
+                return False # singular
+            x[f] /= d
+        else:
+            B = cs_spalloc(l - f, l - f, 0, True, False) # B = C(f:l-1,f:l-1)
+            B.p[1:] = numpy.cumsum(numpy.bincount(cols[diag] - f, minlength=l - f))
+            B.i, B.x = rows[diag] - f, Cx[p][diag]
+            B.nzmax = max(B.p[l - f], 1)
+            if not cs_lusol(order, B, x[f:l], tol):
+                return False
+        off = ~diag # x(0:f-1) -= C(0:f-1,f:l-1)*x(f:l-1)
+        numpy.subtract.at(x, rows[off], Cx[p][off].reshape(shape) * x[cols[off]])
+    cs_ipvec(D.q, x, b, n) # b(q) = x
+    return True
+
+
+# Cache of symbolic analyses.
+
+CS_CACHE_BUDGET = 64 << 20 # default memory budget of a css_cache, in bytes
+
+
+def _cs_pattern_key(A, order, kind):
+    """fingerprint of the pattern of A and the analysis done on it
+    """
+    n = A.n
+    h = hashlib.sha1(repr((int(A.m), int(n), int(order), kind)).encode('ascii'))
+    p = numpy.ascontiguousarray(A.p[:n + 1], numpy.dtype(CS_INT).newbyteorder('<'))
+    h.update(p.tobytes())
+    h.update(numpy.ascontiguousarray(A.i[:p[n]], p.dtype).tobytes())
+    return h.hexdigest()
+
+
+def _cs_nbytes(S):
+    """memory used by the arrays of a symbolic analysis
+    """
+    return sum(numpy.asarray(a).nbytes for a in
+               (S.pinv, S.q, S.parent, S.cp, S.leftmost) if a is not None)
+
+
+class css_cache(object):
+    """Symbolic analyses keyed by the pattern of the matrix, the ordering and
+    the kind of analysis, with least-recently-used eviction from memory and
+    an optional directory of binary files shared by several processes. Pass
+    it to cs_schol, cs_sqr or cs_factor. Cached analyses are shared by the
+    callers and must not be modified.
+    """
+    def __init__(self, budget=CS_CACHE_BUDGET, path=None):
+        #: memory budget, in bytes
+        self.budget = budget
+        #: directory of the persistent tier, None for memory only
+        self.path = path
+        #: analyses in memory, least recently used first
+        self.entries = OrderedDict()
+        #: memory used by the analyses in memory, in bytes
+        self.nbytes = 0
+        #: # of lookups found in memory
+        self.hits = 0
+        #: # of lookups found in the persistent tier
+        self.disk_hits = 0
+        #: # of lookups not found
+        self.misses = 0
+        #: # of analyses evicted from memory
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns the analysis for key, None if not cached.
+        """
+        S = self.entries.pop(key, None)
+        if S is not None:
+            self.entries[key] = S # most recently used
+            self.hits += 1
+            return S
+        if self.path is not None:
+            try:
+                S = cs_mmap(os.path.join(self.path, key + '.csb'))
+            except (IOError, OSError, ValueError):
+                S = None
+            if S is not None:
+                self.disk_hits += 1
+                self._insert(key, S)
+                return S
+        self.misses += 1
+        return None
+
+    def put(self, key, S):
+        """Caches the analysis S for key, writing it to the persistent tier.
+        """
+        if self.path is not None:
+            fd, name = tempfile.mkstemp('.tmp', key, self.path)
+            os.close(fd)
+            if cs_save(name, S):
+                os.rename(name, os.path.join(self.path, key + '.csb'))
+            else:
+                os.remove(name)
+        self._insert(key, S)
+
+    def _insert(self, key, S):
+        nbytes = _cs_nbytes(S)
+        if nbytes > self.budget:
+            return # would evict everything else
+        self.entries[key] = S
+        self.nbytes += nbytes
+        while self.nbytes > self.budget: # evict least recently used
+            _, old = self.entries.popitem(last=False)
+            self.nbytes -= _cs_nbytes(old)
+            self.evictions += 1
+
+    def clear(self):
+        """Empties the memory tier; the persistent tier is kept.
+        """
+        self.entries.clear()
+        self.nbytes = 0
 
 
 # Sparse Cholesky.
@@ -565,16 +1405,16 @@ def cs_chol(A, S):
     @param S: symbolic Cholesky analysis, pinv is optional
     @return: numeric Cholesky factorization, null on error
     """
-    if not CS_CSC(A) or S == None or S.cp == None or S.parent == None:
+    if not CS_CSC(A) or S is None or S.cp is None or S.parent is None:
         return None
     n = A.n
     N = csn() # allocate result
-    c = ialloc(2 * n) # get int workspace
-    x = xalloc(n) # get double workspace
     cp = S.cp
+    c = _cs_list(cp[:n]) + [0] * n # get int workspace
+    x = xalloc(n) # get double workspace
     pinv = S.pinv
-    parent = S.parent
-    C = cs_symperm(A, pinv, True) if pinv != None else A
+    parent = _cs_list(S.parent) # n-vector, for the etree walks
+    C = cs_symperm(A, pinv, True) if pinv is not None else A
     s = c
     s_offset = n
     Cp = C.p
@@ -584,94 +1424,293 @@ def cs_chol(A, S):
     Lp = L.p
     Li = L.i
     Lx = L.x
-    for k in range(n):
-        Lp[k] = c[k] = cp[k]
+    Lp[:n + 1] = cp[:n + 1]
+    diag = [0.0] * n # L(k,k), for the triangular solves
     for k in range(n): # compute L(k,:) for L*L' = C
         # --- Nonzero pattern of L(k,:) ------------------------------------
         top = cs_ereach(C, k, parent, s, s_offset, c) # find pattern of L(k,:)
-        x[k] = 0 # x (0:k) is now zero
-        for p in range(Cp[k], p < Cp[k + 1]): # x = full(triu(C(:,k)))
-            if Ci[p] <= k:
-                x[Ci[p]] = Cx[p]
+        p1, p2 = Cp[k], Cp[k + 1]
+        rows = Ci[p1:p2]
+        upper = rows <= k
+        x[rows[upper]] = Cx[p1:p2][upper] # x = full(triu(C(:,k)))
         d = x[k] # d = C(k,k)
         x[k] = 0 # clear x for k+1st iteration
         # --- Triangular solve ---------------------------------------------
-        while top < n: # solve L(0:k-1,0:k-1) * x = C(:,k)
-            i = s[s_offset + top] # s [top..n-1] is pattern of L(k,:)
-            lki = x[i] / Lx[Lp[i]] # L(k,i) = x (i) / L(i,i)
+        pattern = s[s_offset + top:s_offset + n] # pattern of L(k,:)
+        lk = [0.0] * len(pattern)
+        for t, i in enumerate(pattern): # solve L(0:k-1,0:k-1) * x = C(:,k)
+            lki = x[i] / diag[i] # L(k,i) = x (i) / L(i,i)
             x[i] = 0 # clear x for k+1st iteration
-            for p in range(Lp[i] + 1, p < c[i]):
-                x[Li[p]] -= Lx[p] * lki
+            p = slice(Lp[i] + 1, c[i])
+            x[Li[p]] -= Lx[p] * lki
             d -= lki * lki # d = d - L(k,i)*L(k,i)
+            lk[t] = lki
+        for t, i in enumerate(pattern):
             p = c[i]
             c[i]+=1
             Li[p] = k # store L(k,i) in column i
-            Lx[p] = lki
-            top+=1
+            Lx[p] = lk[t]
         # --- Compute L(k,k) -----------------------------------------------
         if d <= 0:
             return None # not pos def
         p = c[k]
         c[k]+=1
         Li[p] = k # store L(k,k) = sqrt (d) in column k
-        Lx[p] = sqrt(d)
-    Lp[n] = cp[n] # finalize L
+        Lx[p] = diag[k] = sqrt(d)
     return N
 
 
+def _cs_symmap(A, pinv, lower):
+    """pattern of C=triu(PAP'), or tril(PAP') if lower, and position in C of
+    each entry of A (-1 if not in the upper triangular part of A)
+    """
+    n = A.n
+    Ap, Ai = numpy.asarray(A.p[:n + 1]), numpy.asarray(A.i[:A.p[n]])
+    Aj = numpy.repeat(numpy.arange(n), numpy.diff(Ap)) # column of each entry
+    keep = Ai <= Aj # entries in triu(A)
+    pinv = numpy.asarray(pinv) if pinv is not None else numpy.arange(n)
+    i2, j2 = pinv[Ai[keep]], pinv[Aj[keep]]
+    row, col = numpy.minimum(i2, j2), numpy.maximum(i2, j2) # C(i2,j2) in triu
+    if lower:
+        row, col = col, row
+    order = numpy.argsort(col, kind='mergesort')
+    Cp = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(col, minlength=n))))
+    pos = numpy.empty(len(col), CS_INT)
+    pos[order] = numpy.arange(len(col))
+    amap = numpy.full(len(Ai), -1, CS_INT)
+    amap[keep] = pos
+    return Cp, row[order], amap
+
+
+def _cs_cholrows(A, S, L):
+    """row patterns of the Cholesky factor L and position in C=triu(PAP') of
+    each entry of A (-1 if not in the upper triangular part)
+    """
+    n = A.n
+    Cp, Ci, amap = _cs_symmap(A, S.pinv, False)
+    Lp, Li = numpy.asarray(L.p[:n + 1]), numpy.asarray(L.i[:L.p[n]])
+    Lj = numpy.repeat(numpy.arange(n), numpy.diff(Lp))
+    off = numpy.nonzero(Li != Lj)[0] # entries below the diagonal
+    order = numpy.lexsort((Lj[off], Li[off])) # by row, then column
+    Rp = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(Li[off], minlength=n))))
+    return Rp, Lj[off][order], off[order], Cp, Ci, amap
+
+
+def cs_cholrefactor(A, S, N):
+    """Numeric Cholesky refactorization LL=PAP' of a matrix with the pattern
+    N was computed for. The row patterns of L and the map of the entries of
+    A into C=triu(PAP') are found on the first call and kept in N.rows; only
+    the numerical values are recomputed.
+
+    @param A: column-compressed matrix, with the pattern N was computed for,
+              only upper triangular part is used
+    @param S: symbolic Cholesky analysis
+    @param N: numeric Cholesky factorization; its numerical values are not
+              modified, but the row patterns and map are stored in N.rows on
+              the first call
+    @return: numeric Cholesky factorization sharing the pattern of N, null on
+             error
+    """
+    if not CS_CSC(A) or S is None or N is None:
+        return None # check inputs
+    n, L = A.n, N.L
+    if N.rows is None:
+        N.rows = _cs_cholrows(A, S, L)
+    Rp, Ri, Rl, Cp, Ci, amap = N.rows
+    keep = amap >= 0
+    Cx = numpy.bincount(amap[keep], weights=numpy.asarray(A.x)[:len(amap)][keep],
+            minlength=Cp[n]) # values of C
+    Lp, Li = L.p, L.i
+    Lx = xalloc(L.nzmax)
+    x = xalloc(n) # get double workspace
+    Rp, Ri, Rl = Rp.tolist(), Ri.tolist(), Rl.tolist()
+    for k in range(n): # compute L(k,:) for L*L' = C
+        x[Ci[Cp[k]:Cp[k + 1]]] = Cx[Cp[k]:Cp[k + 1]] # x = full(triu(C(:,k)))
+        d = x[k] # d = C(k,k)
+        x[k] = 0 # clear x for k+1st iteration
+        for t in range(Rp[k], Rp[k + 1]): # solve L(0:k-1,0:k-1) * x = C(:,k)
+            i, p = Ri[t], Rl[t] # L(k,i) is stored in Lx [p]
+            lki = x[i] / Lx[Lp[i]] # L(k,i) = x (i) / L(i,i)
+            x[i] = 0 # clear x for k+1st iteration
+            x[Li[Lp[i] + 1:p]] -= Lx[Lp[i] + 1:p] * lki
+            d -= lki * lki # d = d - L(k,i)*L(k,i)
+            Lx[p] = lki
+        if d <= 0:
+            return None # not pos def
+        Lx[Lp[k]] = sqrt(d) # L(k,k) = sqrt (d)
+    R = csn()
+    R.L = cs() # share the pattern of N
+    R.L.m, R.L.n, R.L.nz, R.L.nzmax = L.m, L.n, L.nz, L.nzmax
+    R.L.p, R.L.i, R.L.x = L.p, L.i, Lx
+    R.rows = N.rows
+    return R
+
+
 def cs_cholsol(order, A, b):
     """Solves Ax=b where A is symmetric positive definite; b is overwritten
     with solution.
 
-    @param order: ordering method to use (0 or 1)
+    @param order: ordering method to use (0, 1, 4, 6 or 7)
     @param A: column-compressed matrix, symmetric positive definite, only
               upper triangular part is used
-    @param b: right hand side, b is overwritten with solution
+    @param b: right hand side, or n-by-k array of right hand sides, b is
+              overwritten with solution
     @return: true if successful, false on error
     """
-    if not CS_CSC(A) or b == None:
+    if not CS_CSC(A) or b is None:
         return False # check inputs
-    n = A.n
-    S = cs_schol(order, A) # ordering and symbolic analysis
-    N = cs_chol(A, S) # numeric Cholesky factorization
-    x = xalloc(n) # get workspace
-    ok = S != None and N != None
-    if ok:
-        cs_ipvec(S.pinv, b, x, n) # x = P*b
-        cs_lsolve(N.L, x) # x = L\x
-        cs_ltsolve(N.L, x) # x = L'\x
-        cs_pvec(S.pinv, x, b, n) # b = P'*x
-    return ok
-
-
-def cs_compress(T):
-    """C = compressed-column form of a triplet matrix T. The columns of C are
-    not sorted, and duplicate entries may be present in C.
+    F = cs_factor('chol', order, A) # ordering, symbolic and numeric
+    return F is not None and F.solve(b)
+
+
+# Column approximate minimum degree ordering.
+
+def _cs_find(parent, e):
+    """roots of the elements e, with path compression
+    """
+    r = e
+    while True:
+        up = parent[r]
+        if (up == r).all():
+            break
+        r = up
+    parent[e] = r
+    return r
+
+def cs_colamd(A):
+    """Column approximate minimum degree ordering for QR or LU, computed on
+    the pattern of A without forming A'A. The rows of A are the initial
+    elements of the quotient graph of A'A; eliminating a column absorbs the
+    elements containing it into a new one E. The score of a column starts as
+    the sum of |e|-1 over its rows e, and is |E|-1 plus the sum of |e\\E|
+    over its other elements e once it is in E, an upper bound of its degree
+    in A'A.
+    Dense rows are ignored and dense columns are ordered last.
+
+    @param A: column-compressed matrix
+    @return: column permutation q, null on error
+    """
+    if not CS_CSC(A):
+        return None # check inputs
+    m, n = A.m, A.n
+    Ap = numpy.asarray(A.p[:n + 1])
+    Ai = numpy.asarray(A.i[:Ap[n]])
+    cols = numpy.repeat(numpy.arange(n), numpy.diff(Ap))
+    dense = max(16, int(10 * sqrt(n))) # dense row threshold
+    keep = numpy.bincount(Ai, minlength=m)[Ai] <= dense
+    dcol = numpy.diff(Ap) > max(16, int(10 * sqrt(min(m, n)))) # dense columns
+    keep &= ~dcol[cols]
+    Ai, cols = Ai[keep], cols[keep]
+    Cp = numpy.zeros(n + 1, CS_INT) # rows of each column
+    Cp[1:] = numpy.cumsum(numpy.bincount(cols, minlength=n))
+    Rp = numpy.zeros(m + 1, CS_INT) # columns of each row
+    Rp[1:] = numpy.cumsum(numpy.bincount(Ai, minlength=m))
+    Rj = cols[numpy.argsort(Ai, kind='mergesort')]
+    new = {} # columns of the elements created by elimination
+    size = numpy.zeros(m + n, CS_INT) # number of columns of each element
+    size[:m] = numpy.diff(Rp)
+    parent = numpy.arange(m + n) # element each element was absorbed into
+    score = numpy.bincount(cols, weights=size[Ai] - 1, minlength=n)
+    alive = ~dcol
+    live = numpy.flatnonzero(alive)
+    heap = list(zip(score[live].tolist(), live.tolist())) # Python scalars compare faster
+    heapq.heapify(heap)
+    q = ialloc(n) # allocate result
+    k = 0
+    while heap:
+        sc, p = heapq.heappop(heap)
+        if not alive[p] or sc != score[p]:
+            continue # stale entry
+        alive[p] = False # eliminate column p
+        q[k] = p
+        E = m + k # new element
+        k += 1
+        elems = numpy.unique(_cs_find(parent, Ai[Cp[p]:Cp[p + 1]]))
+        ecols = [Rj[Rp[e]:Rp[e + 1]] if e < m else new.pop(e) for e in elems]
+        if not ecols:
+            continue
+        Ecols = numpy.unique(numpy.concatenate(ecols))
+        Ecols = Ecols[alive[Ecols]] # all columns of the elements, but p
+        parent[elems] = E # absorb the elements of p
+        nrows = Cp[Ecols + 1] - Cp[Ecols]
+        roots = _cs_find(parent, Ai[_cs_ranges(Cp[Ecols], nrows)])
+        owner = numpy.repeat(numpy.arange(len(Ecols)), nrows)
+        other = roots != E
+        pairs = numpy.unique(owner[other] * (m + n) + roots[other]) # (column, element)
+        col, elem = pairs // (m + n), pairs % (m + n)
+        mass = numpy.bincount(col, minlength=len(Ecols)) == 0
+        if mass.any(): # columns only in E are indistinguishable from p
+            alive[Ecols[mass]] = False
+            q[k:k + numpy.count_nonzero(mass)] = Ecols[mass]
+            k += numpy.count_nonzero(mass)
+        size[E] = numpy.count_nonzero(~mass)
+        new[E] = Ecols[~mass]
+        elem, inv, cnt = numpy.unique(elem, return_inverse=True, return_counts=True)
+        ext = numpy.bincount(col, weights=(size[elem] - cnt)[inv], minlength=len(Ecols))
+        Ecols = Ecols[~mass] # score = |E|-1 + sum of |e\E| over the other elements
+        score[Ecols] = numpy.minimum(size[E] - 1 + ext[~mass], n - k - 1)
+        for entry in zip(score[Ecols].tolist(), Ecols.tolist()):
+            heapq.heappush(heap, entry)
+    q[k:] = numpy.flatnonzero(dcol) # dense columns last
+    return q
+
+
+def cs_compress(T, dupl=False, sort=False):
+    """C = compressed-column form of a triplet matrix T. Unless requested, the
+    columns of C are not sorted, and duplicate entries may be present in C.
 
     @param T: triplet matrix
+    @param dupl: sum up duplicate entries if true
+    @param sort: sort the row indices of each column if true
     @return: C if successful, null on error
     """
     if not CS_TRIPLET(T):
         return None # check inputs
-    m, n = T.m, T.n
-    Ti, Tj, Tx, nz = T.i, T.p, T.x, T.nz
-    C = cs_spalloc(m, n, nz, Tx != None, False) # allocate result
-    w = ialloc(n) # get workspace
-    Cp = C.p
-    Ci = C.i
-    Cx = C.x
-    for k in range(nz):
-        w[Tj[k]]+=1 # column counts
-    cs_cumsum(Cp, w, n) # column pointers
-    for k in range(nz):
-        p = w[Tj[k]]
-        w[Tj[k]]+=1
-        Ci[p] = Ti[k] # A(i,j) is the pth entry in C
-        if Cx != None:
-            Cx[p] = Tx[k]
+    m, n, nz = T.m, T.n, T.nz
+    Ti = numpy.asarray(T.i)[:nz]
+    Tj = numpy.asarray(T.p)[:nz]
+    Tx = numpy.asarray(T.x)[:nz] if T.x is not None else None
+    if sort:
+        order = numpy.lexsort((Ti, Tj)) # sort by column, then by row
+    else:
+        order = numpy.argsort(Tj, kind='mergesort') # stable counting order
+    Ci, Cj = Ti[order], Tj[order]
+    Cx = Tx[order] if Tx is not None else None
+    if dupl:
+        Cj, Ci, Cx = _cs_sumdupl(Cj, Ci, Cx, m)
+    C = cs_spalloc(m, n, len(Ci), Tx is not None, False) # allocate result
+    C.p[1:] = numpy.cumsum(numpy.bincount(Cj, minlength=n)) # column pointers
+    C.i[:len(Ci)] = Ci # A(i,j) is the pth entry in C
+    if Cx is not None:
+        C.x[:len(Cx)] = Cx
     return C
 
 
+def _cs_sumdupl(cols, rows, x, m):
+    """sum up duplicates of entries sorted by column; each (i,j) is kept where
+    it first occurs
+    """
+    if len(rows) == 0:
+        return cols, rows, x
+    key = (cols - cols[0]) * max(m, 1) + rows
+    size = (cols[-1] - cols[0] + 1) * max(m, 1)
+    if size <= 4 * len(key): # few columns: mark the first occurrences
+        first = numpy.empty(size, CS_INT)
+        first[key[::-1]] = numpy.arange(len(key) - 1, -1, -1)
+        keep = numpy.zeros(len(key), bool)
+        keep[first[key]] = True
+        first = numpy.flatnonzero(keep)
+        if x is not None:
+            x = numpy.bincount(key, x, size)[key[first]]
+        return cols[first], rows[first], x
+    first, inv = numpy.unique(key, return_index=True, return_inverse=True)[1:]
+    keep = numpy.argsort(first, kind='mergesort') # order of first occurrence
+    if x is not None:
+        x = numpy.bincount(inv.ravel(), x, len(first))[keep]
+    first = first[keep]
+    return cols[first], rows[first], x
+
+
 # Column counts for Cholesky and QR.
 
 def _HEAD(k, j, head, head_offset, ata):
@@ -690,10 +1729,10 @@ def _init_ata(AT, post, w):
     next_offset = 5 * n + 1
     for k in range(n):
         w[post[k]] = k # invert post
-    for i in range(m):
-        k = n
-        for p in range(ATp[i], ATp[i + 1]):
-            k = min(k, w[ATi[p]])
+    first = numpy.full(m, n, CS_INT) # k = min (ipost [A(i,:)])
+    rows = numpy.repeat(numpy.arange(m), numpy.diff(ATp[:m + 1]))
+    numpy.minimum.at(first, rows, numpy.asarray(w[:n])[ATi[:ATp[m]]])
+    for i, k in enumerate(first.tolist()):
         next[next_offset + i] = head[head_offset + k] # place row i in linked list k
         head[head_offset + k] = i
 
@@ -710,13 +1749,14 @@ def cs_counts(A, parent, post, ata):
     @return column counts of LL'=A or LL'=A'A, null on error
     """
     jleaf = [0]
-    if not CS_CSC(A) or parent == None or post == None:
+    if not CS_CSC(A) or parent is None or post is None:
         return None # check inputs
     m, n = A.m, A.n
     s = 4 * n + (n + m + 1 if ata else 0)
-    delta = colcount = ialloc(n) # allocate result
-    w = ialloc(s) # get workspace
+    delta = colcount = [0] * n # allocate result
+    w = [0] * s # get workspace
     AT = cs_transpose(A, False) # AT = A'
+    parent, post = _cs_list(parent), _cs_list(post) # n-vectors
     ancestor = w
     maxfirst = w
     maxfirst_offset = n
@@ -733,6 +1773,8 @@ def cs_counts(A, parent, post, ata):
             first[first_offset + j] = k
             j = parent[j]
     ATp, ATi = AT.p, AT.i
+    head = next = None
+    head_offset = next_offset = 0
     if ata:
         offsets = _init_ata(AT, post, w)
         head = w
@@ -747,8 +1789,7 @@ def cs_counts(A, parent, post, ata):
             delta[parent[j]]-=1 # j is not a root
         J = _HEAD(k, j, head, head_offset, ata)
         while J != -1: # J=j for LL'=A case
-            for p in range(ATp[J], ATp[J + 1]):
-                i = ATi[p]
+            for i in ATi[ATp[J]:ATp[J + 1]].tolist():
                 q = cs_leaf(i, j, first, first_offset, maxfirst, maxfirst_offset,
                         prevleaf, prevleaf_offset, ancestor, 0, jleaf)
                 if jleaf[0] >= 1:
@@ -761,7 +1802,7 @@ def cs_counts(A, parent, post, ata):
     for j in range(n): # sum up delta's of each child
         if parent[j] != -1:
             colcount[parent[j]] += colcount[j]
-    return colcount
+    return numpy.array(colcount, dtype=CS_INT)
 
 
 def cs_cumsum(p, c, n):
@@ -774,7 +1815,13 @@ def cs_cumsum(p, c, n):
     """
     nz = 0
     nz2 = 0.0
-    if p == None or c == None: return -1 # check inputs
+    if p is None or c is None: return -1 # check inputs
+    if isinstance(p, numpy.ndarray) and isinstance(c, numpy.ndarray):
+        nz2 = numpy.sum(c[:n], dtype=float) # also in double
+        p[0] = 0
+        p[1:n + 1] = numpy.cumsum(c[:n])
+        c[:n] = p[:n] # also copy p[0..n-1] back into c[0..n-1]
+        return int(nz2)
     for i in range(n):
         p[i] = nz
         nz += c[i]
@@ -801,20 +1848,28 @@ def cs_dfs(j, G, top, xi, xi_offset, pstack, pstack_offset, pinv, pinv_offset):
     @return new value of top, -1 on error
     """
     head = 0
-    if not CS_CSC(G) or xi == None or pstack == None:
+    if not CS_CSC(G) or xi is None or pstack is None:
         return -1 # check inputs
     Gp, Gi = G.p, G.i
+    todo = [] # todo[head]: neighbors of xi[head] unvisited when it was reached
     xi[xi_offset + 0] = j # initialize the recursion stack
     while head >= 0:
         j = xi[xi_offset + head] # get j from the top of the recursion stack
-        jnew = pinv[pinv_offset + j] if pinv != None else j
+        jnew = pinv[pinv_offset + j] if pinv is not None else j
         if not CS_MARKED(Gp, j):
             CS_MARK(Gp, j) # mark node j as visited
-            pstack[pstack_offset + head] = 0 if jnew < 0 else CS_UNFLIP(Gp[jnew])
+            pstack[pstack_offset + head] = 0
+            p = slice(CS_UNFLIP(Gp[jnew]), CS_UNFLIP(Gp[jnew + 1])) if jnew >= 0 else slice(0)
+            nodes = Gi[p]
+            nodes = nodes[Gp[nodes] >= 0].tolist()
+            if head < len(todo):
+                todo[head] = nodes
+            else:
+                todo.append(nodes)
         done = True # node j done if no unvisited neighbors
-        p2 = 0 if jnew < 0 else CS_UNFLIP(Gp[jnew + 1])
-        for p in range(pstack[pstack_offset + head], p2): # examine all neighbors of j
-            i = Gi[p] # consider neighbor node i
+        nodes = todo[head]
+        for p in range(pstack[pstack_offset + head], len(nodes)): # examine all neighbors of j
+            i = nodes[p] # consider neighbor node i
             if CS_MARKED(Gp, i):
                 continue # skip visited node i
             pstack[pstack_offset + head] = p # pause depth-first search of node j
@@ -844,14 +1899,13 @@ def _cs_bfs(A, n, wi, wj, queue, imatch, imatch_offset, jmatch, jmatch_offset, m
     if tail == 0:
         return True # quick return if no unmatched nodes
     C = A if mark == 1 else cs_transpose(A, False)
-    if C == None:
+    if C is None:
         return False # bfs of C=A' to find R3,C3 from R0
-    Ap, Ai = C.p, C.i
+    Ap, Ai = _cs_list(C.p[:C.n + 1]), C.i
     while head < tail: # while queue is not empty
         j = queue[head] # get the head of the queue
         head+=1
-        for p in range(Ap[j], Ap[j + 1]):
-            i = Ai[p]
+        for i in Ai[Ap[j]:Ap[j + 1]].tolist():
             if wi[i] >= 0:
                 continue # skip if i is marked
             wi[i] = mark # i in set R1 (C3 if transpose)
@@ -915,13 +1969,14 @@ def cs_dmperm(A, seed):
         return None # check inputs
     m, n = A.m, A.n
     D = cs_dalloc(m, n) # allocate result
-    if D == None:
+    if D is None:
         return None
-    p, q, r, s, cc, rr = D.p, D.q, D.r, D.s, D.cc, D.rr
-    jmatch = cs_maxtrans(A, seed) # max transversal
+    p, q, r, s = _cs_list(D.p), _cs_list(D.q), _cs_list(D.r), _cs_list(D.s)
+    cc, rr = _cs_list(D.cc), _cs_list(D.rr) # m- and n-vectors, for the scalar loops
+    jmatch = _cs_list(cs_maxtrans(A, seed)) # max transversal
     imatch = jmatch # imatch = inverse of jmatch
     imatch_offset = m
-    if jmatch == None:
+    if jmatch is None:
         return None
     # --- Coarse decomposition ---------------------------------------------
     wi = r
@@ -942,34 +1997,29 @@ def cs_dmperm(A, seed):
     jmatch = None
     # --- Fine decomposition -----------------------------------------------
     pinv = cs_pinv(p, m) # pinv=p'
-    if pinv == None:
+    if pinv is None:
         return None
     C = cs_permute(A, pinv, q, False) # C=A(p,q) (it will hold A(R2,C2))
     pinv = None
-    if C == None:
+    if C is None:
         return None
     Cp = C.p
     nc = cc[3] - cc[2] # delete cols C0, C1, and C3 from C
     if cc[2] > 0:
-        j = cc[2]
-        while j <= cc[3]:
-            Cp[j - cc[2]] = Cp[j]
-            j+=1
+        Cp[:nc + 1] = Cp[cc[2]:cc[3] + 1].copy()
     C.n = nc
     if rr[2] - rr[1] < m: # delete rows R0, R1, and R3 from C
         cs_fkeep(C, _cs_rprune(), rr)
         cnz = Cp[nc]
-        Ci = C.i
         if rr[1] > 0:
-            for k in range(cnz):
-                Ci[k] -= rr[1]
+            C.i[:cnz] -= rr[1]
     C.m = nc
     scc = cs_scc(C) # find strongly connected components of C
-    if scc == None:
+    if scc is None:
         return None
     # --- Combine coarse and fine decompositions ---------------------------
-    ps = scc.p # C(ps,ps) is the permuted matrix
-    rs = scc.r # kth block is rs[k]..rs[k+1]-1
+    ps = _cs_list(scc.p) # C(ps,ps) is the permuted matrix
+    rs = _cs_list(scc.r) # kth block is rs[k]..rs[k+1]-1
     nb1 = scc.nb # # of blocks of A(R2,C2)
     for k in range(nc):
         wj[k] = q[ps[k] + cc[2]]
@@ -994,6 +2044,8 @@ def cs_dmperm(A, seed):
     r[nb2] = m
     s[nb2] = n
     D.nb = nb2
+    D.p, D.q, D.r, D.s = [numpy.array(v, dtype=CS_INT) for v in (p, q, r, s)]
+    D.cc, D.rr = numpy.array(cc, dtype=CS_INT), numpy.array(rr, dtype=CS_INT)
     return D
 
 
@@ -1034,32 +2086,22 @@ def cs_dropzeros(A):
 
 def cs_dupl(A):
     """Removes and sums duplicate entries in a sparse matrix.
-     *
-     * @param A
-     *            column-compressed matrix
-     * @return true if successful, false on error
+
+    @param A: column-compressed matrix
+    @return: true if successful, false on error
     """
-    nz = 0
     if not CS_CSC(A): # check inputs
         return False
-    m, n = A.m, A.n
-    Ap, Ai, Ax = A.p, A.i, A.x
-    w = ialloc(m) # get workspace
-    for i in range(m):
-        w[i] = -1 # row i not yet seen
-    for j in range(n):
-        q = nz # column j will start at q
-        for p in range(Ap[j], Ap[j + 1]):
-            i = Ai[p] # A(i,j) is nonzero
-            if w[i] >= q:
-                Ax[w[i]] += Ax[p] # A(i,j) is a duplicate
-            else:
-                w[i] = nz # record where row i occurs
-                Ai[nz] = i # keep A(i,j)
-                Ax[nz] = Ax[p]
-                nz+=1
-        Ap[j] = q # record start of column j
-    Ap[n] = nz # finalize A
+    n, Ap = A.n, numpy.asarray(A.p)
+    nz = Ap[n]
+    cols = numpy.repeat(numpy.arange(n), numpy.diff(Ap[:n + 1]))
+    Ax = numpy.asarray(A.x)[:nz] if A.x is not None else None
+    cols, Ai, Ax = _cs_sumdupl(cols, numpy.asarray(A.i)[:nz], Ax, A.m)
+    nz = len(Ai)
+    A.p[1:n + 1] = numpy.cumsum(numpy.bincount(cols, minlength=n)) # record start of each column
+    A.i[:nz] = Ai # keep A(i,j)
+    if Ax is not None:
+        A.x[:nz] = Ax
     return cs_sprealloc(A, 0) # remove extra space from A
 
 
@@ -1079,7 +2121,7 @@ def cs_entry(T, i, j, x):
         return False # check inputs
     if T.nz >= T.nzmax:
         cs_sprealloc(T, 2 * (T.nzmax))
-    if T.x != None:
+    if T.x is not None:
         T.x[T.nz] = x
     T.i[T.nz] = i
     T.p[T.nz] = j
@@ -1105,7 +2147,7 @@ def cs_ereach(A, k, parent, s, s_offset, w):
     @return top in successful, -1 on error
     """
 #    int i, p, n, len, top, Ap[], Ai[];
-    if not CS_CSC(A) or parent == None or s == None or w == None:
+    if not CS_CSC(A) or parent is None or s is None or w is None:
         return -1 # check inputs
     top = n = A.n
     Ap = A.p
@@ -1144,9 +2186,9 @@ def cs_etree(A, ata):
     if not CS_CSC(A):
         return None # check inputs
     m, n = A.m, A.n
-    Ap, Ai = A.p, A.i
-    parent = ialloc(n) # allocate result
-    w = ialloc(n + (m if ata else 0)) # get workspace
+    Ap, Ai = _cs_list(A.p[:n + 1]), A.i
+    parent = [0] * n # allocate result
+    w = [0] * (n + (m if ata else 0)) # get workspace
     ancestor = w
     prev = w
     prev_offset = n
@@ -1156,8 +2198,8 @@ def cs_etree(A, ata):
     for k in range(n):
         parent[k] = -1 # node k has no parent yet
         ancestor[k] = -1 # nor does k have an ancestor
-        for p in range(Ap[k], Ap[k + 1]):
-            i = prev[prev_offset + Ai[p]] if ata else Ai[p]
+        for r in Ai[Ap[k]:Ap[k + 1]].tolist(): # rows of A(:,k)
+            i = prev[prev_offset + r] if ata else r
             while i != -1 and i < k: # traverse from i to k
                 inext = ancestor[i] # inext = ancestor of i
                 ancestor[i] = k # path compression
@@ -1165,8 +2207,54 @@ def cs_etree(A, ata):
                     parent[i] = k # no anc., parent is k
                 i = inext
             if ata:
-                prev[prev_offset + Ai[p]] = k
-    return parent
+                prev[prev_offset + r] = k
+    return numpy.array(parent, dtype=CS_INT)
+
+
+# Reusable factorization.
+
+def cs_factor(kind, order, A, tol=1, cache=None):
+    """Orders, analyzes and factorizes A, keeping the result for repeated
+    solves and for refactorization of matrices with the same pattern.
+
+    @param kind: 'chol' (A symmetric positive definite, only the upper
+                 triangular part is used), 'lu' (A square) or 'qr'
+    @param order: ordering method to use (0, 1, 4, 6 or 7 for Cholesky, 0 to
+                  7 otherwise); Cholesky and LU are instead banded on the
+                  reverse Cuthill-McKee ordering (see cs_bandfactor) if the
+                  dense band takes no more memory than the predicted sparse
+                  factors (see cs_report)
+    @param A: column-compressed matrix
+    @param tol: partial pivoting tolerance for LU
+    @param cache: css_cache to look the symbolic analysis up in, or None
+    @return: csf factorization, None on error
+    """
+    if not CS_CSC(A) or kind not in ('chol', 'lu', 'qr'):
+        return None # check inputs
+    m, n = A.m, A.n
+    if kind != 'qr' and m != n:
+        return None
+    F = csf()
+    F.kind, F.tol, F.m, F.n = kind, tol, m, n
+    F.Ap = numpy.array(A.p[:n + 1], dtype=CS_INT) # remember the pattern
+    F.Ai = numpy.array(A.i[:F.Ap[n]], dtype=CS_INT)
+    if kind == 'chol':
+        F.S = cs_schol(order, A, cache)
+    elif kind == 'lu':
+        F.S = cs_sqr(order, A, False, cache)
+    elif m >= n:
+        F.S = cs_sqr(order, A, True, cache)
+    else:
+        F.S = cs_sqr(order, cs_transpose(A, False), True, cache) # analyze A'
+    if F.S is None:
+        return None
+    band = _cs_banded(kind, A, F.S) if kind != 'qr' else None
+    if band is not None:
+        F.S, F.band = band # banded, see cs_bandfactor
+    F.x = xalloc(F.S.m2 if kind == 'qr' else n) # get workspace
+    if not F.refactor(A):
+        return None
+    return F
 
 
 def cs_fkeep(A, fkeep, other):
@@ -1180,58 +2268,272 @@ def cs_fkeep(A, fkeep, other):
     nz = 0
     if not CS_CSC(A):
         return (-1) # check inputs
-    n, Ap, Ai, Ax = A.n, A.p, A.i, A.x
+    n = A.n
+    Ap, Ai, Ax = A.p, A.i, A.x
     for j in range(n):
-        p = Ap[j] # get current location of col j
+        p1, p2 = Ap[j], Ap[j + 1] # get current location of col j
         Ap[j] = nz # record new location of col j
-        while p < Ap[j + 1]:
-            if fkeep.fkeep(Ai[p], j, Ax[p] if Ax != None else 1, other):
-                if Ax != None:
-                    Ax[nz] = Ax[p] # keep A(i,j)
-                Ai[nz] = Ai[p]
-                nz+=1
-            p+=1
+        rows = Ai[p1:p2].tolist()
+        vals = Ax[p1:p2].tolist() if Ax is not None else [1] * len(rows)
+        keep = numpy.array([bool(fkeep.fkeep(i, j, aij, other))
+                            for i, aij in zip(rows, vals)], dtype=bool)
+        count = numpy.count_nonzero(keep)
+        Ai[nz:nz + count] = Ai[p1:p2][keep] # keep A(i,j)
+        if Ax is not None:
+            Ax[nz:nz + count] = Ax[p1:p2][keep]
+        nz += count
     Ap[n] = nz # finalize A
     cs_sprealloc(A, 0) # remove extra space from A
     return nz
 
 
+# Conversion to and from scipy.sparse.
+
+def _cs_share(a, dtype):
+    """a itself if it already has the given dtype, a converted copy otherwise
+    """
+    a = numpy.asarray(a)
+    return a if a.dtype == dtype and a.flags.c_contiguous else numpy.ascontiguousarray(a, dtype)
+
+
+def cs_from_scipy(S):
+    """Converts a scipy.sparse matrix to a cs matrix. A CSC matrix gives a
+    compressed-column matrix and a COO matrix a triplet matrix, sharing the
+    index and value arrays of S when their dtypes are CS_INT and CS_FLOAT.
+    Other formats are converted to CSC first.
+
+    @param S: scipy.sparse matrix with real values
+    @return: A if successful, null on error
+    """
+    import scipy.sparse
+    if not scipy.sparse.issparse(S) or numpy.iscomplexobj(S.dtype.type(0)):
+        return None # check inputs
+    A = cs()
+    A.m, A.n = S.shape
+    if S.format == 'coo':
+        A.nz = S.nnz
+        A.i, A.p = _cs_share(S.row, CS_INT), _cs_share(S.col, CS_INT)
+    else:
+        if S.format != 'csc':
+            S = S.tocsc() # copy is unavoidable
+        A.nz = -1
+        A.p, A.i = _cs_share(S.indptr, CS_INT), _cs_share(S.indices, CS_INT)
+    A.x = _cs_share(S.data, CS_FLOAT)
+    A.nzmax = len(A.i)
+    return A
+
+
+def cs_to_scipy(A):
+    """Converts a cs matrix to a scipy.sparse matrix: csc_matrix for a
+    compressed-column matrix and coo_matrix for a triplet matrix. The arrays
+    of A are shared, not copied, unless A has no numerical values.
+
+    @param A: triplet or column-compressed matrix
+    @return: S, null on error
+    """
+    import scipy.sparse
+    if A is None:
+        return None # check inputs
+    m, n = A.m, A.n
+    nz = A.p[n] if CS_CSC(A) else A.nz
+    x = A.x[:nz] if A.x is not None else numpy.ones(nz, CS_FLOAT)
+    if CS_CSC(A):
+        S = scipy.sparse.csc_matrix((m, n), dtype=x.dtype)
+        S.indptr = numpy.asarray(A.p)[:n + 1] # assigned, so that scipy does
+        S.indices = numpy.asarray(A.i)[:nz] # not narrow the index dtype
+    else:
+        S = scipy.sparse.coo_matrix((m, n), dtype=x.dtype)
+        rows, cols = numpy.asarray(A.i)[:nz], numpy.asarray(A.p)[:nz]
+        if hasattr(S, 'coords'):
+            S.coords = (rows, cols) # row and col would cast to the old dtype
+        else:
+            S.row, S.col = rows, cols
+    S.data = numpy.asarray(x)
+    return S
+
+
+def _cs_axpy(y, t):
+    """y = y+t in place, for a numpy array or a list y
+    """
+    if isinstance(y, numpy.ndarray):
+        y += t
+    else:
+        y[:len(t)] = (numpy.asarray(y[:len(t)], CS_FLOAT) + t).tolist()
+
+def _cs_dense(x):
+    """x itself if it is a numpy array, a copy as an array for a list
+    """
+    return x if isinstance(x, numpy.ndarray) else numpy.array(x, CS_FLOAT)
+
+def _cs_store(x, y):
+    """copy y back into x if x is a list, see _cs_dense
+    """
+    if y is not x:
+        x[:] = y.tolist()
+
+def cs_gatxpy(A, x, y):
+    """Sparse matrix transpose times dense column vector, y = A'*x+y,
+    without forming A'. Each entry of y is a sum over one column of A, done
+    with numpy.add.reduceat at the column pointers for all columns of a
+    block at once.
+
+    @param A: column-compressed matrix
+    @param x: size m, vector x, or m-by-k dense matrix
+    @param y: size n, vector y, or n-by-k dense matrix
+    @return: true if successful, false on error
+    """
+    if not CS_CSC(A) or x is None or y is None:
+        return False # check inputs
+    n, Ap = A.n, numpy.asarray(A.p[:A.n + 1])
+    Ai = numpy.asarray(A.i[:Ap[n]])
+    x = numpy.asarray(x, CS_FLOAT)
+    Ax = numpy.asarray(A.x[:Ap[n]]) if A.x is not None else numpy.ones(Ap[n])
+    cols = numpy.flatnonzero(Ap[1:] > Ap[:n]) # nonempty columns
+    k = int(numpy.prod(x.shape[1:])) # number of columns of x
+    t = numpy.zeros((n, k), CS_FLOAT)
+    if len(cols) > 0:
+        P = numpy.take(x.reshape(len(x), k).T, Ai, axis=1) # P(c,p) = x(Ai[p],c)
+        P *= Ax
+        t[cols] = numpy.add.reduceat(P, Ap[cols], axis=1).T
+    _cs_axpy(y, t.reshape((n,) + x.shape[1:]))
+    return True
+
+
 def cs_gaxpy(A, x, y):
-    """Sparse matrix times dense column vector, y = A*x+y.
+    """Sparse matrix times dense column vector, y = A*x+y. The products of
+    the entries with x are summed by row with numpy.bincount, for all columns
+    of a block in one pass.
 
     @param A: column-compressed matrix
-    @param x: size n, vector x
-    @param y: size m, vector y
+    @param x: size n, vector x, or n-by-k dense matrix
+    @param y: size m, vector y, or m-by-k dense matrix
     @return: true if successful, false on error
     """
-    if not CS_CSC(A) or x == None or y == None:
+    if not CS_CSC(A) or x is None or y is None:
         return False # check inputs
-    n, Ap, Ai, Ax = A.n, A.p, A.i, A.x
-    for j in range(n):
-        for p in range(Ap[j], Ap[j + 1]):
-            y[Ai[p]] += Ax[p] * x[j]
+    m, n, Ap = A.m, A.n, numpy.asarray(A.p[:A.n + 1])
+    Ai = numpy.asarray(A.i[:Ap[n]])
+    x = numpy.asarray(x, CS_FLOAT)
+    Ax = numpy.asarray(A.x[:Ap[n]]) if A.x is not None else numpy.ones(Ap[n])
+    col = numpy.repeat(numpy.arange(n), numpy.diff(Ap)) # column of each entry
+    k = int(numpy.prod(x.shape[1:])) # number of columns of x
+    P = numpy.take(x.reshape(len(x), k).T, col, axis=1) # P(c,p) = x(col[p],c)
+    P *= Ax
+    row = numpy.arange(0, m * k, m)[:, None] + Ai # entry (Ai[p],c) of t
+    t = numpy.bincount(row.ravel(), P.ravel(), m * k).reshape(k, m).T
+    t = t.reshape((m,) + x.shape[1:])
+    _cs_axpy(y, t)
     return True
 
 
+# Harwell-Boeing and Rutherford-Boeing files.
+
+def _cs_fortran(fmt):
+    """fields per line and field width of a Fortran format such as (1P,4E20.12)
+    """
+    fmt = re.sub(r'\d+P,?', '', fmt.upper()) # drop the scale factor
+    match = re.search(r'(\d*)\s*[IEDFG]\s*(\d+)', fmt)
+    if match is None:
+        return None
+    return int(match.group(1) or 1), int(match.group(2))
+
+
+def _cs_fixed(fd, nlines, fmt, count, dtype):
+    """read count fields of a Fortran-formatted section from the next nlines
+    lines of fd, None on error
+    """
+    lines = list(islice(fd, nlines))
+    data = b''.join(lines).replace(b'D', b'E').replace(b'd', b'e')
+    try:
+        fields = _cs_tokens(data)
+        if len(fields) == count: # fields separated by blanks
+            return fields.astype(dtype)
+    except ValueError:
+        pass
+    fmt = _cs_fortran(fmt) # fields may touch: split them by width
+    if fmt is None:
+        return None
+    per, width = fmt
+    size = per * width
+    data = b''.join(line.rstrip(b'\r\n').ljust(size)[:size] for line in lines)
+    fields = numpy.frombuffer(data.replace(b'D', b'E').replace(b'd', b'e'),
+                              dtype='S%d' % width)[:count]
+    if len(fields) != count:
+        return None
+    try:
+        return fields.astype(CS_FLOAT).astype(dtype)
+    except ValueError:
+        return None # blank or malformed field
+
+
+def cs_hbread(filename):
+    """Reads an assembled matrix from a Harwell-Boeing or Rutherford-Boeing
+    file (gzip-compressed if the file name ends in .gz). The column pointers,
+    row indices and values are read directly into compressed-column form. The
+    lower triangle stored for a symmetric or skew-symmetric matrix is returned
+    as the upper triangular part, as used by cs_chol. Pattern matrices have no
+    numerical values.
+
+    @param filename: file name
+    @return: C if successful, null on error
+    """
+    with _cs_open(filename, 'rb') as fd:
+        fd.readline() # title and key
+        cards = fd.readline().rstrip(b'\r\n')
+        cards = [int(cards[k:k + 14].strip() or 0) for k in range(0, 70, 14)]
+        ptrcrd, indcrd, valcrd, rhscrd = cards[1:5]
+        line = fd.readline()
+        mxtype = line[:3].upper().decode('ascii')
+        size = line[14:].split()
+        if len(size) < 3 or len(mxtype) != 3 or mxtype[2] != 'A':
+            return None # elemental matrices are not supported
+        if mxtype[0] not in 'RIPQ':
+            return None # complex matrices are not supported
+        m, n, nz = [int(t) for t in size[:3]]
+        line = fd.readline().decode('ascii')
+        ptrfmt, indfmt, valfmt = line[:16], line[16:32], line[32:52]
+        if rhscrd > 0:
+            fd.readline() # right-hand side header, not used
+        values = mxtype[0] in 'RI' and valcrd > 0
+        Cp = _cs_fixed(fd, ptrcrd, ptrfmt, n + 1, CS_INT)
+        Ci = _cs_fixed(fd, indcrd, indfmt, nz, CS_INT)
+        Cx = _cs_fixed(fd, valcrd, valfmt, nz, CS_FLOAT) if values else None
+    if Cp is None or Ci is None or (values and Cx is None):
+        return None
+    Cp -= 1 # one-based to zero-based
+    Ci -= 1
+    if Cp[0] != 0 or Cp[n] != nz or (numpy.diff(Cp) < 0).any():
+        return None
+    if nz > 0 and (Ci.min() < 0 or Ci.max() >= m):
+        return None
+    C = cs() # allocate result, using the arrays read from the file
+    C.m, C.n, C.nz, C.nzmax = m, n, -1, nz
+    C.p, C.i, C.x = Cp, Ci, Cx
+    if mxtype[1] in 'SZ': # keep the upper triangular part
+        C = cs_transpose(C, values)
+        if C is not None and values and mxtype[1] == 'Z':
+            C.x *= -1 # A(j,i) = -A(i,j)
+    return C
+
+
 def cs_happly(V, i, beta, x):
     """Applies a Householder reflection to a dense vector,
-    x = (I - beta*v*v')*x.
+    x = (I - beta*v*v')*x. V must not have duplicate entries.
 
     @param V: column-compressed matrix of Householder vectors
     @param i: v = V(:,i), the ith column of V
     @param beta: scalar beta
-    @param x: vector x of size m
+    @param x: vector x of size m, or m-by-k array of k vectors
     @return true if successful, false on error
     """
-    tau = 0;
-    if not CS_CSC(V) or x == None:
+    if not CS_CSC(V) or x is None:
         return False # check inputs
-    Vp, Vi, Vx = V.p, V.i, V.x
-    for p in range(Vp[i], Vp[i + 1]): # tau = v'*x
-        tau += Vx[p] * x[Vi[p]]
-    tau *= beta # tau = beta*(v'*x)
-    for p in range(Vp[i], Vp[i + 1]): # x = x - v*tau
-        x[Vi[p]] -= Vx[p] * tau
+    y = _cs_dense(x)
+    p = slice(V.p[i], V.p[i + 1])
+    Vi, Vx = V.i[p], V.x[p]
+    tau = beta * numpy.dot(Vx, y[Vi]) # tau = beta*(v'*x)
+    y[Vi] -= numpy.multiply.outer(Vx, tau) # x = x - v*tau
+    _cs_store(x, y)
     return True
 
 
@@ -1246,10 +2548,14 @@ def cs_house(x, x_offset, beta, n):
     @return: norm2(x), -1 on error
     """
     sigma = 0
-    if x == None or beta == None:
+    if x is None or beta is None:
         return -1 # check inputs
-    for i in range(1, n):
-        sigma += x[x_offset + i] * x[x_offset + i]
+    if isinstance(x, numpy.ndarray):
+        v = x[x_offset + 1:x_offset + n]
+        sigma = float(numpy.dot(v, v)) # sigma = x(1:n-1)'*x(1:n-1)
+    else:
+        for i in range(1, n):
+            sigma += x[x_offset + i] * x[x_offset + i]
     if sigma == 0:
         s = abs(x[x_offset + 0]) # s = |x(0)|
         beta[0] = 2.0 if x[x_offset + 0] <= 0 else 0.0
@@ -1265,15 +2571,19 @@ def cs_ipvec(p, b, x, n):
     """Permutes a vector, x = P'b.
 
     @param p: permutation vector, p=null denotes identity
-    @param b: input vector
+    @param b: input vector, or array whose rows are permuted
     @param x: output vector, x = P'b
     @param n: length of p, b, and x
     @return: true if successful, false on error
     """
-    if x == None or b == None:
+    if x is None or b is None:
         return False # check inputs
+    if isinstance(x, numpy.ndarray): # all n entries at once
+        x[numpy.asarray(p[:n]) if p is not None else slice(0, n)] = \
+            numpy.asarray(b[:n])
+        return True
     for k in range(n):
-        x[p[k] if p != None else k] = b[k]
+        x[p[k] if p is not None else k] = b[k]
     return True
 
 
@@ -1282,7 +2592,7 @@ def cs_leaf(i, j, first, first_offset, maxfirst, maxfirst_offset,
     """Determines if j is a leaf of the skeleton matrix and find lowest common
     ancestor (lca).
     """
-    if first == None or maxfirst == None or prevleaf == None or ancestor == None or jleaf == None:
+    if first is None or maxfirst is None or prevleaf is None or ancestor is None or jleaf is None:
         return -1
     jleaf[0] = 0
     if i <= j or first[first_offset + j] <= maxfirst[maxfirst_offset + i]:
@@ -1304,44 +2614,179 @@ def cs_leaf(i, j, first, first_offset, maxfirst, maxfirst_offset,
     return q # q = least common ancestor (jprev,j)
 
 
-def cs_load(filename, base=0):
+# Level-scheduled triangular solves.
+
+def cs_levels(G, lo, trans):
+    """Level schedule of a triangular solve: the columns of each level only
+    depend on columns of earlier levels, so each level is solved with a few
+    vectorized gathers and scatters. The diagonal must be the first entry of
+    each column of a lower triangular G and the last of an upper one.
+
+    @param G: column-compressed, triangular matrix
+    @param lo: G is lower triangular if true, upper triangular otherwise
+    @param trans: schedule for G'x=b if true, for Gx=b otherwise
+    @return: level schedule for cs_levelsolve, null on error
+    """
+    if not CS_CSC(G):
+        return None # check inputs
+    n = G.n
+    Gp = numpy.asarray(G.p[:n + 1])
+    Gi, Gx = numpy.asarray(G.i[:Gp[n]]), numpy.asarray(G.x[:Gp[n]])
+    Gj = numpy.repeat(numpy.arange(n), numpy.diff(Gp)) # column of each entry
+    diag = Gp[:n] if lo else Gp[1:] - 1
+    first, last = (Gp[:n] + 1, Gp[1:]) if lo else (Gp[:n], Gp[1:] - 1)
+    level = numpy.zeros(n, CS_INT)
+    for j in (range(n) if lo != trans else range(n - 1, -1, -1)):
+        rows = Gi[first[j]:last[j]]
+        if len(rows) == 0:
+            continue
+        if trans: # G(j,j)*x(j) = b(j) - G(:,j)'*x
+            level[j] = level[rows].max() + 1
+        else: # x(rows) -= G(rows,j)*x(j)
+            level[rows] = numpy.maximum(level[rows], level[j] + 1)
+    off = numpy.ones(len(Gi), bool)
+    off[diag] = False
+    src, dst = (Gi[off], Gj[off]) if trans else (Gj[off], Gi[off])
+    elev = level[Gj[off]] # level of each off-diagonal entry
+    order = numpy.lexsort((dst, elev))
+    src, dst, vals, elev = src[order], dst[order], Gx[off][order], elev[order]
+    nlev = level.max() + 1 if n > 0 else 0
+    cols = numpy.argsort(level, kind='mergesort')
+    cbound = numpy.searchsorted(level[cols], numpy.arange(nlev + 1))
+    ebound = numpy.searchsorted(elev, numpy.arange(nlev + 1))
+    levels = []
+    for k in range(nlev):
+        J = cols[cbound[k]:cbound[k + 1]]
+        e = slice(ebound[k], ebound[k + 1])
+        targets, start = numpy.unique(dst[e], return_index=True)
+        levels.append((J, Gx[diag[J]], src[e], vals[e], targets, start))
+    return trans, levels
+
+
+def cs_levelsolve(L, x):
+    """Solves a triangular system with a level schedule from cs_levels. x=b
+    on input, solution on output.
+
+    @param L: level schedule
+    @param x: size n array, or n-by-k for k right hand sides, right hand side
+              on input, solution on output
+    @return: true if successful, false on error
+    """
+    if L is None or x is None:
+        return False # check inputs
+    y = _cs_dense(x)
+    trans, levels = L
+    shape = (-1,) + (1,) * (y.ndim - 1) # broadcast over the k columns
+    for J, D, src, vals, targets, start in levels:
+        if not trans:
+            y[J] /= D.reshape(shape) # solve for the columns of this level
+        if len(src):
+            y[targets] -= numpy.add.reduceat(vals.reshape(shape) * y[src], start)
+        if trans:
+            y[J] /= D.reshape(shape)
+    _cs_store(x, y)
+    return True
+
+
+def _cs_tokens(data):
+    """whitespace-separated numbers of a buffer as a float array; raises
+    ValueError if a token is not a number
+    """
+    return numpy.array(data.split(), dtype=CS_FLOAT)
+
+
+def _cs_triplets(data, ncol=3):
+    """parse a buffer of "i j aij" lines into an ncol-column array, None on
+    error
+    """
+    end = len(data)
+    while end > 0 and data[end - 1:end].isspace():
+        end -= 1 # ignore trailing blank lines
+    data = data[:end]
+    nlines = data.count(b'\n') + (1 if end > 0 else 0)
+    c = numpy.frombuffer(data, numpy.uint8)
+    space = (c == 32) | ((c >= 9) & (c <= 13)) # blanks, tabs and newlines
+    first = ~space # first character of each token
+    first[1:] &= space[:-1]
+    first = numpy.flatnonzero(first)
+    ends = numpy.append(numpy.searchsorted(first, numpy.flatnonzero(c == 10)),
+                        len(first)) # tokens up to the end of each line
+    if (ends != ncol * numpy.arange(1, nlines + 1)).any():
+        return None # each line must hold exactly ncol values
+    try:
+        tokens = _cs_tokens(data)
+    except ValueError:
+        return None
+    tokens = tokens.reshape(nlines, ncol)
+    ij = tokens[:, :2]
+    if (ij != numpy.floor(ij)).any():
+        return None # indices must be integers
+    return tokens
+
+
+def _cs_append(T, i, j, x):
+    """append entries to a triplet matrix, growing T if necessary
+    """
+    nz = T.nz + len(i)
+    if nz > T.nzmax:
+        cs_sprealloc(T, max(nz, 2 * T.nzmax))
+    T.i[T.nz:nz] = i
+    T.p[T.nz:nz] = j
+    if T.x is not None:
+        T.x[T.nz:nz] = x
+    T.nz = nz
+
+
+def cs_load(filename, base=0, chunk=0):
     """Loads a triplet matrix T from a file. Each line of the file contains
     three values: a row index i, a column index j, and a numerical value aij.
     The file is zero-based.
 
     @param filename: file name
     @param base: index base
+    @param chunk: number of lines parsed at a time, whole file at once if 0
     @return: T if successful, null on error
     """
     T = cs_spalloc(0, 0, 1, True, True) # allocate result
     with open(filename, 'rb') as fd:
-        for line in fd:
-            tokens = line.strip().split()
-            if len(tokens) != 3:
+        while True:
+            data = fd.read() if chunk <= 0 else b''.join(islice(fd, chunk))
+            if not data:
+                break
+            tokens = _cs_triplets(data)
+            if tokens is None:
                 return None
-            i = int(tokens[0]) - base
-            j = int(tokens[1]) - base
-            x = float(tokens[2])
-            if not cs_entry(T, i, j, x):
+            i = tokens[:, 0].astype(CS_INT) - base
+            j = tokens[:, 1].astype(CS_INT) - base
+            if len(i) > 0 and (i.min() < 0 or j.min() < 0):
                 return None
+            _cs_append(T, i, j, tokens[:, 2])
+            if len(i) > 0:
+                T.m = max(T.m, i.max() + 1)
+                T.n = max(T.n, j.max() + 1)
+            if chunk <= 0:
+                break
     return T
 
 
 def cs_lsolve(L, x):
     """Solves a lower triangular system Lx=b where x and b are dense. x=b on
-    input, solution on output.
+    input, solution on output. L must not have duplicate entries.
 
     @param L: column-compressed, lower triangular matrix
-    @param x: size n, right hand side on input, solution on output
+    @param x: size n, or n-by-k for k right hand sides, right hand side on
+              input, solution on output
     @return: true if successful, false on error
     """
-    if not CS_CSC(L) or x == None:
+    if not CS_CSC(L) or x is None:
         return False # check inputs
+    y = _cs_dense(x)
     n, Lp, Li, Lx = L.n, L.p, L.i, L.x
     for j in range(n):
-        x[j] /= Lx[Lp[j]]
-        for p in range(Lp[j] + 1, Lp[j + 1]):
-            x[Li[p]] -= Lx[p] * x[j]
+        y[j] /= Lx[Lp[j]]
+        p = slice(Lp[j] + 1, Lp[j + 1])
+        y[Li[p]] -= numpy.multiply.outer(Lx[p], y[j]) # all k columns at once
+    _cs_store(x, y)
     return True
 
 
@@ -1350,18 +2795,21 @@ def cs_ltsolve(L, x):
     input, solution on output.
 
     @param L: column-compressed, lower triangular matrix
-    @param x: size n, right hand side on input, solution on output
+    @param x: size n, or n-by-k for k right hand sides, right hand side on
+              input, solution on output
     @return true if successful, false on error
     """
-    if not CS_CSC(L) or x == None:
+    if not CS_CSC(L) or x is None:
         return False # check inputs
+    y = _cs_dense(x)
     n, Lp, Li, Lx = L.n, L.p, L.i, L.x
     j = n - 1
     while j >= 0:
-        for p in range(Lp[j] + 1, Lp[j + 1]):
-            x[j] -= Lx[p] * x[Li[p]]
-        x[j] /= Lx[Lp[j]]
+        p = slice(Lp[j] + 1, Lp[j + 1])
+        y[j] -= numpy.dot(Lx[p], y[Li[p]])
+        y[j] /= Lx[Lp[j]]
         j-=1
+    _cs_store(x, y)
     return True
 
 
@@ -1375,25 +2823,19 @@ def cs_lu(A, S, tol):
     @param tol: partial pivoting threshold (1 for partial pivoting)
     @return: numeric LU factorization, null on error
     """
-    if not CS_CSC(A) or S == None:
+    if not CS_CSC(A) or S is None:
         return None # check inputs
     n, q = A.n, S.q
     lnz = S.lnz
     unz = S.unz
     x = xalloc(n) # get double workspace
-    xi = ialloc(2 * n) # get int workspace
+    xi = [0] * (2 * n) # get int workspace
     N = csn() # allocate result
     N.L = L = cs_spalloc(n, n, lnz, True, False) # allocate result L
     N.U = U = cs_spalloc(n, n, unz, True, False) # allocate result U
-    N.pinv = pinv = ialloc(n) # allocate result pinv
+    N.pinv = pinv = numpy.full(n, -1, CS_INT) # no rows pivotal yet
     Lp = L.p
     Up = U.p
-    for i in range(n):
-        x[i] = 0 # clear workspace
-    for i in range(n):
-        pinv[i] = -1 # no rows pivotal yet
-    for k in range(n+1):
-        Lp[k] = 0 # no cols of L yet
     lnz = unz = 0
     for k in range(n): # compute L(:,k) and U(:,k)
         # --- Triangular solve ---------------------------------------------
@@ -1404,28 +2846,29 @@ def cs_lu(A, S, tol):
         if unz + n > U.nzmax:
             cs_sprealloc(U, 2 * U.nzmax + n)
         Li, Lx, Ui, Ux = L.i, L.x, U.i, U.x
-        col = q[k] if q != None else k
+        col = q[k] if q is not None else k
         top = cs_spsolve(L, A, col, xi, x, pinv, True) # x = L\A(:,col)
         # --- Find pivot ---------------------------------------------------
-        ipiv = -1
-        a = -1
-        for p in range(top, n):
-            i = xi[p] # x(i) is nonzero
-            if pinv[i] < 0: # row i is not yet pivotal
-                t = abs(x[i])
-                if t > a:
-                    a = t # largest pivot candidate so far
-                    ipiv = i
-            else: # x(i) is the entry U(pinv[i],k)
-                Ui[unz] = pinv[i]
-                Ux[unz] = x[i]
-                unz+=1
-        if ipiv == -1 or a <= 0:
+        pattern = numpy.array(xi[top:n], dtype=CS_INT) # x(i) is nonzero
+        rows = pinv[pattern]
+        free = pattern[rows < 0] # rows not yet pivotal
+        upper = rows >= 0 # x(i) is the entry U(pinv[i],k)
+        if len(free) == 0:
             return None
+        t = numpy.abs(x[free])
+        t[numpy.isnan(t)] = -1 # never a pivot
+        a = t.max() # largest pivot candidate
+        if a <= 0:
+            return None
+        ipiv = free[numpy.argmax(t)]
         if pinv[col] < 0 and abs(x[col]) >= a * tol:
             ipiv = col
         # --- Divide by pivot ----------------------------------------------
         pivot = x[ipiv] # the chosen pivot
+        nu = numpy.count_nonzero(upper)
+        Ui[unz:unz + nu] = rows[upper]
+        Ux[unz:unz + nu] = x[pattern[upper]]
+        unz += nu
         Ui[unz] = k # last entry in U(:,k) is U(k,k)
         Ux[unz] = pivot
         unz+=1
@@ -1433,49 +2876,87 @@ def cs_lu(A, S, tol):
         Li[lnz] = ipiv # first entry in L(:,k) is L(k,k) = 1
         Lx[lnz] = 1
         lnz+=1
-        for p in range(n): # L(k+1:n,k) = x / pivot
-            i = xi[p]
-            if pinv[i] < 0: # x(i) is an entry in L(:,k)
-                Li[lnz] = i # save unpermuted row in L
-                Lx[lnz] = x[i] / pivot # scale pivot column
-                lnz+=1
-            x[i] = 0 # x [0..n-1] = 0 for next k
+        lower = free[free != ipiv] # x(i) is an entry in L(:,k)
+        Li[lnz:lnz + len(lower)] = lower # save unpermuted row in L
+        Lx[lnz:lnz + len(lower)] = x[lower] / pivot # scale pivot column
+        lnz += len(lower)
+        x[pattern] = 0 # x [0..n-1] = 0 for next k
     # --- Finalize L and U -------------------------------------------------
     Lp[n] = lnz
     Up[n] = unz
-    Li = L.i # fix row indices of L for final pinv
-    for p in range(lnz):
-        Li[p] = pinv[Li[p]]
+    L.i[:lnz] = pinv[L.i[:lnz]] # fix row indices of L for final pinv
     cs_sprealloc(L, 0) # remove extra space from L and U
     cs_sprealloc(U, 0)
     return N
 
 
+def cs_lurefactor(A, S, N, tol):
+    """Numeric LU refactorization of a matrix with the pattern N was computed
+    for. The pivot sequence and the patterns of L and U (in the topological
+    order found by cs_lu) are reused and only the values are recomputed; if
+    a pivot fails the partial pivoting test the matrix is factorized again
+    with cs_lu.
+
+    @param A: column-compressed matrix, with the pattern N was computed for
+    @param S: symbolic LU analysis
+    @param N: numeric LU factorization, not modified
+    @param tol: partial pivoting threshold (1 for partial pivoting)
+    @return: numeric LU factorization sharing the patterns of N, null on error
+    """
+    if not CS_CSC(A) or S is None or N is None:
+        return None # check inputs
+    n, q = A.n, S.q
+    Ap, Ai, Ax = A.p, numpy.asarray(A.i), numpy.asarray(A.x)
+    L, U, pinv = N.L, N.U, numpy.asarray(N.pinv)
+    Lp, Li, Up, Ui = L.p, L.i, U.p, U.i
+    Lx = xalloc(L.nzmax) # values of the result
+    Ux = xalloc(U.nzmax)
+    x = xalloc(n) # get double workspace
+    for k in range(n):
+        col = q[k] if q is not None else k
+        x[pinv[Ai[Ap[col]:Ap[col + 1]]]] = Ax[Ap[col]:Ap[col + 1]] # x = P*A(:,col)
+        for p in range(Up[k], Up[k + 1] - 1): # x = L\x in topological order
+            j = Ui[p]
+            Ux[p] = xj = x[j] # U(j,k)
+            x[j] = 0
+            rows = Li[Lp[j] + 1:Lp[j + 1]]
+            x[rows] -= Lx[Lp[j] + 1:Lp[j + 1]] * xj
+        pivot = x[k]
+        x[k] = 0
+        rows = Li[Lp[k] + 1:Lp[k + 1]]
+        lk = x[rows]
+        x[rows] = 0 # x [0..n-1] = 0 for next k
+        if pivot == 0 or (len(lk) and abs(pivot) < tol * abs(lk).max()):
+            return cs_lu(A, S, tol) # pivot too small, choose new pivots
+        Ux[Up[k + 1] - 1] = pivot # last entry in U(:,k) is U(k,k)
+        Lx[Lp[k]] = 1
+        Lx[Lp[k] + 1:Lp[k + 1]] = lk / pivot # L(k+1:n,k) = x / pivot
+    R = csn()
+    R.pinv = N.pinv
+    R.L, R.U = cs(), cs()
+    for C, F, Cx in ((R.L, L, Lx), (R.U, U, Ux)): # share the patterns of N
+        C.m, C.n, C.nz, C.nzmax = F.m, F.n, F.nz, F.nzmax
+        C.p, C.i, C.x = F.p, F.i, Cx
+    return R
+
+
 # Solve Ax=b using sparse LU factorization.
 
 def cs_lusol(order, A, b, tol):
     """Solves Ax=b, where A is square and nonsingular. b overwritten with
     solution. Partial pivoting if tol = 1.
 
-    @param order: ordering method to use (0 to 3)
+    @param order: ordering method to use (0 to 7)
     @param A: column-compressed matrix
-    @param b: size n, b on input, x on output
+    @param b: size n, or n-by-k for k right hand sides, b on input, x on
+              output
     @param tol: partial pivoting tolerance
     @return: true if successful, false on error
     """
-    if not CS_CSC(A) or b == None:
+    if not CS_CSC(A) or b is None:
         return False # check inputs
-    n = A.n
-    S = cs_sqr(order, A, False) # ordering and symbolic analysis
-    N = cs_lu(A, S, tol) # numeric LU factorization
-    x = xalloc(n) # get workspace
-    ok = S != None and N != None
-    if ok:
-        cs_ipvec(N.pinv, b, x, n) # x = b(p)
-        cs_lsolve(N.L, x) # x = L\x
-        cs_usolve(N.U, x) # x = U\x
-        cs_ipvec(S.q, x, b, n) # b(q) = x
-    return ok
+    F = cs_factor('lu', order, A, tol) # ordering, symbolic and numeric
+    return F is not None and F.solve(b)
 
 
 # Maximum transveral (permutation for zero-free diagonal).
@@ -1487,6 +2968,7 @@ def _cs_augment(k, A, jmatch, jmatch_offset, cheap, cheap_offset,
     head = 0
     i = -1
     Ap,Ai = A.p, A.i
+    cols = [] # cols[head]: start and rows of A(:,js[head]), for the scans
     found = False
     js[js_offset + 0] = k # start with just node k in jstack
     while head >= 0:
@@ -1494,27 +2976,36 @@ def _cs_augment(k, A, jmatch, jmatch_offset, cheap, cheap_offset,
         j = js[js_offset + head] # get j from top of jstack
         if w[w_offset + j] != k: # 1st time j visited for kth path
             w[w_offset + j] = k # mark j as visited for kth path
+            pj = Ap[j]
+            rows = Ai[pj:Ap[j + 1]].tolist()
+            if head < len(cols):
+                cols[head] = (pj, rows)
+            else:
+                cols.append((pj, rows))
             p = cheap[cheap_offset + j]
-            while p < Ap[j + 1] and found:
-                i = Ai[p] # try a cheap assignment (i,j)
+            while p < pj + len(rows) and not found:
+                i = rows[p - pj] # try a cheap assignment (i,j)
                 found = jmatch[jmatch_offset + i] == -1
                 p+=1
             cheap[cheap_offset + j] = p # start here next time j is traversed
             if found:
                 is_[is_offset + head] = i # column j matched with row i
                 break # end of augmenting path
-            ps[ps_offset + head] = Ap[j] # no cheap match: start dfs for j
+            ps[ps_offset + head] = pj # no cheap match: start dfs for j
         # --- Depth-first-search of neighbors of j -------------------------
-        for p in range(ps[ps_offset + head], Ap[j + 1]):
-            i = Ai[p] # consider row i
+        pj, rows = cols[head]
+        p = ps[ps_offset + head]
+        while p < pj + len(rows):
+            i = rows[p - pj] # consider row i
             if w[w_offset + jmatch[jmatch_offset + i]] == k:
+                p+=1
                 continue # skip jmatch [i] if marked
             ps[ps_offset + head] = p + 1 # pause dfs of node j
             is_[is_offset + head] = i # i will be matched with j if found
             head+=1
             js[js_offset + head] = jmatch[jmatch_offset + i] # start dfs at column jmatch [i]
             break
-        if p == Ap[j + 1]:
+        if p == pj + len(rows):
             head-=1 # node j is done; pop from stack
     # augment the match if path found:
     if found:
@@ -1532,38 +3023,26 @@ def cs_maxtrans(A, seed): # [jmatch [0..m-1]; imatch [0..n-1]]
     @param seed: 0: natural, -1: reverse, randomized otherwise
     @return row and column matching, size m+n
     """
-    n2 = m2 = 0
     if not CS_CSC(A):
         return None # check inputs
-    n, m, Ap, Ai = A.n, A.m, A.p, A.i
-    w = jimatch = ialloc(m + n) # allocate result
-    k = 0
-    for j in range(n): # count nonempty rows and columns
-        if Ap[j] < Ap[j + 1]:
-            n2+=1
-        for p in range(Ap[j], Ap[j + 1]):
-            w[Ai[p]] = 1
-            if j == Ai[p]:
-                k+=1 # count entries already on diagonal
+    n, m = A.n, A.m
+    Ap, Ai = numpy.asarray(A.p[:n + 1]), numpy.asarray(A.i[:A.p[n]])
+    jimatch = [0] * (m + n) # allocate result
+    n2 = numpy.count_nonzero(numpy.diff(Ap)) # count nonempty rows and columns
+    m2 = len(numpy.unique(Ai))
+    cols = numpy.repeat(numpy.arange(n), numpy.diff(Ap))
+    k = numpy.count_nonzero(Ai == cols) # count entries already on diagonal
     if k == min(m, n): # quick return if diagonal zero-free
         jmatch = jimatch
         imatch = jimatch
         imatch_offset = m
-        for i in range(k):
-            jmatch[i] = i
-        while i < m:
-            jmatch[i] = -1
-            i+=1
-        for j in range(k):
-            imatch[imatch_offset + j] = j
-        while j < n:
-            imatch[imatch_offset + j] = -1
-            j+=1
-        return jimatch
-    for i in range(m):
-        m2 += w[i]
+        for i in range(m):
+            jmatch[i] = i if i < k else -1
+        for j in range(n):
+            imatch[imatch_offset + j] = j if j < k else -1
+        return numpy.array(jimatch, dtype=CS_INT)
     C = cs_transpose(A, False) if m2 < n2 else A # transpose if needed
-    if C == None:
+    if C is None:
         return None
     n, m, Cp = C.n, C.m, C.p
     jmatch = jimatch
@@ -1574,7 +3053,7 @@ def cs_maxtrans(A, seed): # [jmatch [0..m-1]; imatch [0..n-1]]
         jmatch_offset = n
     else:
         imatch_offset = m
-    w = ialloc(5 * n) # get workspace
+    w = [0] * (5 * n) # get workspace
     cheap = w
     cheap_offset = n
     js = w
@@ -1589,9 +3068,9 @@ def cs_maxtrans(A, seed): # [jmatch [0..m-1]; imatch [0..n-1]]
         w[j] = -1 # all columns unflagged
     for i in range(m):
         jmatch[jmatch_offset + i] = -1 # nothing matched yet
-    q = cs_randperm(n, seed) # q = random permutation
+    q = _cs_list(cs_randperm(n, seed)) # q = random permutation, an n-vector
     for k in range(n): # augment, starting at column q[k]
-        _cs_augment(q[k] if q != None else k, C, jmatch, jmatch_offset,
+        _cs_augment(q[k] if q is not None else k, C, jmatch, jmatch_offset,
                     cheap, cheap_offset, w, 0, js, js_offset,
                     is_, is_offset, ps, ps_offset)
     q = None
@@ -1600,48 +3079,503 @@ def cs_maxtrans(A, seed): # [jmatch [0..m-1]; imatch [0..n-1]]
     for i in range(m):
         if jmatch[jmatch_offset + i] >= 0:
             imatch[imatch_offset + jmatch[jmatch_offset + i]] = i
-    return jimatch
+    return numpy.array(jimatch, dtype=CS_INT)
+
+
+# Matrix Market files.
+
+CS_MM_CHUNK = 65536 # entries read or written at a time
+
+
+def _cs_open(filename, mode):
+    """open a matrix file, gzip-compressed if its name ends in .gz
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode)
+    return open(filename, mode)
+
+
+def _cs_mmheader(fd):
+    """read the banner and size line of a coordinate Matrix Market file
+    """
+    banner = fd.readline().split()
+    if len(banner) != 5 or banner[0] != b'%%MatrixMarket':
+        return None
+    obj, fmt, field, symmetry = [t.lower().decode('ascii') for t in banner[1:]]
+    if obj != 'matrix' or fmt != 'coordinate':
+        return None # dense array format is not supported
+    if field not in ('real', 'integer', 'pattern'):
+        return None # complex matrices are not supported
+    if symmetry not in ('general', 'symmetric', 'skew-symmetric'):
+        return None
+    line = fd.readline()
+    while line.startswith(b'%') or (line and not line.strip()):
+        line = fd.readline() # skip comments and blank lines
+    size = line.split()
+    if len(size) != 3:
+        return None
+    m, n, nz = [int(t) for t in size]
+    return field, symmetry, m, n, nz
+
+
+def _cs_mmentries(fd, field, symmetry, m, n, nz, expand, chunk):
+    """yield the entries of a Matrix Market file as zero-based (i, j, x)
+    arrays, chunk lines at a time; yields None on error
+    """
+    ncol = 2 if field == 'pattern' else 3
+    lines = iter(fd.readline, b'')
+    count = 0
+    while True:
+        data = b''.join(islice(lines, chunk))
+        if not data:
+            break
+        tokens = _cs_triplets(data, ncol)
+        if tokens is None:
+            yield None
+            return
+        i = tokens[:, 0].astype(CS_INT) - 1
+        j = tokens[:, 1].astype(CS_INT) - 1
+        x = tokens[:, 2] if ncol == 3 else None
+        count += len(i)
+        if count > nz or (len(i) > 0 and (i.min() < 0 or j.min() < 0 or
+                                          i.max() >= m or j.max() >= n)):
+            yield None
+            return
+        if symmetry != 'general':
+            sign = -1 if symmetry == 'skew-symmetric' else 1
+            if expand: # A(j,i) = A(i,j) for each off-diagonal entry
+                off = i != j
+                i, j = numpy.concatenate((i, j[off])), numpy.concatenate((j, i[off]))
+                if x is not None:
+                    x = numpy.concatenate((x, sign * x[off]))
+            else: # keep the upper triangular part, as used by cs_chol
+                i, j = j, i
+                if x is not None and sign < 0:
+                    x = -x
+        yield i, j, x
+    if count != nz:
+        yield None
+
+
+def cs_mmread(filename, triplet=True, expand=False, chunk=CS_MM_CHUNK):
+    """Reads a matrix from a coordinate Matrix Market file (gzip-compressed if
+    the file name ends in .gz). Only chunk lines of text are held in memory
+    at a time. The lower triangle stored in a symmetric or skew-symmetric
+    file is returned as the upper triangular part of the matrix, unless
+    expand is true. Pattern matrices have no numerical values.
+
+    @param filename: file name
+    @param triplet: return a triplet matrix if true, compressed-column otherwise
+    @param expand: return both triangles of a symmetric matrix if true
+    @param chunk: number of lines parsed at a time
+    @return: T or C if successful, null on error
+    """
+    with _cs_open(filename, 'rb') as fd:
+        header = _cs_mmheader(fd)
+        if header is None:
+            return None
+        field, symmetry, m, n, nz = header
+        values = field != 'pattern'
+        if triplet:
+            full = expand and symmetry != 'general'
+            T = cs_spalloc(m, n, 2 * nz if full else nz, values, True) # allocate result
+            for entries in _cs_mmentries(fd, field, symmetry, m, n, nz, expand, chunk):
+                if entries is None:
+                    return None
+                _cs_append(T, *entries)
+            if full:
+                cs_sprealloc(T, 0) # remove extra space from T
+            return T
+        w = ialloc(n) # first pass: column counts
+        for entries in _cs_mmentries(fd, field, symmetry, m, n, nz, expand, chunk):
+            if entries is None:
+                return None
+            w += numpy.bincount(entries[1], minlength=n)
+    C = cs_spalloc(m, n, w.sum(), values, False) # allocate result
+    cs_cumsum(C.p, w, n) # column pointers
+    with _cs_open(filename, 'rb') as fd: # second pass: place the entries
+        _cs_mmheader(fd)
+        for i, j, x in _cs_mmentries(fd, field, symmetry, m, n, nz, expand, chunk):
+            order = numpy.argsort(j, kind='mergesort')
+            j = j[order]
+            counts = numpy.bincount(j, minlength=n)
+            start = numpy.cumsum(counts) - counts # start of each column in chunk
+            pos = w[j] + numpy.arange(len(j)) - start[j]
+            C.i[pos] = i[order]
+            if values:
+                C.x[pos] = x[order]
+            w += counts
+    return C
+
+
+def cs_mmwrite(filename, A, sym=False, chunk=CS_MM_CHUNK):
+    """Writes a matrix to a coordinate Matrix Market file (gzip-compressed if
+    the file name ends in .gz), chunk entries at a time. A symmetric matrix
+    is written from the upper triangular part of A.
+
+    @param filename: file name
+    @param A: triplet or column-compressed matrix
+    @param sym: write A as a symmetric matrix if true, general otherwise
+    @param chunk: number of entries formatted at a time
+    @return: true if successful, false on error
+    """
+    if A is None or (sym and A.m != A.n):
+        return False # check inputs
+    m, n = A.m, A.n
+    if CS_CSC(A):
+        nz = A.p[n]
+        Aj = numpy.repeat(numpy.arange(n), numpy.diff(numpy.asarray(A.p)[:n + 1]))
+    else:
+        nz = A.nz
+        Aj = numpy.asarray(A.p)[:nz]
+    Ai = numpy.asarray(A.i)[:nz]
+    Ax = numpy.asarray(A.x)[:nz] if A.x is not None else None
+    if sym: # store triu(A) as the lower triangle
+        upper = Ai <= Aj
+        Ai, Aj = Aj[upper], Ai[upper]
+        if Ax is not None:
+            Ax = Ax[upper]
+        nz = len(Ai)
+    field = 'real' if Ax is not None else 'pattern'
+    symmetry = 'symmetric' if sym else 'general'
+    fmt = '%d %d %.17g' if Ax is not None else '%d %d'
+    with _cs_open(filename, 'wb') as fd:
+        fd.write(('%%%%MatrixMarket matrix coordinate %s %s\n' % (field, symmetry)).encode('ascii'))
+        fd.write(('%d %d %d\n' % (m, n, nz)).encode('ascii'))
+        for p in range(0, nz, chunk):
+            cols = [Ai[p:p + chunk] + 1, Aj[p:p + chunk] + 1]
+            if Ax is not None:
+                cols.append(Ax[p:p + chunk])
+            text = '\n'.join(fmt % e for e in zip(*cols)) + '\n'
+            fd.write(text.encode('ascii'))
+    return True
+
+
+# Binary files of matrices and factorizations.
+
+CS_MAGIC = b'\x93CSPARSE' # first bytes of a binary CSparse.py file
+CS_ALIGN = 64 # arrays in a binary file start on multiples of CS_ALIGN bytes
+
+
+def _cs_record(obj, arrays):
+    """describe obj (cs, css, csn, tuple or None) for the header of a binary
+    file, appending its arrays to the list arrays
+    """
+    def ref(a, n=None, dtype=CS_INT):
+        if a is None:
+            return None
+        a = numpy.asarray(a, None if isinstance(a, numpy.ndarray) else dtype)[:n]
+        arrays.append(numpy.ascontiguousarray(a, a.dtype.newbyteorder('<')))
+        return len(arrays) - 1
+    if obj is None:
+        return None
+    if isinstance(obj, tuple):
+        return {'type': 'tuple', 'items': [_cs_record(o, arrays) for o in obj]}
+    if isinstance(obj, cs):
+        nz = obj.p[obj.n] if CS_CSC(obj) else obj.nz
+        return {'type': 'cs', 'm': int(obj.m), 'n': int(obj.n), 'nz': int(obj.nz),
+                'p': ref(obj.p, obj.n + 1 if CS_CSC(obj) else nz),
+                'i': ref(obj.i, nz), 'x': ref(obj.x, nz, CS_FLOAT)}
+    if isinstance(obj, css):
+        return {'type': 'css', 'm2': int(obj.m2), 'lnz': int(obj.lnz),
+                'unz': int(obj.unz), 'pinv': ref(obj.pinv), 'q': ref(obj.q),
+                'parent': ref(obj.parent), 'cp': ref(obj.cp),
+                'leftmost': ref(obj.leftmost)}
+    if isinstance(obj, csn):
+        return {'type': 'csn', 'L': _cs_record(obj.L, arrays),
+                'U': _cs_record(obj.U, arrays), 'pinv': ref(obj.pinv),
+                'B': ref(obj.B, None, CS_FLOAT)}
+    raise TypeError('cannot save %s' % type(obj).__name__)
+
+
+def _cs_object(rec, arrays):
+    """rebuild the object described by a header record from its arrays
+    """
+    def get(k):
+        return arrays[k] if k is not None else None
+    if rec is None:
+        return None
+    if rec['type'] == 'tuple':
+        return tuple(_cs_object(r, arrays) for r in rec['items'])
+    if rec['type'] == 'cs':
+        A = cs()
+        A.m, A.n, A.nz = rec['m'], rec['n'], rec['nz']
+        A.p, A.i, A.x = get(rec['p']), get(rec['i']), get(rec['x'])
+        A.nzmax = len(A.i)
+        return A
+    if rec['type'] == 'css':
+        S = css()
+        S.m2, S.lnz, S.unz = rec['m2'], rec['lnz'], rec['unz']
+        S.pinv, S.q, S.parent = get(rec['pinv']), get(rec['q']), get(rec['parent'])
+        S.cp, S.leftmost = get(rec['cp']), get(rec['leftmost'])
+        return S
+    N = csn()
+    N.L, N.U = _cs_object(rec['L'], arrays), _cs_object(rec['U'], arrays)
+    N.pinv, N.B = get(rec['pinv']), get(rec['B'])
+    return N
+
+
+def cs_save(filename, obj):
+    """Saves a matrix, symbolic analysis or numeric factorization (or a tuple
+    of them) to a binary file that cs_mmap can map into memory.
+
+    @param filename: file name
+    @param obj: cs, css or csn object, or a tuple of them
+    @return: true if successful, false on error
+    """
+    arrays = []
+    try:
+        rec = _cs_record(obj, arrays)
+    except TypeError:
+        return False
+    table = []
+    end = 0
+    for a in arrays: # offset of each array from the start of the data
+        offset = -(-end // CS_ALIGN) * CS_ALIGN
+        table.append((a.dtype.str, len(a), offset))
+        end = offset + a.nbytes
+    header = repr({'version': 1, 'object': rec, 'arrays': table}).encode('ascii')
+    start = -(-(len(CS_MAGIC) + 8 + len(header)) // CS_ALIGN) * CS_ALIGN
+    header = header.ljust(start - len(CS_MAGIC) - 8)
+    with open(filename, 'wb') as fd:
+        fd.write(CS_MAGIC)
+        fd.write(struct.pack('<Q', len(header)))
+        fd.write(header)
+        for a, (dtype, n, offset) in zip(arrays, table):
+            fd.seek(start + offset)
+            a.tofile(fd)
+        fd.truncate(start + end)
+    return True
+
+
+def cs_mmap(filename, mode='c'):
+    """Opens a binary file written by cs_save. The arrays of the result are
+    views on a memory map of the file, so the pages are shared by all
+    processes mapping it. Arrays are read-only in mode 'r'; in mode 'c'
+    (copy-on-write) pages are copied privately when modified, and in mode
+    'w' changes are written to the file and seen by every process mapping
+    it.
+
+    @param filename: file name
+    @param mode: 'r' for read-only, 'c' for copy-on-write, 'w' for shared
+                 writes
+    @return: the saved object, null on error
+    """
+    access = {'r': mmap.ACCESS_READ, 'w': mmap.ACCESS_WRITE}.get(mode, mmap.ACCESS_COPY)
+    try:
+        with open(filename, 'r+b' if mode == 'w' else 'rb') as fd:
+            if fd.read(len(CS_MAGIC)) != CS_MAGIC:
+                return None
+            size = struct.unpack('<Q', fd.read(8))[0]
+            header = literal_eval(fd.read(size).decode('ascii'))
+            start = len(CS_MAGIC) + 8 + size
+            buf = mmap.mmap(fd.fileno(), 0, access=access)
+        if header['version'] != 1:
+            return None
+        arrays = [numpy.frombuffer(buf, numpy.dtype(dtype), n, start + offset)
+                  for dtype, n, offset in header['arrays']]
+        return _cs_object(header['object'], arrays)
+    except (struct.error, SyntaxError, ValueError, TypeError, KeyError,
+            IndexError):
+        return None # truncated or corrupt file
 
 
 # Sparse matrix multiply.
 
+CS_MULT_CHUNK = 1 << 20 # products formed at a time by cs_multiply
+
 def cs_multiply(A, B):
-    """Sparse matrix multiplication, C = A*B
+    """Sparse matrix multiplication, C = A*B. The products of the entries of
+    A and B are formed for a block of columns of B at a time, at most about
+    CS_MULT_CHUNK of them, and summed by position as cs_scatter would.
 
     @param A: column-compressed matrix
     @param B: column-compressed matrix
     @return: C = A*B, null on error
     """
-    nz = 0
     if not CS_CSC(A) or not CS_CSC(B):
         return None # check inputs
     if A.n != B.m:
         return None
-    m = A.m
-    anz = A.p[A.n]
-    n, Bp, Bi, Bx = B.n, B.p, B.i, B.x
-    bnz = Bp[n]
-    w = ialloc(m) # get workspace
-    values = (A.x != None) and (Bx != None)
-    x = xalloc(m) if values else None # get workspace
-    C = cs_spalloc(m, n, anz + bnz, values, False) # allocate result
-    Cp = C.p
-    for j in range(n):
-        if nz + m > C.nzmax:
-            cs_sprealloc(C, 2 * (C.nzmax) + m)
-        Ci = C.i
-        Cx = C.x # C.i and C.x may be reallocated
-        Cp[j] = nz # column j of C starts here
-        for p in range(Bp[j], Bp[j + 1]):
-            nz = cs_scatter(A, Bi[p], Bx[p] if Bx != None else 1, w, x, j + 1, C, nz)
+    m, n = A.m, B.n
+    Ap, Bp = numpy.asarray(A.p[:A.n + 1]), numpy.asarray(B.p[:n + 1])
+    Ai, Bi = numpy.asarray(A.i[:Ap[A.n]]), numpy.asarray(B.i[:Bp[n]])
+    values = A.x is not None and B.x is not None
+    Ax = numpy.asarray(A.x[:Ap[A.n]]) if values else None
+    Bx = numpy.asarray(B.x[:Bp[n]]) if values else None
+    C = cs_spalloc(m, n, Ap[A.n] + Bp[n], values, False) # allocate result
+    count = numpy.diff(Ap)[Bi] # products of each entry of B
+    work = numpy.concatenate(([0], numpy.cumsum(count)))[Bp] # before each column
+    nz = j = 0
+    while j < n:
+        j2 = numpy.searchsorted(work, work[j] + CS_MULT_CHUNK, 'right') - 1
+        j2 = min(max(j2, j + 1), n) # columns j to j2-1 of C
+        p1, p2 = Bp[j], Bp[j2]
+        pos = _cs_ranges(Ap[Bi[p1:p2]], count[p1:p2]) # A(:,k) for each B(k,j)
+        cols = numpy.repeat(numpy.repeat(numpy.arange(j, j2), numpy.diff(Bp[j:j2 + 1])),
+                            count[p1:p2])
+        x = Ax[pos] * numpy.repeat(Bx[p1:p2], count[p1:p2]) if values else None
+        cols, rows, x = _cs_sumdupl(cols, Ai[pos], x, m)
+        if nz + len(rows) > C.nzmax:
+            cs_sprealloc(C, 2 * (C.nzmax) + len(rows))
+        C.i[nz:nz + len(rows)] = rows
         if values:
-            for p in range(Cp[j], nz):
-                Cx[p] = x[Ci[p]]
-    Cp[n] = nz # finalize the last column of C
+            C.x[nz:nz + len(rows)] = x
+        C.p[j + 1:j2 + 1] = nz + numpy.cumsum(numpy.bincount(cols - j, minlength=j2 - j))
+        nz += len(rows)
+        j = j2
     cs_sprealloc(C, 0) # remove extra space from C
     return C
 
 
+# Nested dissection ordering.
+
+CS_ND_LEAF = 128 # subgraphs of at most this many nodes are ordered with cs_amd
+
+def _cs_adjacency(A):
+    """pattern of A+A' without the diagonal, sorted and without duplicates
+    """
+    n = A.n
+    Ap = numpy.asarray(A.p[:n + 1])
+    i = numpy.asarray(A.i[:Ap[n]])
+    j = numpy.repeat(numpy.arange(n), numpy.diff(Ap))
+    off = i != j
+    i, j = numpy.concatenate((i[off], j[off])), numpy.concatenate((j[off], i[off]))
+    key = numpy.unique(j * n + i) # by column, then row
+    Gp = numpy.zeros(n + 1, CS_INT)
+    Gp[1:] = numpy.cumsum(numpy.bincount(key // n, minlength=n))
+    return Gp, (key % n).astype(CS_INT)
+
+def _cs_bfs_levels(Gp, Gi, root, part, sid, level):
+    """level sets of a breadth-first search from root within the subgraph
+    part == sid; level[] of those nodes must be -1 on input
+    """
+    front = numpy.array([root], CS_INT)
+    level[root] = 0
+    levels = [front]
+    while True:
+        nb = Gi[_cs_ranges(Gp[front], Gp[front + 1] - Gp[front])]
+        nb = numpy.unique(nb[(part[nb] == sid) & (level[nb] < 0)])
+        if len(nb) == 0:
+            return levels
+        level[nb] = len(levels)
+        levels.append(nb)
+        front = nb
+
+def _cs_peripheral(Gp, Gi, root, part, sid, level):
+    """level sets of a breadth-first search from a pseudo-peripheral node of
+    the subgraph part == sid reachable from root; level[] of those nodes
+    must be -1 on input
+    """
+    levels = None
+    for trial in range(3): # find a pseudo-peripheral node
+        new = _cs_bfs_levels(Gp, Gi, root, part, sid, level)
+        level[numpy.concatenate(new)] = -1
+        if levels is not None and len(new) <= len(levels):
+            break
+        levels = new
+        last = levels[-1]
+        root = last[numpy.argmin(Gp[last + 1] - Gp[last])]
+    return _cs_bfs_levels(Gp, Gi, levels[0][0], part, sid, level)
+
+def _cs_bisect(Gp, Gi, V, part, sid, level):
+    """split the subgraph V (part == sid) into parts A and B and a separator
+    S from the boundary between two levels of a breadth-first search from a
+    pseudo-peripheral node, chosen among balanced splits to minimize
+    |S|/(|A||B|); None if V cannot be dissected
+    """
+    deg = Gp[V + 1] - Gp[V]
+    level[V] = -1
+    levels = _cs_peripheral(Gp, Gi, V[numpy.argmin(deg)], part, sid, level)
+    reached = numpy.concatenate(levels)
+    if len(reached) < len(V): # not connected, no separator needed
+        return reached, ialloc(0), V[level[V] < 0]
+    if len(levels) < 3:
+        return None
+    size = numpy.cumsum([len(L) for L in levels])
+    nv = len(V)
+    best = None
+    for m in range(len(levels) - 1): # separators between levels m and m+1
+        if size[m] < nv // 5 or size[m] > nv - nv // 5:
+            continue # keep the parts balanced
+        for k, other in ((m, m + 1), (m + 1, m)):
+            L = levels[k]
+            nb = Gi[_cs_ranges(Gp[L], Gp[L + 1] - Gp[L])]
+            owner = numpy.repeat(numpy.arange(len(L)), Gp[L + 1] - Gp[L])
+            hit = (part[nb] == sid) & (level[nb] == other)
+            cut = numpy.bincount(owner[hit], minlength=len(L)) > 0 # next to other
+            ns = numpy.count_nonzero(cut)
+            n1 = size[m] - ns if k == m else size[m] # rest of level k joins its side
+            n2 = nv - n1 - ns
+            if n1 == 0 or n2 == 0:
+                continue
+            score = ns / float(n1 * n2)
+            if best is None or score < best[0]:
+                best = (score, m, k, cut)
+    if best is None:
+        return None
+    score, m, k, cut = best
+    L = levels[k]
+    if k == m:
+        A = numpy.concatenate(levels[:m] + [L[~cut]])
+        B = numpy.concatenate(levels[m + 1:])
+    else:
+        A = numpy.concatenate(levels[:m + 1])
+        B = numpy.concatenate([L[~cut]] + levels[m + 2:])
+    return A, L[cut], B
+
+def _cs_leaf_amd(Gp, Gi, V, local):
+    """cs_amd ordering of the subgraph V; local[] must be -1 on input
+    """
+    nv = len(V)
+    local[V] = numpy.arange(nv)
+    nb = Gi[_cs_ranges(Gp[V], Gp[V + 1] - Gp[V])]
+    owner = numpy.repeat(numpy.arange(nv), Gp[V + 1] - Gp[V])
+    keep = local[nb] >= 0
+    C = cs_spalloc(nv, nv, 0, False, False)
+    C.p[1:] = numpy.cumsum(numpy.bincount(owner[keep], minlength=nv))
+    C.i = local[nb[keep]]
+    C.nzmax = max(len(C.i), 1)
+    local[V] = -1
+    P = cs_amd(1, C) if C.p[nv] > 0 else None
+    return V[P[:nv]] if P is not None else V
+
+def cs_nd(A):
+    """Nested dissection ordering of A+A'. The graph is bisected recursively
+    with vertex separators from breadth-first level structures; separators
+    are ordered after the two parts they separate, and subgraphs of at most
+    CS_ND_LEAF nodes are ordered with cs_amd.
+
+    @param A: column-compressed matrix, square
+    @return: permutation vector p, null on error
+    """
+    if not CS_CSC(A) or A.m != A.n:
+        return None # check inputs
+    n = A.n
+    Gp, Gi = _cs_adjacency(A)
+    P = ialloc(n) # allocate result
+    part = numpy.zeros(n, CS_INT) # subgraph of each node
+    level = numpy.full(n, -1, CS_INT) # workspace
+    local = numpy.full(n, -1, CS_INT) # workspace
+    stack = [(numpy.arange(n), 0)] # nodes of a subgraph, first position in P
+    sid = 0
+    while stack:
+        V, lo = stack.pop()
+        split = None
+        if len(V) > CS_ND_LEAF:
+            sid += 1
+            part[V] = sid
+            split = _cs_bisect(Gp, Gi, V, part, sid, level)
+        if split is None:
+            P[lo:lo + len(V)] = _cs_leaf_amd(Gp, Gi, V, local) # order the leaf
+            continue
+        A1, S, A2 = split
+        P[lo + len(A1) + len(A2):lo + len(V)] = S # separator last
+        stack.append((A2, lo + len(A1)))
+        stack.append((A1, lo))
+    return P
+
+
 # Sparse matrix 1-norm.
 
 def cs_norm(A):
@@ -1651,16 +3585,137 @@ def cs_norm(A):
     @param A: column-compressed matrix
     @return: the 1-norm if successful, -1 on error
     """
-    norm = 0
-    if not CS_CSC(A) or A.x == None:
+    if not CS_CSC(A) or A.x is None:
         return -1 # check inputs
-    n, Ap, Ax = A.n, A.p, A.x
-    for j in range(n):
-        s = 0
-        for p in range(Ap[j], Ap[j + 1]):
-            s += abs(Ax[p])
-        norm = max(norm, s)
-    return norm
+    n, Ap = A.n, numpy.asarray(A.p)
+    if n == 0:
+        return 0
+    Ax = numpy.asarray(A.x)[:Ap[n]]
+    cols = numpy.repeat(numpy.arange(n), numpy.diff(Ap[:n + 1])) # column of each entry
+    return numpy.bincount(cols, numpy.abs(Ax), n).max() # largest column sum
+
+
+# Parallel supernodal Cholesky.
+
+def _cs_subtree(task):
+    """factorize the supernodes of a subtree, in increasing order, in a
+    worker process. C = tril(PAP') and L are mapped from the file written by
+    cs_parchol, and the columns of L in the subtree are written to the map.
+    Returns the update matrix of the root of the subtree; None if not
+    positive definite
+    """
+    name, members, first, last, sparent = task
+    C, L = cs_mmap(name, 'w')
+    updates = dict((s, []) for s in members)
+    root = (ialloc(0), xalloc(0).reshape(0, 0))
+    for s, f, l, p in zip(members, first, last, sparent):
+        U = _cs_front(f, l, C.p, C.i, C.x, updates.pop(s), L.p, L.i, L.x)
+        if U is None:
+            return None
+        if len(U[0]) and p in updates:
+            updates[p].append(U)
+        elif len(U[0]):
+            root = U # passed to the parent outside the subtree
+    return root
+
+def cs_parchol(A, S, nproc=None, pool=None):
+    """Parallel supernodal Cholesky factorization LL=PAP'. The supernodal
+    elimination tree is split into subtrees of balanced work, which are
+    factorized by a pool of processes. C=tril(PAP') and L are held in a file
+    in CS_SHM that every process maps into memory (see cs_mmap), so each
+    process writes its columns of L in place and only the update matrices
+    of the subtree roots are sent back. The supernodes above the subtrees
+    are then factorized in this process, as in cs_superchol. L.i and L.x
+    of the result are views on the map of the file, which is removed once
+    mapped.
+
+    @param A: column-compressed matrix, only upper triangular part is used
+    @param S: symbolic Cholesky analysis, pinv is optional
+    @param nproc: number of processes the work is split for, number of CPUs
+                  if None
+    @param pool: multiprocessing pool to use; if None, a pool of nproc
+                 processes is created on first use and kept in this module
+                 for later calls with the same nproc, also by cs_autoorder,
+                 until cs_pool_close. In a daemonic process, which cannot
+                 start a pool, this is cs_superchol
+    @return: numeric Cholesky factorization, null on error
+    """
+    if not CS_CSC(A) or S is None or S.cp is None or S.parent is None:
+        return None # check inputs
+    if nproc is None:
+        nproc = multiprocessing.cpu_count()
+    n, cp = A.n, numpy.asarray(S.cp[:A.n + 1])
+    snode = _cs_supernodes(S.parent, cp, n)
+    ns = len(snode) - 1
+    if pool is None and nproc > 1 and ns > 1:
+        pool = _cs_pool(nproc) # None in a daemonic process
+    if pool is None or ns <= 1:
+        return cs_superchol(A, S)
+    Cp, Ci, amap = _cs_symmap(A, S.pinv, True) # C = tril(PAP')
+    keep = amap >= 0
+    Cx = numpy.bincount(amap[keep], weights=numpy.asarray(A.x)[:len(amap)][keep],
+            minlength=Cp[n])
+    sn = numpy.repeat(numpy.arange(ns), numpy.diff(snode)) # supernode of each column
+    parent = numpy.asarray(S.parent[:n])[snode[1:] - 1]
+    sparent = numpy.where(parent >= 0, sn[numpy.maximum(parent, 0)], -1)
+    c = numpy.diff(cp).astype(CS_FLOAT)
+    work = numpy.bincount(sn, weights=c * c, minlength=ns) # flops of each supernode
+    children = [[] for s in range(ns)]
+    for s in range(ns): # work of each subtree, children before parents
+        if sparent[s] >= 0:
+            work[sparent[s]] += work[s]
+            children[sparent[s]].append(s)
+    heap = [(-work[s], s) for s in range(ns) if sparent[s] < 0]
+    heapq.heapify(heap)
+    target = work[sparent < 0].sum() / (2 * nproc) # work of a task
+    task = numpy.zeros(ns, bool) # roots of the subtree tasks
+    while -heap[0][0] > target and children[heap[0][1]]:
+        s = heapq.heappop(heap)[1] # split the largest subtree
+        for t in children[s]:
+            heapq.heappush(heap, (-work[t], t))
+    roots = sorted([s for w, s in heap], key=lambda s: -work[s])
+    task[roots] = True
+    label = numpy.full(ns, -1, CS_INT) # subtree task of each supernode
+    for s in range(ns - 1, -1, -1): # parents before children
+        if task[s]:
+            label[s] = s
+        elif sparent[s] >= 0:
+            label[s] = label[sparent[s]]
+    C = cs() # C and the pattern of L, shared with the workers
+    C.m, C.n, C.nz, C.nzmax = n, n, -1, len(Ci)
+    C.p, C.i, C.x = Cp, Ci, Cx
+    L = cs_spalloc(n, n, cp[n], True, False)
+    L.p[:] = cp
+    fd, name = tempfile.mkstemp('.csb', dir=CS_SHM)
+    os.close(fd)
+    try:
+        if not cs_save(name, (C, L)):
+            return None
+        tasks = []
+        for s in roots: # supernodes of each subtree
+            members = numpy.flatnonzero(label == s)
+            tasks.append((name, members, snode[members], snode[members + 1],
+                          sparent[members]))
+        results = pool.map(_cs_subtree, tasks, 1)
+        if any(r is None for r in results):
+            return None # not pos def
+        L = cs_mmap(name, 'w')[1] # L as written by the workers
+    finally:
+        os.remove(name) # the map stays valid
+    N = csn() # allocate result
+    N.L = L
+    Lp, Li, Lx = L.p, L.i, L.x
+    updates = dict((s, []) for s in numpy.flatnonzero(label < 0))
+    for s, U in zip(roots, results):
+        if len(U[0]):
+            updates[sparent[s]].append(U)
+    for s in sorted(updates): # the supernodes above the subtrees
+        U = _cs_front(snode[s], snode[s + 1], Cp, Ci, Cx, updates.pop(s), Lp, Li, Lx)
+        if U is None:
+            return None
+        if len(U[0]):
+            updates[sparent[s]].append(U)
+    return N
 
 
 def cs_permute(A, pinv, q, values):
@@ -1672,24 +3727,24 @@ def cs_permute(A, pinv, q, values):
     @param values: allocate pattern only if false, values and pattern otherwise
     @return: C = PAQ, null on error
     """
-    nz = 0
 #    int t, j, k, , m, n, Ap[], Ai[], Cp[], Ci[];
 #    double Cx[], Ax[];
 #    Dcs C;
     if not CS_CSC(A):
         return None # check inputs
-    m, n, Ap, Ai, Ax = A.m, A.n, A.p, A.i, A.x
-    C = cs_spalloc(m, n, Ap[n], values and Ax != None, False) # alloc result
+    m, n, Ap, Ai, Ax = A.m, A.n, numpy.asarray(A.p[:A.n + 1]), A.i, A.x
+    C = cs_spalloc(m, n, Ap[n], values and Ax is not None, False) # alloc result
     Cp, Ci, Cx = C.p, C.i, C.x
-    for k in range(n):
-        Cp[k] = nz # column k of C is column q[k] of A
-        j = q[k] if q != None else k
-        for t in range(Ap[j], Ap[j + 1]):
-            if Cx != None:
-                Cx[nz] = Ax[t] # row i of A is row pinv[i] of C
-            Ci[nz] = pinv[Ai[t]] if pinv != None else Ai[t]
-            nz+=1
-    Cp[n] = nz # finalize the last column of C
+    cols = numpy.asarray(q[:n]) if q is not None else numpy.arange(n)
+    count = Ap[cols + 1] - Ap[cols] # column k of C is column q[k] of A
+    Cp[1:] = numpy.cumsum(count)
+    t = _cs_ranges(Ap[cols], count) # positions in A of the entries of C
+    nz = len(t)
+    Ci[:nz] = numpy.asarray(Ai)[t]
+    if pinv is not None:
+        Ci[:nz] = numpy.asarray(pinv)[Ci[:nz]] # row i of A is row pinv[i] of C
+    if Cx is not None:
+        Cx[:nz] = numpy.asarray(Ax)[t]
     return C
 
 
@@ -1700,11 +3755,10 @@ def cs_pinv(p, n):
     @param n: length of p
     @return: pinv, null on error
     """
-    if p == None:
+    if p is None:
         return None # p = NULL denotes identity
     pinv = ialloc(n) # allocate result
-    for k in range(n):
-        pinv[p[k]] = k # invert the permutation
+    pinv[numpy.asarray(p[:n])] = numpy.arange(n) # invert the permutation
     return pinv # return result
 
 
@@ -1716,10 +3770,11 @@ def cs_post(parent, n):
     @return: post[k]=i, null on error
     """
     k = 0
-    if parent == None:
+    if parent is None:
         return None # check inputs
-    post = ialloc(n) # allocate result
-    w = ialloc(3 * n) # get workspace
+    parent = _cs_list(parent) # n-vector, for the scalar loops
+    post = [0] * n # allocate result
+    w = [0] * (3 * n) # get workspace
     head = w
     next = w
     next_offset = n
@@ -1739,7 +3794,7 @@ def cs_post(parent, n):
         if parent[j] != -1:
             continue # skip j if it is not a root
         k = cs_tdfs(j, k, head, 0, next, next_offset, post, 0, stack, stack_offset)
-    return post
+    return numpy.array(post, dtype=CS_INT)
 
 
 def cs_print(A, brief):
@@ -1749,7 +3804,7 @@ def cs_print(A, brief):
     @param brief: print all of A if false, a few entries otherwise
     @return: true if successful, false on error
     """
-    if A == None:
+    if A is None:
         stdout.write("(null)\n")
         return False
     m, n, Ap, Ai, Ax = A.m, A.n, A.p, A.i, A.x
@@ -1762,14 +3817,14 @@ def cs_print(A, brief):
         for j in range(n):
             stdout.write("    col %d : locations %d to %d\n" % (j, Ap[j], Ap[j + 1] - 1))
             for p in range(Ap[j], Ap[j + 1]):
-                stdout.write("      %d : %g\n" % (Ai[p], Ax[p] if Ax != None else 1))
+                stdout.write("      %d : %g\n" % (Ai[p], Ax[p] if Ax is not None else 1))
                 if brief and p > 20:
                     stdout.write("  ...\n")
                     return True
     else:
         stdout.write("triplet: %d-by-%d, nzmax: %d nnz: %d\n" % (m, n, nzmax, nz))
         for p in range(nz):
-            stdout.write("    %d %d : %g\n" % (Ai[p], Ap[p], Ax[p] if Ax != None else 1))
+            stdout.write("    %d %d : %g\n" % (Ai[p], Ap[p], Ax[p] if Ax is not None else 1))
             if brief and p > 20:
                 stdout.write("  ...\n")
                 return True
@@ -1780,15 +3835,18 @@ def cs_pvec(p, b, x, n):
     """Permutes a vector, x=P*b, for dense vectors x and b.
 
     @param p: permutation vector, p=null denotes identity
-    @param b: input vector
+    @param b: input vector, or array whose rows are permuted
     @param x: output vector, x=P*b
     @param n: length of p, b and x
     @return: true if successful, false otherwise
     """
-    if x == None or b == None:
+    if x is None or b is None:
         return False # check inputs
+    if isinstance(x, numpy.ndarray): # all n entries at once
+        x[:n] = numpy.asarray(b)[numpy.asarray(p[:n]) if p is not None else slice(0, n)]
+        return True
     for k in range(n):
-        x[k] = b[p[k] if p != None else k]
+        x[k] = b[p[k] if p is not None else k]
     return True
 
 
@@ -1801,20 +3859,20 @@ def cs_qr(A, S):
     @param S: symbolic QR analysis
     @return: numeric QR factorization, null on error
     """
-    if not CS_CSC(A) or S == None:
+    if not CS_CSC(A) or S is None:
         return None
     n, Ap, Ai, Ax = A.n, A.p, A.i, A.x
     q, parent, pinv, m2, vnz, rnz, leftmost = S.q, S.parent, S.pinv, S.m2, S.lnz, S.unz, S.leftmost
-    w = ialloc(m2 + n) # get int workspace
+    parent, leftmost = _cs_list(parent), _cs_list(leftmost) # n- and m-vectors
+    w = [0] * (m2 + n) # get int workspace
     x = xalloc(m2) # get double workspace
     N = csn() # allocate result
     s = w
     s_offset = m2 # s is size n
-    for k in range(m2):
-        x[k] = 0 # clear workspace x
     N.L = V = cs_spalloc(m2, n, vnz, True, False) # allocate result V
     N.U = R = cs_spalloc(m2, n, rnz, True, False) # allocate result R
-    N.B = Beta = xalloc(n) # allocate result Beta
+    Beta = [0.0] * n # allocate result Beta
+    N.pinv = pinv
     Rp, Ri, Rx = R.p, R.i, R.x
     Vp, Vi, Vx = V.p, V.i, V.x
     for i in range(m2):
@@ -1823,42 +3881,49 @@ def cs_qr(A, S):
     vnz = 0
     for k in range(n): # compute V and R
         Rp[k] = rnz # R(:,k) starts here
-        Vp[k] = p1 = vnz # V(:,k) starts here
+        Vp[k] = vnz # V(:,k) starts here
         w[k] = k # add V(k,k) to pattern of V
-        Vi[vnz] = k
-        vnz+=1
+        vk = [k] # pattern of V(:,k)
         top = n
-        col = q[k] if q != None else k
-        for p in range(Ap[col], Ap[col + 1]): # find R(:,k) pattern
-            i = leftmost[Ai[p]] # i = min(find(A(i,q)))
-            len = 0
+        col = q[k] if q is not None else k
+        p = slice(Ap[col], Ap[col + 1])
+        rows = pinv[Ai[p]] # permuted rows of A(:,col)
+        x[rows] = Ax[p] # x (i) = A(:,col)
+        for r, i in zip(Ai[p].tolist(), rows.tolist()): # find R(:,k) pattern
+            if i > k and w[i] < k: # pattern of V(:,k) = x (k+1:m)
+                vk.append(i) # add i to pattern of V(:,k)
+                w[i] = k
+            i = leftmost[r] # i = min(find(A(i,q)))
+            length = 0
             while w[i] != k: # traverse up to k
-                s[s_offset + len] = i
-                len+=1
+                s[s_offset + length] = i
+                length+=1
                 w[i] = k
                 i = parent[i]
-            while len > 0:
+            while length > 0:
                 top-=1
-                len-=1
-                s[s_offset + top] = s[s_offset + len] # push path on stack
-            i = pinv[Ai[p]] # i = permuted row of A(:,col)
-            x[i] = Ax[p] # x (i) = A(:,col)
-            if i > k and w[i] < k: # pattern of V(:,k) = x (k+1:m)
-                Vi[vnz] = i # add i to pattern of V(:,k)
-                vnz+=1
-                w[i] = k
-        for p in range(top, n): # for each i in pattern of R(:,k)
-            i = s[s_offset + p] # R(i,k) is nonzero
+                length-=1
+                s[s_offset + top] = s[s_offset + length] # push path on stack
+        rk = s[s_offset + top:s_offset + n] # pattern of R(:,k)
+        rx = [0.0] * len(rk)
+        for t, i in enumerate(rk): # for each i in pattern of R(:,k)
             cs_happly(V, i, Beta[i], x) # apply (V(i),Beta(i)) to x
-            Ri[rnz] = i # R(i,k) = x(i)
-            Rx[rnz] = x[i]
-            rnz+=1
+            rx[t] = x[i] # R(i,k) = x(i)
             x[i] = 0
             if parent[i] == k:
-                vnz = cs_scatter(V, i, 0, w, None, k, V, vnz)
-        for p in range(p1, vnz): # gather V(:,k) = x
-            Vx[p] = x[Vi[p]]
-            x[Vi[p]] = 0
+                for i in Vi[Vp[i]:Vp[i + 1]].tolist(): # V(:,k) gets V(:,i)
+                    if w[i] < k:
+                        w[i] = k
+                        vk.append(i)
+        Ri[rnz:rnz + len(rk)] = rk
+        Rx[rnz:rnz + len(rk)] = rx
+        rnz += len(rk)
+        p1 = vnz
+        vnz += len(vk)
+        Vp[k + 1] = vnz # V(:,k) is final once gathered
+        Vi[p1:vnz] = vk
+        Vx[p1:vnz] = x[vk] # gather V(:,k) = x
+        x[vk] = 0
         Ri[rnz] = k # R(k,k) = norm (x)
         beta = [0.0]
         beta[0] = Beta[k]
@@ -1866,7 +3931,7 @@ def cs_qr(A, S):
         rnz+=1
         Beta[k] = beta[0]
     Rp[n] = rnz # finalize R
-    Vp[n] = vnz # finalize V
+    N.B = numpy.array(Beta, dtype=CS_FLOAT)
     return N
 
 
@@ -1876,40 +3941,16 @@ def cs_qrsol(order, A, b):
     """Solve a least-squares problem (min ||Ax-b||_2, where A is m-by-n with
     m >= n) or underdetermined system (Ax=b, where m < n)
 
-    @param order: ordering method to use (0 to 3)
+    @param order: ordering method to use (0 to 7)
     @param A: column-compressed matrix
-    @param b: size max(m,n), b (size m) on input, x(size n) on output
+    @param b: size max(m,n), b (size m) on input, x(size n) on output; or
+              an array with max(m,n) rows and one right hand side per column
     @return: true if successful, false on error
     """
-    if not CS_CSC(A) or b == None:
+    if not CS_CSC(A) or b is None:
         return False # check inputs
-    n, m = A.n, A.m
-    if m >= n:
-        S = cs_sqr(order, A, True) # ordering and symbolic analysis
-        N = cs_qr(A, S) # numeric QR factorization
-        x = xalloc(S.m2 if S != None else 1) # get workspace
-        ok = S != None and N != None
-        if ok:
-            cs_ipvec(S.pinv, b, x, m) # x(0:m-1) = b(p(0:m-1)
-            for k in range(n): # apply Householder refl. to x
-                cs_happly(N.L, k, N.B[k], x)
-            cs_usolve(N.U, x) # x = R\x
-            cs_ipvec(S.q, x, b, n) # b(q(0:n-1)) = x(0:n-1)
-    else:
-        AT = cs_transpose(A, True) # Ax=b is underdetermined
-        S = cs_sqr(order, AT, True) # ordering and symbolic analysis
-        N = cs_qr(AT, S) # numeric QR factorization of A'
-        x = xalloc(S.m2 if S != None else 1) # get workspace
-        ok = AT != None and S != None and N != None
-        if ok:
-            cs_pvec(S.q, b, x, m) # x(q(0:m-1)) = b(0:m-1)
-            cs_utsolve(N.U, x) # x = R'\x
-            k = m - 1
-            while k >= 0: # apply Householder refl. to x
-                cs_happly(N.L, k, N.B[k], x)
-                k-=1
-            cs_pvec(S.pinv, x, b, n) # b(0:n-1) = x(p(0:n-1))
-    return ok
+    F = cs_factor('qr', order, A) # QR of A, or of A' if underdetermined
+    return F is not None and F.solve(b)
 
 
 def cs_randperm(n, seed):
@@ -1929,13 +3970,53 @@ def cs_randperm(n, seed):
     if seed == -1:
         return p # return reverse permutation
     for k in range(n):
-        j = k + randint(n - k) # j = rand int in range k to n-1
+        j = randint(k, n - 1) # j = rand int in range k to n-1
         t = p[j] # swap p[k] and p[j]
         p[j] = p[k]
         p[k] = t
     return p
 
 
+# Reverse Cuthill-McKee ordering.
+
+def cs_rcm(A):
+    """Reverse Cuthill-McKee ordering of A+A', which reduces the bandwidth
+    and profile. Each connected component is ordered by a breadth-first
+    search from a pseudo-peripheral node, with the nodes of a level sorted
+    by their first ordered neighbor in the previous level and then by
+    degree; the whole ordering is then reversed.
+
+    @param A: column-compressed matrix, square
+    @return: permutation vector p, null on error
+    """
+    if not CS_CSC(A) or A.m != A.n:
+        return None # check inputs
+    n = A.n
+    Gp, Gi = _cs_adjacency(A)
+    deg = numpy.diff(Gp)
+    P = ialloc(n) # allocate result
+    where = ialloc(n) # position of each node in P
+    part = numpy.zeros(n, CS_INT)
+    level = numpy.full(n, -1, CS_INT) # level of each ordered node
+    k = 0
+    for root in numpy.argsort(deg, kind='mergesort'): # start at low degree
+        if level[root] >= 0:
+            continue # component already ordered
+        levels = _cs_peripheral(Gp, Gi, root, part, 0, level)
+        for t, L in enumerate(levels):
+            if t > 0: # sort by first ordered neighbor, then by degree
+                nb = Gi[_cs_ranges(Gp[L], deg[L])]
+                owner = numpy.repeat(numpy.arange(len(L)), deg[L])
+                hit = level[nb] == t - 1
+                first = numpy.full(len(L), n, CS_INT)
+                numpy.minimum.at(first, owner[hit], where[nb[hit]])
+                L = L[numpy.lexsort((deg[L], first))]
+            P[k:k + len(L)] = L
+            where[L] = numpy.arange(k, k + len(L))
+            k += len(L)
+    return P[::-1].copy() # reverse the Cuthill-McKee ordering
+
+
 def cs_reach(G, B, k, xi, pinv):
     """Finds a nonzero pattern of x=L\b for sparse L and b.
 
@@ -1946,7 +4027,7 @@ def cs_reach(G, B, k, xi, pinv):
     @param pinv: mapping of rows to columns of G, ignored if null
     @return: top, -1 on error
     """
-    if not CS_CSC(G) or not CS_CSC(B) or xi == None:
+    if not CS_CSC(G) or not CS_CSC(B) or xi is None:
         return -1 # check inputs
     n, Bp, Bi, Gp = G.n, B.p, B.i, G.p
     top = n
@@ -1972,7 +4053,7 @@ def cs_scatter(A, j, beta, w, x, mark, C, nz):
     @param nz: pattern of x placed in C starting at C.i[nz]
     @return: new value of nz, -1 on error
     """
-    if not CS_CSC(A) or w == None or not CS_CSC(C):
+    if not CS_CSC(A) or w is None or not CS_CSC(C):
         return -1 # check inputs
     Ap, Ai, Ax = A.p, A.i, A.x
     Ci = C.i
@@ -1982,9 +4063,9 @@ def cs_scatter(A, j, beta, w, x, mark, C, nz):
             w[i] = mark # i is new entry in column j
             Ci[nz] = i # add i to pattern of C(:,j)
             nz+=1
-            if x != None:
+            if x is not None:
                 x[i] = beta * Ax[p] # x(i) = beta*A(i,j)
-        elif x != None:
+        elif x is not None:
             x[i] += beta * Ax[p] # i exists in C(:,j) already
     return nz
 
@@ -1998,19 +4079,19 @@ def cs_scc(A):
     if not CS_CSC(A):
         return None # check inputs
     n = A.n
-    Ap = A.p
     D = cs_dalloc(n, 0) # allocate result
     AT = cs_transpose(A, False) # AT = A'
-    xi = ialloc(2 * n + 1) # get workspace
-    if D == None or AT == None:
+    xi = [0] * (2 * n + 1) # get workspace
+    if D is None or AT is None:
         return None
+    Ap = A.p
     Blk = xi
     rcopy = xi
     rcopy_offset = n
     pstack = xi
     pstack_offset = n
-    p = D.p
-    r = D.r
+    p = _cs_list(D.p) # n-vectors, for the scalar loops
+    r = _cs_list(D.r)
     ATp = AT.p
     top = n
     for i in range(n): # first dfs(A) to find finish times (xi)
@@ -2043,25 +4124,53 @@ def cs_scc(A):
     for i in range(n):
         p[rcopy[rcopy_offset + Blk[i]]] = i
         rcopy[rcopy_offset + Blk[i]]+=1
+    D.p = numpy.array(p, dtype=CS_INT)
+    D.r = numpy.array(r, dtype=CS_INT)
     return D
 
 
 # Symbolic Cholesky ordering and analysis.
 
-def cs_schol(order, A):
+def _cs_ordering(order, A, qr):
+    """fill-reducing ordering of A+A' (Cholesky or LU) or A'A (QR or LU),
+    see cs_schol and cs_sqr; null for natural ordering or on error
+    """
+    if order == 4: # nested dissection
+        return cs_nd(cs_multiply(cs_transpose(A, False), A) if qr else A)
+    if order == 5: # column approximate minimum degree
+        return cs_colamd(A)
+    if order == 6: # reverse Cuthill-McKee
+        return cs_rcm(cs_multiply(cs_transpose(A, False), A) if qr else A)
+    return cs_amd(order, A)
+
+def cs_schol(order, A, cache=None):
     """Ordering and symbolic analysis for a Cholesky factorization.
 
-    @param order: ordering option (0 or 1)
+    @param order: ordering option (0:natural, 1:amd(A+A'), 4:nested
+                  dissection of A+A', 6:reverse Cuthill-McKee of A+A',
+                  7:least predicted fill, see cs_autoorder)
     @param A: column-compressed matrix
+    @param cache: css_cache to look the analysis up in, or None
     @return: symbolic analysis for Cholesky, null on error
     """
     if not CS_CSC(A):
         return None  # check inputs
+    if cache is not None:
+        key = _cs_pattern_key(A, order, 'chol')
+        S = cache.get(key)
+        if S is None:
+            S = cs_schol(order, A)
+            if S is not None:
+                cache.put(key, S)
+        return S
+    if order == 7: # least predicted fill
+        best = cs_autoorder('chol', A)
+        return best[1] if best is not None else None
     n = A.n
     S = css() # allocate result S
-    P = cs_amd(order, A) # P = amd(A+A'), or natural
+    P = _cs_ordering(order, A, False) # P = amd(A+A'), or natural
     S.pinv = cs_pinv(P, n) # find inverse permutation
-    if order != 0 and S.pinv == None:
+    if order != 0 and S.pinv is None:
         return None
     C = cs_symperm(A, S.pinv, False) # C = spones(triu(A(P,P)))
     S.parent = cs_etree(C, False) # find etree of C
@@ -2072,9 +4181,88 @@ def cs_schol(order, A):
     return S if S.lnz >= 0 else None
 
 
+# Selected inverse.
+
+def cs_selinv(N, S):
+    """Selected inverse of a Cholesky factorization: the entries of inv(A) on
+    the pattern of P'(L+L')P. Solves the Takahashi equations Z21 = -Z22*W and
+    Z11 = inv(L11)'*inv(L11) - Z21'*W, with W = L21/L11, from the root of the
+    elimination tree down, one supernode at a time. Z22 only needs entries of
+    Z on the pattern of L, which are already known.
+
+    @param N: numeric Cholesky factorization
+    @param S: symbolic Cholesky analysis, pinv is optional
+    @return: Z=inv(A) on the pattern of P'(L+L')P, null on error
+    """
+    if N is None or not CS_CSC(N.L) or S is None or S.parent is None:
+        return None # check inputs
+    L = N.L
+    n = L.n
+    Lp, Li, Lx = numpy.asarray(L.p[:n + 1]), L.i, L.x
+    snode = _cs_supernodes(S.parent, Lp, n)
+    ns = len(snode) - 1
+    sn = numpy.repeat(numpy.arange(ns), numpy.diff(snode)) # supernode of each column
+    rows = [None] * ns # row structure of each supernode
+    Z = [None] * ns # Z(rows,f:l-1) of each supernode
+    for s in range(ns - 1, -1, -1):
+        f, l = snode[s], snode[s + 1] # columns f to l-1
+        k = l - f
+        R = rows[s] = numpy.asarray(Li[Lp[f]:Lp[f + 1]])
+        if len(R) < k or (R[:k] != numpy.arange(f, l)).any():
+            return None # diagonal must be first, N must match S
+        B = numpy.zeros((len(R), k)) # L(R,f:l-1)
+        for j in range(k):
+            B[j:, j] = Lx[Lp[f + j]:Lp[f + j + 1]]
+        R2 = R[k:]
+        Z22 = numpy.zeros((len(R2), len(R2))) # gather tril(Z(R2,R2))
+        t = sn[R2]
+        start = numpy.flatnonzero(numpy.r_[True, t[1:] != t[:-1]]) if len(R2) else []
+        for a, b in zip(start, numpy.r_[start[1:], len(R2)]):
+            pos = numpy.searchsorted(rows[t[a]], R2[a:])
+            Z22[a:, a:b] = Z[t[a]][numpy.ix_(pos, R2[a:b] - snode[t[a]])]
+        Z22 = numpy.tril(Z22) + numpy.tril(Z22, -1).T
+        try:
+            L11inv = numpy.linalg.solve(B[:k], numpy.eye(k)) # inv(L11)
+        except numpy.linalg.LinAlgError:
+            return None
+        W = numpy.dot(B[k:], L11inv)
+        Z21 = -numpy.dot(Z22, W)
+        Z11 = numpy.dot(L11inv.T, L11inv) - numpy.dot(Z21.T, W)
+        Z[s] = numpy.vstack(((Z11 + Z11.T) / 2, Z21))
+    Ti, Tj, Tx = [], [], [] # tril(Z) in triplet form
+    for s in range(ns):
+        f, R = snode[s], rows[s]
+        r, c = numpy.nonzero(numpy.arange(len(R))[:, None] >= numpy.arange(Z[s].shape[1]))
+        Ti.append(R[r])
+        Tj.append(f + c)
+        Tx.append(Z[s][r, c])
+    i, j, x = [numpy.concatenate(a) for a in (Ti + [ialloc(0)], Tj + [ialloc(0)], Tx + [xalloc(0)])]
+    P = cs_pinv(S.pinv, n)
+    if P is not None:
+        i, j = P[i], P[j] # Z = P'*Z*P
+    off = i != j
+    T = cs() # Z in triplet form, both triangles
+    T.m, T.n = n, n
+    T.i, T.p = numpy.concatenate((i, j[off])), numpy.concatenate((j, i[off]))
+    T.x = numpy.concatenate((x, x[off]))
+    T.nz = T.nzmax = len(T.i)
+    return cs_compress(T, False, True)
+
+
 # Sparse lower or upper triangular solve. x=G\b where G, x, and b are sparse,
 # and G upper/lower triangular.
 
+def _cs_column(m, i, x):
+    """m-by-1 column-compressed matrix with entries x in rows i, sharing the
+    arrays
+    """
+    C = cs_spalloc(m, 1, len(i), True, False)
+    C.p[1] = len(i)
+    if len(i):
+        C.i, C.x = i, x
+    return C
+
+
 def cs_spsolve(G, B, k, xi, x, pinv, lo):
     """Solve Gx=b(:,k), where G is either upper (lo=false) or lower (lo=true)
     triangular.
@@ -2090,39 +4278,47 @@ def cs_spsolve(G, B, k, xi, x, pinv, lo):
     """
 #    int j, J, p, q, px, top, n, Gp[], Gi[], Bp[], Bi[];
 #    double Gx[], Bx[];
-    if not CS_CSC(G) or not CS_CSC(B) or xi == None or x == None:
+    if not CS_CSC(G) or not CS_CSC(B) or xi is None or x is None:
         return -1
     Gp, Gi, Gx, n = G.p, G.i, G.x, G.n
     Bp, Bi, Bx = B.p, B.i, B.x
     top = cs_reach(G, B, k, xi, pinv) # xi[top..n-1]=Reach(B(:,k))
+    packed = isinstance(x, numpy.ndarray) and isinstance(Gx, numpy.ndarray)
     for p in range(top, n):
         x[xi[p]] = 0 # clear x
     for p in range(Bp[k], Bp[k + 1]):
         x[Bi[p]] = Bx[p] # scatter B
     for px in range(top, n):
         j = xi[px] # x(j) is nonzero
-        J = pinv[j] if pinv != None else j # j maps to col J of G
+        J = pinv[j] if pinv is not None else j # j maps to col J of G
         if J < 0:
             continue # column J is empty
         x[j] /= Gx[Gp[J] if lo else Gp[J + 1] - 1] # x(j) /= G(j,j)
         p = Gp[J] + 1 if lo else Gp[J] # lo: L(j,j) 1st entry
         q = Gp[J + 1] if lo else Gp[J + 1] - 1 # up: U(j,j) last entry
-        while p < q:
-            x[Gi[p]] -= Gx[p] * x[j] # x(i) -= G(i,j) * x(j)
-            p+=1
+        if packed:
+            x[Gi[p:q]] -= Gx[p:q] * x[j] # x(i) -= G(i,j) * x(j)
+        else:
+            for p in range(p, q):
+                x[Gi[p]] -= Gx[p] * x[j] # x(i) -= G(i,j) * x(j)
     return top # return top of stack
 
 
 # Symbolic QR or LU ordering and analysis.
 
-def _cs_vcount(A, S):
-    """compute nnz(V) = S->lnz, S->pinv, S->leftmost, S->m2 from A and S->parent
+def _cs_vcount(A, S, vcount=None):
+    """compute nnz(V) = S->lnz, S->pinv, S->leftmost, S->m2 from A and S->parent,
+    and nnz(V(:,k)) in vcount[k] if given
     """
-    n = A.n; m = A.m; Ap = A.p; Ai = A.i
-    parent = S.parent
-    S.pinv = pinv = ialloc(m + n) # allocate pinv,
-    S.leftmost = leftmost = ialloc(m) # and leftmost
-    w = ialloc(m + 3 * n) # get workspace
+    n = A.n; m = A.m; Ap = numpy.asarray(A.p[:n + 1])
+    parent = _cs_list(S.parent) # n-vector, for the scalar loops
+    pinv = [0] * (m + n) # allocate pinv,
+    leftmost = numpy.full(m, n, CS_INT) # and leftmost
+    cols = numpy.repeat(numpy.arange(n), numpy.diff(Ap))
+    numpy.minimum.at(leftmost, A.i[:Ap[n]], cols) # leftmost[i] = min(find(A(i,:)))
+    leftmost[leftmost == n] = -1
+    leftmost = leftmost.tolist()
+    w = [0] * (m + 3 * n) # get workspace
     next = w
     head = w
     head_offset = m
@@ -2136,13 +4332,6 @@ def _cs_vcount(A, S):
         tail[tail_offset + k] = -1
     for k in range(n):
         nque[nque_offset + k] = 0
-    for i in range(m):
-        leftmost[i] = -1
-    k = n - 1
-    while k >= 0:
-        for p in range(Ap[k], Ap[k + 1]):
-            leftmost[Ai[p]] = k # leftmost[i] = min(find(A(i,:)))
-        k-=1
     i = m - 1
     while i >= 0: # scan rows in reverse order
         pinv[i] = -1 # row i is not yet ordered
@@ -2166,6 +4355,8 @@ def _cs_vcount(A, S):
             S.m2+=1
         pinv[i] = k # associate row i with V(:,k)
         nque[nque_offset + k]-=1
+        if vcount is not None:
+            vcount[k] = 1 + max(nque[nque_offset + k], 0)
         if nque[nque_offset + k] <= 0:
             continue # skip if V(k+1:m,k) is empty
         S.lnz += nque[nque_offset + k] # nque [nque_offset+k] is nnz (V(k+1:m,k))
@@ -2176,36 +4367,54 @@ def _cs_vcount(A, S):
             next[tail[tail_offset + k]] = head[head_offset + pa]
             head[head_offset + pa] = next[i]
             nque[nque_offset + pa] += nque[nque_offset + k]
+    k = n
     for i in range(m):
         if pinv[i] < 0:
             pinv[i] = k
             k+=1
+    S.pinv = numpy.array(pinv, dtype=CS_INT)
+    S.leftmost = numpy.array(leftmost, dtype=CS_INT)
     w = None
     return True
 
 
-def cs_sqr(order, A, qr):
+def cs_sqr(order, A, qr, cache=None):
     """Symbolic QR or LU ordering and analysis.
 
-    @param order: ordering method to use (0 to 3)
+    @param order: ordering method to use (0:natural, 1 to 3: see cs_amd,
+                  4:nested dissection of A+A' for LU, of A'A for QR,
+                  5:cs_colamd, 6:cs_rcm of A+A' for LU, of A'A for QR,
+                  7:least predicted fill, see cs_autoorder)
     @param A: column-compressed matrix
     @param qr: analyze for QR if true or LU if false
+    @param cache: css_cache to look the analysis up in, or None
     @return: symbolic analysis for QR or LU, null on error
     """
     ok = True
     if not CS_CSC(A):
         return None # check inputs
+    if cache is not None:
+        key = _cs_pattern_key(A, order, 'qr' if qr else 'lu')
+        S = cache.get(key)
+        if S is None:
+            S = cs_sqr(order, A, qr)
+            if S is not None:
+                cache.put(key, S)
+        return S
+    if order == 7: # least predicted fill
+        best = cs_autoorder('qr' if qr else 'lu', A)
+        return best[1] if best is not None else None
     n = A.n
     S = css() # allocate result S
-    S.q = cs_amd(order, A) # fill-reducing ordering
-    if order > 0 and S.q == None:
+    S.q = _cs_ordering(order, A, qr) # fill-reducing ordering
+    if order > 0 and S.q is None:
         return None
     if qr: # QR symbolic analysis
         C = cs_permute(A, None, S.q, False) if order > 0 else A
         S.parent = cs_etree(C, True) # etree of C'*C, where C=A(:,q)
         post = cs_post(S.parent, n)
         S.cp = cs_counts(C, S.parent, post, True) # col counts chol(C'*C)
-        ok = C != None and S.parent != None and S.cp != None and _cs_vcount(C, S)
+        ok = C is not None and S.parent is not None and S.cp is not None and _cs_vcount(C, S)
         if ok:
             S.unz = 0
             for k in range(n):
@@ -2217,6 +4426,253 @@ def cs_sqr(order, A, qr):
     return S if ok else None # return result S
 
 
+# Supernodal Cholesky.
+
+def _cs_supernodes(parent, cp, n):
+    """first column of each fundamental supernode of L, and n at the end
+    """
+    parent = numpy.asarray(parent[:n])
+    c = numpy.diff(numpy.asarray(cp[:n + 1])) # column counts of L
+    nchild = numpy.bincount(parent[parent >= 0], minlength=n)
+    j = numpy.arange(1, n)
+    merge = (parent[j - 1] == j) & (c[j - 1] == c[j] + 1) & (nchild[j] == 1)
+    return numpy.concatenate(([0] if n > 0 else [], j[~merge], [n])).astype(CS_INT)
+
+
+def cs_superchol(A, S):
+    """Supernodal Cholesky factorization LL=PAP'. Columns of L with the same
+    structure (fundamental supernodes of the elimination tree) are factorized
+    together as dense blocks of a multifrontal method.
+
+    @param A: column-compressed matrix, only upper triangular part is used
+    @param S: symbolic Cholesky analysis, pinv is optional
+    @return: numeric Cholesky factorization, null on error
+    """
+    if not CS_CSC(A) or S is None or S.cp is None or S.parent is None:
+        return None # check inputs
+    n, cp = A.n, S.cp
+    Cp, Ci, amap = _cs_symmap(A, S.pinv, True) # C = tril(PAP')
+    keep = amap >= 0
+    Cx = numpy.bincount(amap[keep], weights=numpy.asarray(A.x)[:len(amap)][keep],
+            minlength=Cp[n])
+    snode = _cs_supernodes(S.parent, cp, n)
+    ns = len(snode) - 1
+    sn = numpy.repeat(numpy.arange(ns), numpy.diff(snode)) # supernode of each column
+    sparent = numpy.full(ns, -1, CS_INT) # parent of each supernode
+    N = csn() # allocate result
+    N.L = L = cs_spalloc(n, n, cp[n], True, False)
+    L.p[:] = cp[:n + 1]
+    fronts = [] # positions in the frontal matrices, for cs_superrefactor
+    updates = [[] for s in range(ns)] # update matrices of the children
+    for s in range(ns):
+        f, l = snode[s], snode[s + 1] # columns f to l-1
+        U = _cs_front(f, l, Cp, Ci, Cx, updates[s], L.p, L.i, L.x, fronts)
+        updates[s] = None
+        if U is None:
+            return None
+        if len(U[0]):
+            sparent[s] = sn[S.parent[l - 1]]
+            updates[sparent[s]].append(U) # parent supernode
+    N.fronts = (snode, sparent, Cp, amap, fronts)
+    return N
+
+
+def cs_superrefactor(A, S, N):
+    """Numeric supernodal Cholesky refactorization LL=PAP' of a matrix with
+    the pattern N was computed for by cs_superchol. The supernodes, the map
+    of A into C=tril(PAP') and the positions of the entries of C and of the
+    update matrices in each frontal matrix are taken from N.fronts; only the
+    dense factorizations of the frontal matrices are recomputed.
+
+    @param A: column-compressed matrix, with the pattern N was computed for,
+              only upper triangular part is used
+    @param S: symbolic Cholesky analysis
+    @param N: numeric Cholesky factorization from cs_superchol or
+              cs_superrefactor, not modified
+    @return: numeric Cholesky factorization sharing the pattern of N, null on
+             error
+    """
+    if not CS_CSC(A) or S is None or N is None or N.fronts is None:
+        return None # check inputs
+    snode, sparent, Cp, amap, fronts = N.fronts
+    n, L = A.n, N.L
+    keep = amap >= 0
+    Cx = numpy.bincount(amap[keep], weights=numpy.asarray(A.x)[:len(amap)][keep],
+            minlength=Cp[n])
+    Lp = L.p
+    Lx = xalloc(L.nzmax)
+    ns = len(snode) - 1
+    updates = [[] for s in range(ns)] # update matrices of the children
+    for s in range(ns):
+        f, l = snode[s], snode[s + 1] # columns f to l-1
+        pos, maps = fronts[s]
+        U = _cs_frontfactor(f, l, Lp[f + 1] - Lp[f], pos, Cx[Cp[f]:Cp[l]],
+                zip(maps, updates[s]), Lp, Lx)
+        updates[s] = None
+        if U is None:
+            return None # not pos def
+        if sparent[s] >= 0:
+            updates[sparent[s]].append(U)
+    R = csn()
+    R.L = cs() # share the pattern of N
+    R.L.m, R.L.n, R.L.nz, R.L.nzmax = L.m, L.n, L.nz, L.nzmax
+    R.L.p, R.L.i, R.L.x = L.p, L.i, Lx
+    R.fronts = N.fronts
+    return R
+
+
+def _cs_front(f, l, Cp, Ci, Cx, updates, Lp, Li, Lx, fronts=None):
+    """factorize the frontal matrix of supernode f:l-1 of C = tril(PAP'),
+    store L(:,f:l-1) and return the rows and update matrix for the parent;
+    None if not positive definite or if Lp does not match C. The positions
+    of C(:,f:l-1) and of the update matrices in the frontal matrix are
+    appended to fronts if given.
+    """
+    k = l - f
+    pattern = [Ci[Cp[f]:Cp[l]]] + [r for r, U in updates]
+    R = numpy.unique(numpy.concatenate([numpy.arange(f, l)] + pattern))
+    nr = len(R)
+    if nr != Lp[f + 1] - Lp[f]:
+        return None # S does not match A
+    cols = numpy.repeat(numpy.arange(k), numpy.diff(Cp[f:l + 1]))
+    pos = numpy.searchsorted(R, Ci[Cp[f]:Cp[l]]) * nr + cols # tril(C(:,f:l-1))
+    maps = [numpy.searchsorted(R, r) for r, U in updates]
+    if fronts is not None:
+        fronts.append((pos, maps))
+    for j in range(k): # pattern of L(:,f:l-1)
+        Li[Lp[f + j]:Lp[f + j + 1]] = R[j:]
+    U = _cs_frontfactor(f, l, nr, pos, Cx[Cp[f]:Cp[l]],
+            zip(maps, [U for r, U in updates]), Lp, Lx)
+    return (R[k:], U) if U is not None else None
+
+
+def _cs_frontfactor(f, l, nr, pos, Cx, updates, Lp, Lx):
+    """assemble the nr-by-nr frontal matrix of supernode f:l-1 from the
+    entries Cx of C(:,f:l-1) at positions pos and the (rows, matrix) update
+    matrices of the children, store the values of L(:,f:l-1) and return the
+    update matrix for the parent; None if not positive definite
+    """
+    k = l - f
+    F = numpy.zeros((nr, nr)) # frontal matrix
+    F.flat[pos] = Cx
+    F[:k, :k] = numpy.tril(F[:k, :k]) + numpy.tril(F[:k, :k], -1).T
+    for i, U in updates: # extend-add the children
+        F[numpy.ix_(i, i)] += U
+    try:
+        L11 = numpy.linalg.cholesky(F[:k, :k]) # dense Cholesky
+    except numpy.linalg.LinAlgError:
+        return None # not pos def
+    L21 = numpy.linalg.solve(L11, F[k:, :k].T).T # L21 = F21 / L11'
+    B = numpy.vstack((L11, L21))
+    for j in range(k): # store L(:,f:l-1)
+        Lx[Lp[f + j]:Lp[f + j + 1]] = B[j:, j]
+    return F[k:, k:] - numpy.dot(L21, L21.T)
+
+
+def _cs_ranges(start, length):
+    """indices start[k] to start[k]+length[k]-1, for all k
+    """
+    total = numpy.cumsum(length)
+    return numpy.arange(total[-1] if len(total) else 0) + \
+        numpy.repeat(start - total + length, length)
+
+
+def cs_superqr(A, S):
+    """Multifrontal QR factorization of an m-by-n matrix A, A= Q*R, with
+    m >= n. The rows of A and the update blocks of the children are assembled
+    into a dense frontal matrix for each fundamental supernode of the column
+    elimination tree, and its pivotal columns are factorized with dense
+    Householder QR. Q is returned as Householder vectors and coefficients as
+    by cs_qr, with the row permutation in pinv.
+
+    @param A: column-compressed matrix
+    @param S: symbolic QR analysis
+    @return: numeric QR factorization, null on error
+    """
+    if not CS_CSC(A) or S is None or S.parent is None or S.cp is None:
+        return None # check inputs
+    m, n = A.m, A.n
+    Ap, Ai = numpy.asarray(A.p[:n + 1]), numpy.asarray(A.i[:A.p[n]])
+    qinv = numpy.asarray(cs_pinv(S.q, n)) if S.q is not None else numpy.arange(n)
+    cols = qinv[numpy.repeat(numpy.arange(n), numpy.diff(Ap))] # column in A(:,q)
+    order = numpy.lexsort((cols, Ai)) # rows of A(:,q)
+    rowp = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(Ai, minlength=m))))
+    rowj, rowx = cols[order], numpy.asarray(A.x)[:len(Ai)][order]
+    counts = numpy.asarray(S.cp[:n])
+    snode = _cs_supernodes(S.parent, numpy.concatenate(([0], numpy.cumsum(counts))), n)
+    ns = len(snode) - 1
+    sn = numpy.repeat(numpy.arange(ns), numpy.diff(snode)) # supernode of each column
+    left = numpy.full(m, -1, CS_INT) # leftmost column of each row
+    nonempty = numpy.diff(rowp) > 0
+    left[nonempty] = rowj[rowp[:-1][nonempty]]
+    byfront = numpy.argsort(numpy.where(left >= 0, sn[left], ns), kind='mergesort')
+    frontp = numpy.searchsorted(numpy.where(left >= 0, sn[left], ns)[byfront], numpy.arange(ns + 1))
+    pivot = numpy.empty(n, CS_INT) # row slot that holds R(k,:)
+    Beta = xalloc(n)
+    m2 = m # rows and fictitious rows
+    Vi, Vj, Vx, Ri, Rj, Rx = [], [], [], [], [], []
+    updates = [[] for s in range(ns)] # update blocks of the children
+    for s in range(ns):
+        f, l = snode[s], snode[s + 1] # pivotal columns f to l-1
+        k = l - f
+        rows = byfront[frontp[s]:frontp[s + 1]] # rows of A with leftmost in f:l-1
+        idx = _cs_ranges(rowp[rows], rowp[rows + 1] - rowp[rows])
+        C = numpy.unique(numpy.concatenate([numpy.arange(f, l), rowj[idx]] +
+                                           [c for r, c, U in updates[s]]))
+        if len(C) != counts[f]:
+            return None # S does not match A
+        slots = numpy.concatenate([rows] + [r for r, c, U in updates[s]]).astype(CS_INT)
+        if len(slots) < k: # add fictitious rows
+            nf = k - len(slots)
+            slots = numpy.concatenate((slots, numpy.arange(m2, m2 + nf)))
+            m2 += nf
+        F = numpy.zeros((len(slots), len(C))) # frontal matrix
+        numpy.add.at(F, (numpy.repeat(numpy.arange(len(rows)), numpy.diff(rowp)[rows]),
+                         numpy.searchsorted(C, rowj[idx])), rowx[idx])
+        r = len(rows)
+        for _, c, U in updates[s]: # stack the update blocks of the children
+            F[r:r + len(U), numpy.searchsorted(C, c)] = U
+            r += len(U)
+        updates[s] = None
+        h, tau = numpy.linalg.qr(F[:, :k], mode='raw') # F(:,1:k) = Q*R11
+        V = numpy.tril(h.T, -1)
+        V[numpy.arange(k), numpy.arange(k)] = 1
+        T = numpy.zeros((k, k)) # Q = I - V*T*V'
+        G = numpy.dot(V.T, V)
+        for j in range(k):
+            T[:j, j] = -tau[j] * numpy.dot(T[:j, :j], G[:j, j])
+            T[j, j] = tau[j]
+        F2 = F[:, k:]
+        F2 -= numpy.dot(V, numpy.dot(T.T, numpy.dot(V.T, F2))) # F2 = Q'*F2
+        for t in range(k): # V(:,f+t) and R(f+t,:)
+            Vi.append(slots[t:])
+            Vj.append(numpy.full(len(slots) - t, f + t, CS_INT))
+            Vx.append(V[t:, t])
+            Ri.append(numpy.full(len(C) - t, f + t, CS_INT))
+            Rj.append(C[t:])
+            Rx.append(numpy.concatenate((h[t:k, t], F2[t])))
+        pivot[f:l] = slots[:k]
+        Beta[f:l] = tau
+        if S.parent[l - 1] != -1 and len(C) > k: # pass C(k+1:end) even with no rows
+            updates[sn[S.parent[l - 1]]].append((slots[k:], C[k:], F2[k:]))
+    newidx = numpy.full(m2, -1, CS_INT) # renumber slots so R(k,:) is in row k
+    newidx[pivot] = numpy.arange(n)
+    rest = newidx < 0
+    newidx[rest] = numpy.arange(n, n + numpy.count_nonzero(rest))
+    N = csn() # allocate result
+    N.pinv = newidx[:m]
+    N.B = Beta
+    for name, i, j, x in (('L', Vi, Vj, Vx), ('U', Ri, Rj, Rx)):
+        T = cs() # V and R in triplet form, rows sorted so R(k,k) is last
+        T.m, T.n, T.i = m2, n, numpy.concatenate(i)
+        T.p, T.x = numpy.concatenate(j), numpy.concatenate(x)
+        if name == 'L':
+            T.i = newidx[T.i]
+        T.nz = T.nzmax = len(T.i)
+        setattr(N, name, cs_compress(T, False, True))
+    return N
+
+
 def cs_symperm(A, pinv, values):
     """Permutes a symmetric sparse matrix. C = PAP' where A and C are symmetric.
 
@@ -2227,31 +4683,15 @@ def cs_symperm(A, pinv, values):
     """
     if not CS_CSC(A):
         return None # check inputs
-    n, Ap, Ai, Ax = A.n, A.p, A.i, A.x
-    C = cs_spalloc(n, n, Ap[n], values and (Ax != None), False) # alloc result
-    w = ialloc(n) # get workspace
+    n, Ap, Ax = A.n, A.p, A.x
+    C = cs_spalloc(n, n, Ap[n], values and (Ax is not None), False) # alloc result
     Cp, Ci, Cx = C.p, C.i, C.x
-    for j in range(n): # count entries in each column of C
-        j2 = pinv[j] if pinv != None else j # column j of A is column j2 of C
-        for p in range(Ap[j], Ap[j + 1]):
-            i = Ai[p]
-            if i > j:
-                continue # skip lower triangular part of A
-            i2 = pinv[i] if pinv != None else i # row i of A is row i2 of C
-            w[max(i2, j2)]+=1 # column count of C
-    cs_cumsum(Cp, w, n) # compute column pointers of C
-    for j in range(n):
-        j2 = pinv[j] if pinv != None else j # column j of A is column j2 of C
-        for p in range(Ap[j], Ap[j + 1]):
-            i = Ai[p]
-            if i > j:
-                continue # skip lower triangular part of A
-            i2 = pinv[i] if pinv != None else i # row i of A is row i2 of C
-            q = w[max(i2, j2)]
-            w[max(i2, j2)]+=1
-            Ci[q] = min(i2, j2);
-            if Cx != None:
-                Cx[q] = Ax[p]
+    Bp, Bi, amap = _cs_symmap(A, pinv, False) # pattern of C, A(i,j) in C
+    Cp[:] = Bp
+    Ci[:len(Bi)] = Bi
+    if Cx is not None:
+        keep = amap >= 0 # skip lower triangular part of A
+        Cx[amap[keep]] = numpy.asarray(Ax)[:len(amap)][keep]
     return C
 
 
@@ -2272,7 +4712,7 @@ def cs_tdfs(j, k, head, head_offset, next, next_offset, post, post_offset,
     @return new value of k, -1 on error
     """
     top = 0
-    if head == None or next == None or post == None or stack == None:
+    if head is None or next is None or post is None or stack is None:
         return -1 # check inputs
     stack[stack_offset + 0] = j # place j on the stack
     while top >= 0: # while (stack is not empty)
@@ -2298,20 +4738,15 @@ def cs_transpose(A, values):
     """
     if not CS_CSC(A):
         return None # check inputs
-    m, n, Ap, Ai, Ax = A.m, A.n, A.p, A.i, A.x
-    C = cs_spalloc(n, m, Ap[n], values and (Ax != None), False) # allocate result
-    w = ialloc(m) # get workspace
-    Cp, Ci, Cx = C.p, C.i, C.x
-    for p in range(Ap[n]):
-        w[Ai[p]]+=1 # row counts
-    cs_cumsum(Cp, w, m) # row pointers
-    for j in range(n):
-        for p in range(Ap[j], Ap[j + 1]):
-            q = w[Ai[p]]
-            w[Ai[p]]+=1
-            Ci[q] = j # place A(i,j) as entry C(j,i)
-            if Cx != None:
-                Cx[q] = Ax[p]
+    m, n, Ap, Ai, Ax = A.m, A.n, numpy.asarray(A.p), numpy.asarray(A.i), A.x
+    nz = Ap[n]
+    C = cs_spalloc(n, m, nz, values and (Ax is not None), False) # allocate result
+    Ai = Ai[:nz]
+    C.p[:] = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(Ai, minlength=m)))) # row pointers
+    order = numpy.argsort(Ai, kind='mergesort') # stable: columns stay sorted in each row
+    C.i[:nz] = numpy.repeat(numpy.arange(n), numpy.diff(Ap[:n + 1]))[order] # place A(i,j) as entry C(j,i)
+    if C.x is not None:
+        C.x[:nz] = numpy.asarray(Ax)[order]
     return C
 
 
@@ -2325,7 +4760,7 @@ def cs_updown(L, sigma, C, parent):
     @return: true if successful, false on error
     """
     beta = beta2 = 1
-    if not CS_CSC(L) or not CS_CSC(C) or parent == None:
+    if not CS_CSC(L) or not CS_CSC(C) or parent is None:
         return False # check inputs
     Lp, Li, Lx, n = L.p, L.i, L.x, L.n
     Cp, Ci, Cx = C.p, C.i, C.x
@@ -2367,21 +4802,25 @@ def cs_updown(L, sigma, C, parent):
 
 def cs_usolve(U, x):
     """Solves an upper triangular system Ux=b, where x and b are dense vectors.
-    The diagonal of U must be the last entry of each column.
+    The diagonal of U must be the last entry of each column, and U must not
+    have duplicate entries.
 
     @param U: upper triangular matrix in column-compressed form
-    @param x: size n, right hand side on input, solution on output
+    @param x: size n, or n-by-k for k right hand sides, right hand side on
+              input, solution on output
     @return: true if successful, false on error
     """
-    if not CS_CSC(U) or x == None:
+    if not CS_CSC(U) or x is None:
         return False # check inputs
+    y = _cs_dense(x)
     n, Up, Ui, Ux = U.n, U.p, U.i, U.x
     j = n - 1
     while j >= 0:
-        x[j] /= Ux[Up[j + 1] - 1];
-        for p in range(Up[j], Up[j + 1] - 1):
-            x[Ui[p]] -= Ux[p] * x[j]
+        y[j] /= Ux[Up[j + 1] - 1];
+        p = slice(Up[j], Up[j + 1] - 1)
+        y[Ui[p]] -= numpy.multiply.outer(Ux[p], y[j]) # all k columns at once
         j-=1
+    _cs_store(x, y)
     return True
 
 
@@ -2407,8 +4846,7 @@ def cs_spalloc(m, n, nzmax, values, triplet):
 
 
 def _copy(src, dest, length):
-    for i in range(length):
-        dest[i] = src[i]
+    dest[:length] = src[:length]
 
 
 def cs_sprealloc(A, nzmax):
@@ -2418,7 +4856,7 @@ def cs_sprealloc(A, nzmax):
     @param nzmax: new maximum number of entries
     @return: true if successful, false on error
     """
-    if A == None:
+    if A is None:
         return False
     if nzmax <= 0:
         nzmax = A.p[A.n] if CS_CSC(A) else A.nz
@@ -2431,7 +4869,7 @@ def cs_sprealloc(A, nzmax):
         length = min(nzmax, len(A.p))
         _copy(A.p, Apnew, length)
         A.p = Apnew
-    if A.x != None:
+    if A.x is not None:
         Axnew = xalloc(nzmax)
         length = min(nzmax, len(A.x))
         _copy(A.x, Axnew, length)
@@ -2462,22 +4900,44 @@ def cs_utsolve(U, x):
     The diagonal of U must be the last entry of each column.
 
     @param U: upper triangular matrix in column-compressed form
-    @param x: size n, right hand side on input, solution on output
+    @param x: size n, or n-by-k for k right hand sides, right hand side on
+              input, solution on output
     @return: true if successful, false on error
     """
-    if not CS_CSC(U) or x == None:
+    if not CS_CSC(U) or x is None:
         return False # check inputs
+    y = _cs_dense(x)
     n, Up, Ui, Ux = U.n, U.p, U.i, U.x
     for j in range(n):
-        for p in range(Up[j], Up[j + 1] - 1):
-            x[j] -= Ux[p] * x[Ui[p]]
-        x[j] /= Ux[Up[j + 1] - 1]
+        p = slice(Up[j], Up[j + 1] - 1)
+        y[j] -= numpy.dot(Ux[p], y[Ui[p]])
+        y[j] /= Ux[Up[j + 1] - 1]
+    _cs_store(x, y)
     return True
 
 
 def ialloc(n):
-    return [0]*n
+    """Allocate a zeroed, contiguous integer array.
+
+    @param n: length of the array
+    @return: array of CS_INT, size n
+    """
+    return numpy.zeros(n, dtype=CS_INT)
 
 
 def xalloc(n):
-    return [0.0]*n
+    """Allocate a zeroed, contiguous array of numerical values.
+
+    @param n: length of the array
+    @return: array of CS_FLOAT, size n
+    """
+    return numpy.zeros(n, dtype=CS_FLOAT)
+
+
+def _cs_list(a):
+    """list copy of a permutation, tree or other n-vector, for element access
+    from the scalar loops; row indices and values stay in the packed arrays
+    """
+    if a is None:
+        return None
+    return a.tolist() if isinstance(a, numpy.ndarray) else list(a)
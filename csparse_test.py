@@ -17,12 +17,24 @@
 # Foundation, Inc, 51 Franklin St, Fifth Floor, Boston, MA 02110-1301
 
 import time
+import gzip
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
 from sys import stdout
 from os.path import abspath, dirname, join
 import unittest
 from random import random
+import numpy
 import csparse as cs
 
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+
 
 class CSparseTest(unittest.TestCase):
 
@@ -120,6 +132,26 @@ class CSparseTest(unittest.TestCase):
         C = cs.cs_add (A, AT, 1, 1)        # C = A+AT
         return C
 
+    def grid(self, k):
+        """upper part of the 5-point Laplacian on a k-by-k grid
+        """
+        T = cs.cs_spalloc (k * k, k * k, 1, True, True)
+        for i in range (k):
+            for j in range (k):
+                cs.cs_entry (T, i * k + j, i * k + j, 4.0)
+                if j + 1 < k: cs.cs_entry (T, i * k + j, i * k + j + 1, -1.0)
+                if i + 1 < k: cs.cs_entry (T, i * k + j, (i + 1) * k + j, -1.0)
+        return cs.cs_compress (T)
+
+    def height(self, parent, n):
+        """height of the elimination tree
+        """
+        h = numpy.zeros (n, int)
+        for j in range (n):
+            if parent [j] >= 0:
+                h [parent [j]] = max (h [parent [j]], h [j] + 1)
+        return h.max () + 1
+
     def rhs(self, x, b, m):
         """create a right-hand side
         """
@@ -767,6 +799,1437 @@ class CSparseTest3(CSparseTest):
         self.assertEquals(x_norm, prob.norms[3], CSparseTest.DELTA)
 
 
+class CSparseTest4(CSparseTest):
+    """Test array storage of sparse matrices.
+    """
+
+    def assert_storage(self, A):
+        for v, dtype in ((A.p, cs.CS_INT), (A.i, cs.CS_INT), (A.x, cs.CS_FLOAT)):
+            self.assertTrue (isinstance (v, numpy.ndarray))
+            self.assertEquals (dtype, v.dtype)
+            self.assertTrue (v.flags.c_contiguous)
+
+    def test_t1(self):
+        T = cs.cs_load (self.get_file (CSparseTest.T1))
+        self.assert_storage (T)
+        A = cs.cs_compress (T)
+        self.assert_storage (A)
+        AT = cs.cs_transpose (A, True)
+        self.assert_storage (AT)
+        self.assert_storage (cs.cs_multiply (A, AT))
+        self.assert_storage (cs.cs_add (A, AT, 1, 1))
+        self.assertAlmostEquals (11.1, cs.cs_norm (A), delta=1e-3)
+        self.assertAlmostEquals (7.7, cs.cs_norm (AT), delta=1e-3)
+
+    def test_list_input(self):
+        A = cs.cs() # 2-by-3 matrix held in Python lists
+        A.m = 2; A.n = 3; A.nz = -1; A.nzmax = 4
+        A.p = [0, 1, 3, 4]; A.i = [0, 0, 1, 1]; A.x = [1.0, 2.0, 3.0, 4.0]
+        AT = cs.cs_transpose (A, True)
+        self.assert_storage (AT)
+        self.assertEquals ([0, 2, 4], list (AT.p))
+        self.assertEquals ([0, 1, 1, 2], list (AT.i))
+        self.assertEquals ([1.0, 2.0, 3.0, 4.0], list (AT.x))
+        self.assertTrue (cs.cs_sprealloc (A, 8))
+        self.assertTrue (isinstance (A.i, numpy.ndarray))
+        self.assertTrue (isinstance (A.x, numpy.ndarray))
+        self.assertEquals ([0, 0, 1, 1, 0, 0, 0, 0], list (A.i))
+        self.assertEquals (5.0, cs.cs_norm (A))
+
+    def test_factors(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True, True)
+        S = cs.cs_sqr (2, A, False)
+        N = cs.cs_lu (A, S, 1)
+        self.assert_storage (N.L)
+        self.assert_storage (N.U)
+        self.assertTrue (isinstance (N.pinv, numpy.ndarray))
+        S = cs.cs_sqr (3, A, True)
+        self.assertTrue (isinstance (S.leftmost, numpy.ndarray))
+        N = cs.cs_qr (A, S)
+        self.assert_storage (N.L)
+        self.assert_storage (N.U)
+        self.assertTrue (isinstance (N.B, numpy.ndarray))
+        C = cs.cs_add (A, cs.cs_transpose (A, True), 1, 1)
+        S = cs.cs_schol (1, C)
+        for v in (S.pinv, S.parent, S.cp):
+            self.assertTrue (isinstance (v, numpy.ndarray))
+        D = cs.cs_dmperm (A, 0)
+        for v in (D.p, D.q, D.r, D.s):
+            self.assertTrue (isinstance (v, numpy.ndarray))
+
+
+class CSparseTest5(CSparseTest):
+    """Test triplet to compressed-column conversion.
+    """
+
+    def triplet(self):
+        T = cs.cs_spalloc (0, 0, 1, True, True) # 3-by-3 with duplicates
+        for i, j, x in ((2, 0, 1.0), (0, 0, 2.0), (2, 0, 3.0), (1, 2, 4.0),
+                        (0, 2, 5.0), (1, 2, 6.0), (1, 2, 7.0)):
+            cs.cs_entry (T, i, j, x)
+        return T
+
+    def test_compress(self):
+        A = cs.cs_compress (self.triplet ())
+        self.assertEquals ([0, 3, 3, 7], list (A.p))
+        self.assertEquals ([2, 0, 2, 1, 0, 1, 1], list (A.i))
+        self.assertEquals ([1, 2, 3, 4, 5, 6, 7], list (A.x))
+
+    def test_dupl(self):
+        A = cs.cs_compress (self.triplet ())
+        self.assertTrue (cs.cs_dupl (A))
+        self.assertEquals ([0, 2, 2, 4], list (A.p))
+        self.assertEquals ([2, 0, 1, 0], list (A.i))
+        self.assertEquals ([4, 2, 17, 5], list (A.x))
+        self.assertEquals (4, A.nzmax)
+
+    def test_compress_dupl(self):
+        A = cs.cs_compress (self.triplet (), True)
+        self.assertEquals ([0, 2, 2, 4], list (A.p))
+        self.assertEquals ([2, 0, 1, 0], list (A.i))
+        self.assertEquals ([4, 2, 17, 5], list (A.x))
+        A = cs.cs_compress (self.triplet (), True, True)
+        self.assertEquals ([0, 2, 2, 4], list (A.p))
+        self.assertEquals ([0, 2, 0, 1], list (A.i))
+        self.assertEquals ([2, 4, 5, 17], list (A.x))
+
+    def test_bcsstk01(self):
+        T = cs.cs_load (self.get_file (CSparseTest.BCSSTK01))
+        A = cs.cs_compress (T)
+        cs.cs_dupl (A)
+        C = cs.cs_compress (T, True, True)
+        self.assert_dimensions (C, 48, 48, 224, 224, 3.00944e+09, 1e4)
+        for j in range(C.n):
+            col = slice (C.p [j], C.p [j+1])
+            self.assertEquals (sorted (A.i [col]), list (C.i [col]))
+
+
+class CSparseTest6(CSparseTest):
+    """Test loading triplet matrices from files.
+    """
+
+    def write_file(self, text):
+        fd, name = tempfile.mkstemp ()
+        os.write (fd, text)
+        os.close (fd)
+        self.addCleanup (os.remove, name)
+        return name
+
+    def test_t1(self):
+        T = cs.cs_load (self.get_file (CSparseTest.T1))
+        self.assert_dimensions (T, 4, 4, 10, 10)
+        self.assertEquals ([2, 1, 3, 0, 1, 3, 3, 1, 0, 2], list (T.i [:T.nz]))
+        self.assertEquals ([2, 0, 3, 2, 1, 0, 1, 3, 0, 1], list (T.p [:T.nz]))
+        self.assertEquals (3.1, T.x [1])
+
+    def test_chunked(self):
+        fd = self.get_file (CSparseTest.BCSSTK16)
+        T = cs.cs_load (fd)
+        T2 = cs.cs_load (fd, 0, 1000) # parse 1000 lines at a time
+        self.assert_dimensions (T2, 4884, 4884, 262144, 147631)
+        for u, v in ((T.i, T2.i), (T.p, T2.p), (T.x, T2.x)):
+            self.assertTrue ((u [:T.nz] == v [:T2.nz]).all ())
+
+    def test_base(self):
+        name = self.write_file (b"1 1 2.5\n3 2 -1\n")
+        T = cs.cs_load (name, 1)
+        self.assert_dimensions (T, 3, 2, 2, 2)
+        self.assertEquals ([0, 2], list (T.i [:T.nz]))
+        self.assertEquals (None, cs.cs_load (name, 2)) # negative index
+
+    def test_malformed(self):
+        for text in (b"0 0 1\n1 1\n", b"0 0 1\n1 1 2 3\n", b"0 0 x\n",
+                     b"0.5 0 1\n", b"0 0\n1 1 2 3\n"):
+            name = self.write_file (text)
+            self.assertEquals (None, cs.cs_load (name))
+            self.assertEquals (None, cs.cs_load (name, 0, 1))
+
+
+class CSparseTest7(CSparseTest):
+    """Test reading and writing Matrix Market files.
+    """
+
+    def temp_file(self, suffix):
+        fd, name = tempfile.mkstemp (suffix)
+        os.close (fd)
+        self.addCleanup (os.remove, name)
+        return name
+
+    def dense(self, A):
+        D = numpy.zeros ((A.m, A.n))
+        if A.nz < 0:
+            for j in range(A.n):
+                for p in range(A.p [j], A.p [j+1]):
+                    D [A.i [p], j] += A.x [p]
+        else:
+            for p in range(A.nz):
+                D [A.i [p], A.p [p]] += A.x [p]
+        return D
+
+    def test_west0067(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)))
+        for suffix in (".mtx", ".mtx.gz"):
+            name = self.temp_file (suffix)
+            self.assertTrue (cs.cs_mmwrite (name, A, False, 100))
+            T = cs.cs_mmread (name, True, False, 50)
+            self.assert_dimensions (T, 67, 67, 299, 299)
+            self.assertTrue ((self.dense (A) == self.dense (T)).all ())
+            C = cs.cs_mmread (name, False, False, 50)
+            self.assert_dimensions (C, 67, 67, 299, 299, 6.14337)
+            self.assertTrue ((self.dense (A) == self.dense (C)).all ())
+
+    def test_bcsstk01(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)))
+        A = cs.cs_transpose (A, True) # bcsstk01 holds the lower triangle
+        name = self.temp_file (".mtx.gz")
+        self.assertTrue (cs.cs_mmwrite (name, A, True))
+        U = self.dense (A)
+        C = cs.cs_mmread (name, False)
+        self.assert_dimensions (C, 48, 48, 224, 224)
+        self.assertTrue ((U == self.dense (C)).all ())
+        C = cs.cs_mmread (name, False, True, 10)
+        self.assert_dimensions (C, 48, 48, 400, 400, 3.57094807469e+09, 1e4)
+        self.assertTrue ((U + numpy.triu (U, 1).T == self.dense (C)).all ())
+
+    def test_pattern(self):
+        name = self.temp_file (".mtx")
+        with open (name, "wb") as fd:
+            fd.write (b"%%MatrixMarket matrix coordinate pattern skew-symmetric\n"
+                      b"% comment\n3 3 2\n2 1\n3 2\n")
+        T = cs.cs_mmread (name)
+        self.assertEquals (None, T.x)
+        self.assertEquals ([0, 1], list (T.i [:T.nz]))
+        self.assertEquals ([1, 2], list (T.p [:T.nz]))
+        C = cs.cs_mmread (name, False, True)
+        self.assert_dimensions (C, 3, 3, 4, 4)
+        self.assertEquals ([0, 1, 3, 4], list (C.p))
+
+    def test_malformed(self):
+        name = self.temp_file (".mtx")
+        for text in (b"%%MatrixMarket matrix array real general\n1 1\n1.0\n",
+                     b"%%MatrixMarket matrix coordinate complex general\n1 1 1\n1 1 1 0\n",
+                     b"%%MatrixMarket matrix coordinate real general\n2 2 2\n1 1 1\n",
+                     b"%%MatrixMarket matrix coordinate real general\n2 2 1\n3 1 1\n"):
+            with open (name, "wb") as fd:
+                fd.write (text)
+            self.assertEquals (None, cs.cs_mmread (name))
+            self.assertEquals (None, cs.cs_mmread (name, False))
+
+
+class CSparseTest8(CSparseTest):
+    """Test reading Harwell-Boeing and Rutherford-Boeing files.
+    """
+
+    def temp_file(self, suffix, text):
+        fd, name = tempfile.mkstemp (suffix)
+        os.close (fd)
+        self.addCleanup (os.remove, name)
+        with (gzip.open if suffix.endswith (".gz") else open) (name, "wb") as fd:
+            fd.write (text)
+        return name
+
+    def hb(self, A, mxtype, rhs=True):
+        """Harwell-Boeing file of A with formats (8I10) and (1P,4D20.12)
+        """
+        n = A.n ; nz = A.p [n]
+        def card(fmt, per, values):
+            lines = []
+            for k in range(0, len (values), per):
+                lines.append ("".join (fmt % v for v in values [k:k+per]))
+            return lines
+        ptr = card ("%10d", 8, [p + 1 for p in A.p [:n+1]])
+        ind = card ("%10d", 8, [i + 1 for i in A.i [:nz]])
+        val = card ("%20.12E", 4, A.x [:nz])
+        val = [v.replace ("E", "D") for v in val]
+        head = ["%-72s%-8s" % ("Test matrix", "TEST"),
+                "%14d%14d%14d%14d" % (len (ptr + ind + val), len (ptr), len (ind), len (val)),
+                "%-14s%14d%14d%14d%14d" % (mxtype, A.m, n, nz, 0),
+                "%-16s%-16s%-20s" % ("(8I10)", "(8I10)", "(1P,4D20.12)")]
+        if rhs:
+            head [1] += "%14d" % 0
+        return ("\n".join (head + ptr + ind + val) + "\n").encode ("ascii")
+
+    def test_west0067(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True, True)
+        nz = A.p [A.n]
+        for suffix, rhs in ((".rua", True), (".rb.gz", False)):
+            C = cs.cs_hbread (self.temp_file (suffix, self.hb (A, "RUA", rhs)))
+            self.assert_dimensions (C, 67, 67, 294, 294, cs.cs_norm (A), 1e-9)
+            self.assertTrue ((A.p == C.p).all ())
+            self.assertTrue ((A.i [:nz] == C.i).all ())
+            self.assertTrue (numpy.allclose (A.x [:nz], C.x, 1e-12, 0))
+
+    def test_touching_fields(self):
+        text = (b"Touching fields" + b" " * 57 + b"TOUCH   \n"
+                b"             4             1             1             2\n"
+                b"RSA                        3             3             4             0\n"
+                b"(4I1)           (4I1)           (2D10.3)            \n"
+                b"1345\n"
+                b"1323\n"
+                b"-1.000D+00-2.500D-01\n"
+                b" 3.000D+00-4.000D+00\n")
+        C = cs.cs_hbread (self.temp_file (".rsa", text))
+        self.assertEquals ([0, 1, 2, 4], list (C.p)) # upper triangular part
+        self.assertEquals ([0, 1, 0, 2], list (C.i))
+        self.assertEquals ([-1.0, 3.0, -0.25, -4.0], list (C.x))
+
+    def test_symmetric(self):
+        T = cs.cs_spalloc (2, 2, 3, True, True) # lower triangle of [4 1 ; 1 3]
+        cs.cs_entry (T, 0, 0, 4.0)
+        cs.cs_entry (T, 1, 0, 1.0)
+        cs.cs_entry (T, 1, 1, 3.0)
+        A = cs.cs_compress (T)
+        b = numpy.array ([5.0, 4.0])
+        self.assertTrue (cs.cs_cholsol (1, cs.cs_hbread (self.temp_file (".rsa", self.hb (A, "RSA"))), b))
+        self.assertTrue (numpy.allclose ([1.0, 1.0], b))
+        cs.cs_fkeep (A, Dropdiag(), None) # lower triangle of [0 -1 ; 1 0]
+        C = cs.cs_hbread (self.temp_file (".rza", self.hb (A, "RZA")))
+        self.assertEquals ([0, 0, 1], list (C.p))
+        self.assertEquals ([0], list (C.i))
+        self.assertEquals ([-1.0], list (C.x))
+
+    def test_blank_padded(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.T1)), True, True)
+        lines = self.hb (A, "RUA", False).split (b"\n")
+        lines [1] = lines [1].ljust (80) # blank RHSCRD field
+        C = cs.cs_hbread (self.temp_file (".rua", b"\n".join (lines)))
+        self.assert_dimensions (C, 4, 4, 10, 10, cs.cs_norm (A), 1e-9)
+
+    def test_pattern(self):
+        text = (b"Pattern" + b" " * 65 + b"PATTERN \n"
+                b"             2             1             1             0\n"
+                b"PUA                        2             3             3             0\n"
+                b"(4I3)           (4I3)                               \n"
+                b"  1  2  3  4\n"
+                b"  2  1  2\n")
+        C = cs.cs_hbread (self.temp_file (".pua", text))
+        self.assert_dimensions (C, 2, 3, 3, 3)
+        self.assertEquals (None, C.x)
+        self.assertEquals ([1, 0, 1], list (C.i))
+
+    def test_unsupported(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.T1)))
+        for mxtype in ("CUA", "RUE"):
+            self.assertEquals (None, cs.cs_hbread (self.temp_file (".rua", self.hb (A, mxtype))))
+
+
+class CSparseTest9(CSparseTest):
+    """Test saving and memory-mapping matrices and factorizations.
+    """
+
+    def temp_file(self):
+        fd, name = tempfile.mkstemp (".csb")
+        os.close (fd)
+        self.addCleanup (os.remove, name)
+        return name
+
+    def test_t1(self):
+        name = self.temp_file ()
+        T = cs.cs_load (self.get_file (CSparseTest.T1))
+        self.assertTrue (cs.cs_save (name, T))
+        T2 = cs.cs_mmap (name, 'r')
+        self.assert_dimensions (T2, 4, 4, 10, 10)
+        self.assertFalse (T2.x.flags.writeable) # read-only view on the file
+        self.assertFalse (T2.x.flags.owndata)
+        for u, v in ((T.i, T2.i), (T.p, T2.p), (T.x, T2.x)):
+            self.assertTrue ((u [:T.nz] == v).all ())
+        A = cs.cs_compress (T2)
+        self.assert_dimensions (A, 4, 4, 10, 10, 11.1)
+        self.assertFalse (cs.cs_save (name, 1))
+
+    def test_damaged(self):
+        name = self.temp_file ()
+        self.assertTrue (cs.cs_save (name, cs.cs_load (self.get_file (CSparseTest.T1))))
+        with open (name, "rb") as fd:
+            data = fd.read ()
+        size = len (cs.CS_MAGIC) + 8 + struct.unpack ("<Q", data [8:16]) [0]
+        for text in (data [:12], data [:40], data [:size + 8],
+                     data.replace (b"'version'", b"'versiox'"),
+                     data.replace (b"'arrays'", b"'arrayx'"),
+                     data [:16] + b"[" + data [17:]):
+            with open (name, "wb") as fd:
+                fd.write (text)
+            self.assertEquals (None, cs.cs_mmap (name))
+
+    def test_west0067(self):
+        name = self.temp_file ()
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        S = cs.cs_sqr (0, A, False)
+        N = cs.cs_lu (A, S, 1)
+        self.assertTrue (cs.cs_save (name, (A, S, N)))
+        A2, S2, N2 = cs.cs_mmap (name)
+        self.assert_dimensions (A2, 67, 67, 294, 294, cs.cs_norm (A), 1e-12)
+        self.assertEquals (None, S2.q)
+        self.assertTrue (N2.L.x.flags.writeable) # copy-on-write
+        n = A.n
+        b = [1 + float (i) / n for i in range(n)]
+        x = cs.xalloc (n)
+        cs.cs_ipvec (N2.pinv, b, x, n) # x = b(p)
+        cs.cs_lsolve (N2.L, x) # x = L\x
+        cs.cs_usolve (N2.U, x) # x = U\x
+        resid = [-bi for bi in b]
+        cs.cs_gaxpy (A2, x, resid)
+        self.assertTrue (self.norm (resid, n) < 1e-10)
+        self.assertAlmostEquals (21.9478, self.norm (x, n), delta=CSparseTest.DELTA)
+
+    def test_qr(self):
+        name = self.temp_file ()
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        S = cs.cs_sqr (0, A, True)
+        N = cs.cs_qr (A, S)
+        self.assertTrue (cs.cs_save (name, (S, N)))
+        S2, N2 = cs.cs_mmap (name, 'r')
+        self.assertEquals ((S.m2, S.lnz, S.unz), (S2.m2, S2.lnz, S2.unz))
+        for u, v in ((S.parent, S2.parent), (S.leftmost, S2.leftmost),
+                     (S.pinv, S2.pinv), (N.B, N2.B), (N.U.x [:N.U.p [N.U.n]], N2.U.x)):
+            self.assertTrue ((numpy.asarray (u) == v).all ())
+
+
+@unittest.skipIf(sp is None, "scipy is not installed")
+class CSparseTest10(CSparseTest):
+    """Test conversion to and from scipy.sparse matrices.
+    """
+
+    def test_west0067(self):
+        T = cs.cs_load (self.get_file (CSparseTest.WEST0067))
+        A = cs.cs_compress (T, True, True)
+        S = cs.cs_to_scipy (A)
+        self.assertEquals ("csc", S.format)
+        S.check_format ()
+        for u, v in ((A.p, S.indptr), (A.i, S.indices), (A.x, S.data)):
+            self.assertTrue (numpy.may_share_memory (u, v))
+        self.assertAlmostEquals (cs.cs_norm (A), abs (S).sum (axis=0).max (), delta=1e-12)
+        B = cs.cs_from_scipy (S)
+        self.assertTrue (B.p is S.indptr and B.i is S.indices and B.x is S.data)
+        self.assert_dimensions (B, 67, 67, 294, 294, cs.cs_norm (A), 1e-12)
+
+        C = cs.cs_to_scipy (T)
+        self.assertEquals ("coo", C.format)
+        self.assertTrue (numpy.may_share_memory (T.i, C.row))
+        self.assertEquals (0, (C.tocsc () - S).nnz)
+        T2 = cs.cs_from_scipy (C)
+        self.assert_dimensions (T2, 67, 67, 299, 299)
+        self.assertTrue (numpy.may_share_memory (T.x, T2.x))
+
+    def test_convert(self):
+        R = sp.random (40, 30, 0.1, format="csr", random_state=0)
+        A = cs.cs_from_scipy (R)
+        self.assert_dimensions (A, 40, 30, 120, 120)
+        self.assertEquals (0, abs (cs.cs_to_scipy (A) - R).max ())
+        S = sp.csc_matrix (R, dtype=numpy.float32)
+        S.indices = S.indices.astype (numpy.int32)
+        A = cs.cs_from_scipy (S) # indices and values are converted
+        self.assertEquals (cs.CS_INT, A.i.dtype)
+        self.assertEquals (cs.CS_FLOAT, A.x.dtype)
+        x = numpy.arange (30.0)
+        y = numpy.zeros (40)
+        cs.cs_gaxpy (A, x, y)
+        self.assertTrue (numpy.allclose (S.dot (x), y))
+        self.assertEquals (None, cs.cs_from_scipy (sp.eye (2, dtype=complex)))
+        self.assertEquals (None, cs.cs_from_scipy (numpy.eye (2)))
+
+
+class CSparseTest11(CSparseTest):
+    """Test reusable factorizations.
+    """
+
+    def load(self, name):
+        return cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+
+    def resid(self, A, x, b):
+        r = -numpy.asarray (b [:A.m], dtype=float)
+        cs.cs_gaxpy (A, x, r)
+        return self.norm (r, A.m)
+
+    def test_chol(self):
+        A = cs.cs_transpose (self.load (CSparseTest.BCSSTK01), True) # upper part
+        C = self.make_sym (A)
+        F = cs.cs_factor ('chol', 1, A)
+        n = A.n
+        b = numpy.arange (1.0, n + 1)
+        x = b.copy ()
+        self.assertTrue (F.solve (x))
+        self.assertTrue (self.resid (C, x, b) < 1e-6)
+        B = numpy.outer (b, [1.0, 2.0, -1.0])
+        self.assertTrue (F.solve_many (B))
+        self.assertTrue (numpy.allclose (B [:, 1], 2 * x))
+        S = F.S
+        A.x *= 2 # same pattern, new values
+        self.assertTrue (F.refactor (A))
+        self.assertTrue (F.S is S)
+        y = b.copy ()
+        self.assertTrue (F.solve (y))
+        self.assertTrue (numpy.allclose (y, x / 2))
+
+    def test_lu(self):
+        A = self.load (CSparseTest.WEST0067)
+        n = A.n
+        b = numpy.arange (1.0, n + 1)
+        F = cs.cs_factor ('lu', 1, A, 1)
+        x = b.copy ()
+        self.assertTrue (F.solve (x))
+        self.assertTrue (self.resid (A, x, b) < 1e-10)
+        y = b.copy ()
+        self.assertTrue (cs.cs_lusol (1, A, y, 1))
+        self.assertTrue (numpy.allclose (x, y))
+        self.assertEquals (None, cs.cs_factor ('chol', 0, self.load (CSparseTest.ASH219)))
+        self.assertEquals (None, cs.cs_factor ('ldl', 0, A))
+        A.i [0], A.i [1] = A.i [1], A.i [0]
+        self.assertFalse (F.refactor (A)) # pattern has changed
+        self.assertFalse (F.refactor (self.load (CSparseTest.IBM32A)))
+
+    def test_qr(self):
+        A = self.load (CSparseTest.ASH219)
+        m, n = A.m, A.n
+        for M in (A, cs.cs_transpose (A, True)):
+            F = cs.cs_factor ('qr', 3, M)
+            B = numpy.zeros ((max (m, n), 2))
+            B [:M.m, 0] = numpy.arange (1.0, M.m + 1)
+            B [:M.m, 1] = B [:M.m, 0]
+            b = B [:, 0].copy ()
+            self.assertTrue (F.solve_many (B))
+            self.assertTrue (numpy.allclose (B [:, 0], B [:, 1])) # workspace reused
+            x = b.copy ()
+            self.assertTrue (cs.cs_qrsol (3, M, x))
+            self.assertTrue (numpy.allclose (B [:M.n, 0], x [:M.n]))
+        self.assertTrue (self.resid (M, x, b) < 1e-10) # underdetermined
+
+
+class CSparseTest12(CSparseTest):
+    """Test the cache of symbolic analyses.
+    """
+
+    def load(self, name):
+        return cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+
+    def test_lru(self):
+        A = self.load (CSparseTest.WEST0067)
+        B = self.load (CSparseTest.IBM32A)
+        C = cs.css_cache ()
+        S = cs.cs_sqr (1, A, False, C)
+        self.assertTrue (cs.cs_sqr (1, A, False, C) is S)
+        self.assertFalse (cs.cs_sqr (2, A, False, C) is S) # other ordering
+        self.assertFalse (cs.cs_sqr (1, A, True, C) is S)  # QR analysis
+        A.x *= 3 # values are not part of the key
+        self.assertTrue (cs.cs_sqr (1, A, False, C) is S)
+        self.assertEquals ((2, 3), (C.hits, C.misses))
+        self.assertTrue ((S.q == cs.cs_sqr (1, A, False).q).all ())
+        C = cs.css_cache (cs._cs_nbytes (S) + 1) # room for one analysis
+        cs.cs_sqr (1, A, False, C)
+        cs.cs_sqr (1, B, False, C) # evicts A
+        cs.cs_sqr (1, A, False, C)
+        self.assertEquals ((0, 3, 2), (C.hits, C.misses, C.evictions))
+        self.assertEquals (1, len (C.entries))
+
+    def test_disk(self):
+        path = tempfile.mkdtemp ()
+        self.addCleanup (shutil.rmtree, path)
+        A = cs.cs_transpose (self.load (CSparseTest.BCSSTK01), True)
+        C = cs.css_cache (path=path)
+        S = cs.cs_schol (1, A, C)
+        self.assertEquals (1, len (os.listdir (path)))
+        C2 = cs.css_cache (path=path) # another process
+        S2 = cs.cs_schol (1, A, C2)
+        self.assertEquals ((0, 1, 0), (C2.hits, C2.disk_hits, C2.misses))
+        self.assertTrue (cs.cs_schol (1, A, C2) is S2)
+        self.assertEquals (S.lnz, S2.lnz)
+        for u, v in ((S.pinv, S2.pinv), (S.parent, S2.parent), (S.cp, S2.cp)):
+            self.assertTrue ((numpy.asarray (u) == v).all ())
+        F = cs.cs_factor ('chol', 1, A, cache=C2)
+        self.assertTrue (F.S is S2)
+        b = numpy.ones (A.n)
+        self.assertTrue (F.solve (b))
+
+
+class CSparseTest13(CSparseTest):
+    """Test numeric LU refactorization.
+    """
+
+    def solve(self, A, S, N, b):
+        n = A.n
+        x = numpy.zeros (n)
+        y = numpy.zeros (n)
+        cs.cs_ipvec (N.pinv, b, x, n) # x = b(p)
+        cs.cs_lsolve (N.L, x)         # x = L\x
+        cs.cs_usolve (N.U, x)         # x = U\x
+        cs.cs_ipvec (S.q, x, y, n)    # y(q) = x
+        r = -numpy.asarray (b)
+        cs.cs_gaxpy (A, y, r)
+        return self.norm (r, n)
+
+    def test_west0067(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        n = A.n
+        b = numpy.arange (1.0, n + 1)
+        S = cs.cs_sqr (1, A, False)
+        N = cs.cs_lu (A, S, 0.1)
+        A.x = A.x * numpy.linspace (1, 1.01, len (A.x)) # new values
+        N2 = cs.cs_lurefactor (A, S, N, 0.1)
+        self.assertTrue (N2.L.i is N.L.i and N2.U.p is N.U.p) # patterns reused
+        self.assertTrue (self.solve (A, S, N2, b) < 1e-10)
+        for p in range(A.p [S.q [0]], A.p [S.q [0] + 1]):
+            if N.pinv [A.i [p]] == 0: A.x [p] *= 1e-12 # tiny first pivot
+        N4 = cs.cs_lurefactor (A, S, N, 0.1)
+        self.assertFalse (N4.L.i is N.L.i) # new pivot sequence
+        self.assertTrue (self.solve (A, S, N4, b) < 1e-10)
+
+    def test_factor(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.FS_183_1)), True)
+        F = cs.cs_factor ('lu', 1, A, 0.001)
+        L = F.N.L
+        A.x *= 2
+        self.assertTrue (F.refactor (A))
+        self.assertTrue (F.N.L.i is L.i)
+        b = numpy.arange (1.0, A.n + 1)
+        x = b.copy ()
+        self.assertTrue (F.solve (x))
+        r = -b
+        cs.cs_gaxpy (A, x, r)
+        self.assertTrue (self.norm (r, A.n) < 1e-8)
+
+
+class CSparseTest14(CSparseTest):
+    """Test numeric Cholesky refactorization.
+    """
+
+    def test_bcsstk01(self):
+        T = cs.cs_load (self.get_file (CSparseTest.BCSSTK01))
+        A = cs.cs_transpose (cs.cs_compress (T, True), True) # upper part
+        for order in range(2):
+            S = cs.cs_schol (order, A)
+            N = cs.cs_chol (A, S)
+            B = cs.cs_add (A, A, 1.5, 0) # same pattern, new values
+            R = cs.cs_cholrefactor (B, S, N)
+            self.assertTrue (R.L.i is N.L.i and R.rows is N.rows)
+            self.assertTrue (numpy.allclose (numpy.sqrt (1.5) * N.L.x, R.L.x))
+            R2 = cs.cs_cholrefactor (A, S, R) # reuses the row patterns
+            self.assertTrue (R2.rows is N.rows)
+            self.assertTrue (numpy.allclose (N.L.x, R2.L.x, rtol=1e-12))
+            B.x [0] = -1 # not positive definite
+            self.assertEquals (None, cs.cs_cholrefactor (B, S, N))
+
+    def test_factor(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        C = self.make_sym (A)
+        F = cs.cs_factor ('chol', 1, A)
+        L, fronts = F.N.L, F.N.fronts
+        A.x *= 4
+        C.x *= 4
+        self.assertTrue (F.refactor (A))
+        self.assertTrue (fronts is not None and F.N.fronts is fronts) # reused
+        self.assertTrue (F.N.L.i is L.i)
+        b = numpy.ones (A.n)
+        x = b.copy ()
+        self.assertTrue (F.solve (x))
+        r = -b
+        cs.cs_gaxpy (C, x, r)
+        self.assertTrue (self.norm (r, A.n) < 1e-8)
+
+
+class CSparseTest15(CSparseTest):
+    """Test supernodal Cholesky.
+    """
+
+    def test_bcsstk01(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        for order in range(2):
+            S = cs.cs_schol (order, A)
+            N = cs.cs_chol (A, S)
+            N2 = cs.cs_superchol (A, S)
+            self.assertTrue ((N.L.p == N2.L.p).all ())
+            self.assertTrue ((N.L.i == N2.L.i).all ())
+            self.assertTrue (numpy.allclose (N.L.x, N2.L.x, rtol=1e-8))
+        B = cs.cs_add (A, A, -1, 0)
+        self.assertEquals (None, cs.cs_superchol (B, S)) # not positive definite
+
+    def test_refactor(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        for order in range(2):
+            S = cs.cs_schol (order, A)
+            N = cs.cs_superchol (A, S)
+            B = cs.cs_add (A, A, 1.5, 0) # same pattern, new values
+            R = cs.cs_superrefactor (B, S, N)
+            self.assertTrue (R.L.i is N.L.i and R.fronts is N.fronts)
+            self.assertTrue (numpy.allclose (numpy.sqrt (1.5) * N.L.x, R.L.x))
+            R2 = cs.cs_superrefactor (A, S, R)
+            self.assertTrue (numpy.allclose (N.L.x, R2.L.x, rtol=1e-12))
+            B.x *= -1 # not positive definite
+            self.assertEquals (None, cs.cs_superrefactor (B, S, N))
+        self.assertEquals (None, cs.cs_superrefactor (A, S, cs.cs_chol (A, S)))
+
+    def test_bcsstk16(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK16)), True), True)
+        C = self.make_sym (A)
+        S = cs.cs_schol (1, A)
+        self.assertTrue (len (cs._cs_supernodes (S.parent, S.cp, A.n)) < A.n / 4)
+        N = cs.cs_superchol (A, S)
+        self.assertEquals (S.cp [A.n], N.L.p [A.n])
+        n = A.n
+        b = numpy.arange (1.0, n + 1)
+        x = numpy.zeros (n)
+        cs.cs_ipvec (S.pinv, b, x, n) # x = P*b
+        cs.cs_lsolve (N.L, x)         # x = L\x
+        cs.cs_ltsolve (N.L, x)        # x = L'\x
+        y = numpy.zeros (n)
+        cs.cs_pvec (S.pinv, x, y, n)  # y = P'*x
+        r = -b
+        cs.cs_gaxpy (C, y, r)
+        self.assertTrue (self.norm (r, n) < 1e-6 * cs.cs_norm (C) * self.norm (y, n))
+
+
+class CSparseTest16(CSparseTest):
+    """Test multifrontal QR.
+    """
+
+    def solve(self, S, N, A, b):
+        m, n = A.m, A.n
+        x = numpy.zeros (N.L.m)
+        cs.cs_ipvec (N.pinv, b, x, m) # x(0:m-1) = b(p(0:m-1)
+        for k in range(n):            # apply Householder refl. to x
+            cs.cs_happly (N.L, k, N.B [k], x)
+        cs.cs_usolve (N.U, x)         # x = R\x
+        y = numpy.zeros (n)
+        cs.cs_ipvec (S.q, x, y, n)    # y(q(0:n-1)) = x(0:n-1)
+        return y
+
+    def test_ash219(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        b = numpy.arange (1.0, A.m + 1)
+        for order in (0, 3):
+            S = cs.cs_sqr (order, A, True)
+            N = cs.cs_qr (A, S)
+            N2 = cs.cs_superqr (A, S)
+            self.assertEquals (S.unz, N2.U.p [A.n])
+            self.assertEquals (S.m2, N2.L.m)
+            x = self.solve (S, N, A, b)
+            x2 = self.solve (S, N2, A, b)
+            self.assertTrue (numpy.allclose (x, x2, rtol=1e-10))
+            R, R2 = abs (N.U.x [:S.unz]), abs (N2.U.x) # R is unique up to signs
+            self.assertAlmostEquals (R.sum (), R2.sum (), delta=1e-8 * R.sum ())
+
+    def test_west0067(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        b = numpy.arange (1.0, A.m + 1)
+        S = cs.cs_sqr (3, A, True)
+        x = self.solve (S, cs.cs_superqr (A, S), A, b)
+        r = -b
+        cs.cs_gaxpy (A, x, r)
+        self.assertTrue (self.norm (r, A.m) < 1e-10)
+        y = b.copy ()
+        self.assertTrue (cs.cs_qrsol (3, A, y))
+        self.assertTrue (numpy.allclose (x, y))
+
+
+class CSparseTest17(CSparseTest):
+    """Test level-scheduled triangular solves.
+    """
+
+    def test_west0067(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        S = cs.cs_sqr (1, A, False)
+        N = cs.cs_lu (A, S, 1)
+        b = numpy.arange (1.0, A.n + 1)
+        for G, lo, trans, solve in ((N.L, True, False, cs.cs_lsolve),
+                                    (N.L, True, True, cs.cs_ltsolve),
+                                    (N.U, False, False, cs.cs_usolve),
+                                    (N.U, False, True, cs.cs_utsolve)):
+            L = cs.cs_levels (G, lo, trans)
+            self.assertTrue (len (L [1]) < A.n)
+            x, y = b.copy (), b.copy ()
+            self.assertTrue (cs.cs_levelsolve (L, x))
+            solve (G, y)
+            self.assertTrue (numpy.allclose (x, y, rtol=1e-12))
+
+    def test_factor(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        F = cs.cs_factor ('chol', 1, A)
+        x = numpy.ones (A.n)
+        self.assertTrue (F.solve (x))
+        L = F.levels ('L', False)
+        self.assertTrue (F.levels ('L', False) is L) # computed once per factor
+        self.assertEquals (2, len (F.N.levels))
+        y = numpy.ones (A.n)
+        self.assertTrue (F.solve (y))
+        self.assertTrue ((x == y).all ())
+        self.assertTrue (F.refactor (A))
+        self.assertEquals (None, F.N.levels) # new factor, new schedules
+
+
+class CSparseTest18(CSparseTest):
+    """Test solves with multiple right hand sides.
+    """
+
+    def rhs(self, m, k):
+        return numpy.outer (numpy.arange (1.0, m + 1), numpy.arange (1.0, k + 1)) % 7 + 1
+
+    def test_triangular(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        S = cs.cs_sqr (1, A, False)
+        N = cs.cs_lu (A, S, 1)
+        B = self.rhs (A.n, 5)
+        for G, lo, solve in ((N.L, True, cs.cs_lsolve), (N.L, True, cs.cs_ltsolve),
+                             (N.U, False, cs.cs_usolve), (N.U, False, cs.cs_utsolve)):
+            X = B.copy ()
+            self.assertTrue (solve (G, X))
+            trans = solve in (cs.cs_ltsolve, cs.cs_utsolve)
+            Y = B.copy ()
+            self.assertTrue (cs.cs_levelsolve (cs.cs_levels (G, lo, trans), Y))
+            self.assertTrue (numpy.allclose (X, Y, rtol=1e-12))
+            for k in range (B.shape [1]):
+                x = B [:, k].copy ()
+                solve (G, x)
+                self.assertTrue (numpy.allclose (X [:, k], x, rtol=1e-12))
+
+    def test_list_input(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        S = cs.cs_sqr (0, A, True)
+        N = cs.cs_qr (A, S)
+        b = self.rhs (A.n, 2)
+        for G, lo, solve in ((N.L, True, cs.cs_lsolve), (N.L, True, cs.cs_ltsolve),
+                             (N.U, False, cs.cs_usolve), (N.U, False, cs.cs_utsolve)):
+            trans = solve in (cs.cs_ltsolve, cs.cs_utsolve)
+            for B in (b [:, 0], b):
+                x, y = B.copy (), B.tolist ()
+                self.assertTrue (solve (G, x))
+                self.assertTrue (solve (G, y)) # lists are updated in place
+                self.assertTrue (numpy.allclose (x, y, rtol=1e-12))
+                y = B.tolist ()
+                self.assertTrue (cs.cs_levelsolve (cs.cs_levels (G, lo, trans), y))
+                self.assertTrue (numpy.allclose (x, y, rtol=1e-12))
+        x, y = b [:, 0].copy (), b [:, 0].tolist ()
+        self.assertTrue (cs.cs_happly (N.L, 0, N.B [0], x))
+        self.assertTrue (cs.cs_happly (N.L, 0, N.B [0], y))
+        self.assertEquals (list (x), y)
+
+    def test_lusol(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        B = self.rhs (A.n, 4)
+        X = B.copy ()
+        self.assertTrue (cs.cs_lusol (1, A, X, 1))
+        for k in range (B.shape [1]):
+            x = B [:, k].copy ()
+            self.assertTrue (cs.cs_lusol (1, A, x, 1))
+            self.assertTrue (numpy.allclose (X [:, k], x))
+
+    def test_cholsol(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        B = self.rhs (A.n, 3)
+        X = B.copy ()
+        self.assertTrue (cs.cs_cholsol (1, A, X))
+        x = B [:, 2].copy ()
+        self.assertTrue (cs.cs_cholsol (1, A, x))
+        self.assertTrue (numpy.allclose (X [:, 2], x))
+        F = cs.cs_factor ('chol', 1, A)
+        Y = B.copy ()
+        self.assertTrue (F.solve_many (Y))
+        self.assertTrue (numpy.allclose (X, Y))
+        self.assertEquals (['L'], list (F.N.T.keys ())) # L' kept for block solves
+
+    def test_qrsol(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        for M in (A, cs.cs_transpose (A, True)):
+            B = numpy.zeros ((max (A.m, A.n), 3))
+            B [:M.m] = self.rhs (M.m, 3)
+            X = B.copy ()
+            self.assertTrue (cs.cs_qrsol (3, M, X))
+            for k in range (B.shape [1]):
+                x = B [:, k].copy ()
+                self.assertTrue (cs.cs_qrsol (3, M, x))
+                self.assertTrue (numpy.allclose (X [:M.n, k], x [:M.n]))
+        F = cs.cs_factor ('qr', 3, A)
+        self.assertFalse (F.solve_many (numpy.ones (A.m)))
+
+
+class CSparseTest19(CSparseTest):
+    """Test solves with sparse right hand sides.
+    """
+
+    def unit(self, n, rows):
+        T = cs.cs_spalloc (n, len (rows), 1, True, True)
+        for k, i in enumerate (rows):
+            cs.cs_entry (T, i, k, 1.0)
+        return cs.cs_compress (T)
+
+    def check(self, F, n):
+        B = self.unit (n, [0, n // 2, n - 1])
+        X = F.spsolve_many (B)
+        self.assertEquals ((n, 3), (X.m, X.n))
+        for k in range (3):
+            x = numpy.zeros (n)
+            x [B.i [k]] = 1
+            self.assertTrue (F.solve (x))
+            y = numpy.zeros (n)
+            rows = X.i [X.p [k]:X.p [k + 1]]
+            self.assertTrue ((numpy.diff (rows) > 0).all ()) # sorted
+            y [rows] = X.x [X.p [k]:X.p [k + 1]]
+            self.assertTrue (numpy.allclose (x, y, rtol=1e-10, atol=1e-12 * abs (x).max ()))
+        C = F.spsolve (B, 1)
+        self.assertTrue ((C.i == X.i [X.p [1]:X.p [2]]).all ())
+        self.assertEquals (None, F.spsolve (B, 3))
+
+    def test_lu(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        for order in (0, 1):
+            self.check (cs.cs_factor ('lu', order, A), A.n)
+
+    def test_chol(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        for order in (0, 1):
+            self.check (cs.cs_factor ('chol', order, A), A.n)
+
+    def test_qr(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        F = cs.cs_factor ('qr', 3, A)
+        self.assertEquals (None, F.spsolve (self.unit (A.m, [0])))
+
+
+class CSparseTest20(CSparseTest):
+    """Test the selected inverse of a Cholesky factorization.
+    """
+
+    def test_bcsstk01(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        n = A.n
+        X = numpy.eye (n) # inv(A) by full solves
+        self.assertTrue (cs.cs_factor ('chol', 0, A).solve_many (X))
+        for order in (0, 1):
+            S = cs.cs_schol (order, A)
+            for N in (cs.cs_chol (A, S), cs.cs_superchol (A, S)):
+                Z = cs.cs_selinv (N, S)
+                self.assertEquals (2 * N.L.p [n] - n, Z.p [n]) # pattern of L+L'
+                for j in range (n):
+                    rows = Z.i [Z.p [j]:Z.p [j + 1]]
+                    self.assertTrue (j in rows)
+                    self.assertTrue (numpy.allclose (Z.x [Z.p [j]:Z.p [j + 1]], X [rows, j],
+                                                     rtol=1e-10, atol=1e-12 * abs (X).max ()))
+        self.assertEquals (None, cs.cs_selinv (None, S))
+
+
+class CSparseTest21(CSparseTest):
+    """Test solves in block triangular form.
+    """
+
+    def check(self, A):
+        b = numpy.arange (1.0, A.n + 1)
+        x = b.copy ()
+        self.assertTrue (cs.cs_lusol (1, A, x, 1))
+        y = b.copy ()
+        self.assertTrue (cs.cs_btfsol (1, A, y, 1))
+        r = -b
+        cs.cs_gaxpy (A, y, r)
+        self.assertTrue (abs (r).max () < 1e-10 * A.n)
+        self.assertTrue (numpy.allclose (x, y))
+        Y = numpy.outer (b, [1.0, -2.0])
+        self.assertTrue (cs.cs_btfsol (1, A, Y, 1))
+        self.assertTrue (numpy.allclose (Y [:, 1], -2 * y))
+
+    def test_west0067(self):
+        self.check (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True))
+
+    def test_fs_183_1(self):
+        self.check (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.FS_183_1)), True))
+
+    def test_triangular(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True)
+        self.assertEquals (A.n, cs.cs_dmperm (A, 0).nb) # all singletons
+        self.check (A)
+
+    def test_singular(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        A.x [A.p [3]:A.p [4]] = 0 # numerically singular
+        self.assertFalse (cs.cs_btfsol (1, A, numpy.ones (A.n), 1))
+        T = cs.cs_load (self.get_file (CSparseTest.WEST0067))
+        keep = T.p [:T.nz] != 3 # structurally singular, column 3 is empty
+        T.i, T.p, T.x = T.i [:T.nz] [keep], T.p [:T.nz] [keep], T.x [:T.nz] [keep]
+        T.nz = T.nzmax = len (T.i)
+        self.assertFalse (cs.cs_btfsol (1, cs.cs_compress (T), numpy.ones (A.n), 1))
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        self.assertFalse (cs.cs_btfsol (1, A, numpy.ones (A.m), 1))
+
+
+class CSparseTest22(CSparseTest):
+    """Test parallel Cholesky factorization.
+    """
+
+    def test_bcsstk01(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        n = A.n
+        for order in (0, 1):
+            S = cs.cs_schol (order, A)
+            N = cs.cs_superchol (A, S)
+            for nproc in (1, 2, 3):
+                N2 = cs.cs_parchol (A, S, nproc)
+                self.assertTrue ((N.L.p == N2.L.p).all ())
+                self.assertTrue ((N.L.i [:N.L.p [n]] == N2.L.i [:N2.L.p [n]]).all ())
+                self.assertTrue (numpy.allclose (N.L.x, N2.L.x, rtol=1e-12, atol=1e-12 * abs (N.L.x).max ()))
+        A.x *= -1 # not positive definite
+        self.assertEquals (None, cs.cs_parchol (A, S, 2))
+
+    def test_pool(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        S = cs.cs_schol (1, A)
+        N = cs.cs_superchol (A, S)
+        self.assertTrue (cs._cs_pool (2) is cs._cs_pool (2)) # kept between calls
+        P2 = cs._cs_pool (2)
+        cs._cs_pool (3) # a pool of another size leaves P2 running
+        self.assertEquals ([1, 4], P2.map (abs, [-1, 4]))
+        self.assertTrue (cs.cs_pool_close ())
+        self.assertFalse (cs._cs_pool (2) is P2)
+        cs.cs_pool_close ()
+        self.addCleanup (setattr, cs, "CS_AUTO_MIN", cs.CS_AUTO_MIN)
+        cs.CS_AUTO_MIN = 0 # seen by the workers forked below
+        pool = multiprocessing.Pool (2)
+        self.addCleanup (pool.terminate)
+        for k in range (2):
+            N2 = cs.cs_parchol (A, S, 4, pool) # the caller's pool
+            self.assertTrue (numpy.allclose (N.L.x, N2.L.x, rtol=1e-12, atol=1e-12 * abs (N.L.x).max ()))
+        N2 = pool.apply (cs.cs_parchol, (A, S, 2)) # a daemonic worker cannot start a pool
+        self.assertTrue (numpy.allclose (N.L.x, N2.L.x, rtol=1e-12, atol=1e-12 * abs (N.L.x).max ()))
+        self.assertEquals (cs.cs_autoorder ("chol", A, False, 1) [0],
+                           pool.apply (cs.cs_autoorder, ("chol", A, False, 2)) [0])
+
+
+class CSparseTest23(CSparseTest):
+    """Test nested dissection ordering.
+    """
+
+    def test_grid(self):
+        A = self.grid (60)
+        n = A.n
+        P = cs.cs_nd (A)
+        self.assertEquals (list (range (n)), sorted (P))
+        S1, S4 = cs.cs_schol (1, A), cs.cs_schol (4, A)
+        self.assertTrue (S4.lnz < S1.lnz) # less fill than amd
+        self.assertTrue (self.height (S4.parent, n) < self.height (S1.parent, n) / 1.5) # bushier
+        b = numpy.ones (n)
+        self.assertTrue (cs.cs_cholsol (4, A, b))
+        r = -numpy.ones (n)
+        cs.cs_gaxpy (A, b, r)
+        cs.cs_gaxpy (cs.cs_transpose (A, True), b, r)
+        r -= 4 * b # diagonal counted twice
+        self.assertTrue (abs (r).max () < 1e-10)
+
+    def test_sqr(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        x = numpy.ones (A.n)
+        self.assertTrue (cs.cs_lusol (4, A, x, 1))
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        self.assertEquals (None, cs.cs_nd (A))
+        S = cs.cs_sqr (4, A, True)
+        self.assertEquals (list (range (A.n)), sorted (S.q))
+
+
+class CSparseTest24(CSparseTest):
+    """Test column approximate minimum degree ordering.
+    """
+
+    def check(self, name, lu):
+        A = cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+        q = cs.cs_colamd (A)
+        self.assertEquals (list (range (A.n)), sorted (q))
+        S3, S5 = cs.cs_sqr (3, A, True), cs.cs_sqr (5, A, True)
+        self.assertTrue ((S5.q == q).all ())
+        self.assertTrue (S5.lnz + S5.unz <= 1.1 * (S3.lnz + S3.unz)) # comparable to amd(A'A)
+        b = numpy.arange (1.0, max (A.m, A.n) + 1)
+        x = b.copy ()
+        self.assertTrue (cs.cs_qrsol (5, A, x))
+        if lu:
+            y = b.copy ()
+            self.assertTrue (cs.cs_lusol (5, A, y, 1))
+            self.assertTrue (numpy.allclose (x, y))
+
+    def test_ash219(self):
+        self.check (CSparseTest.ASH219, False)
+
+    def test_lp_afiro(self):
+        self.check (CSparseTest.LP_AFIRO, False)
+
+    def test_west0067(self):
+        self.check (CSparseTest.WEST0067, True)
+
+    def banded(self, n, row, col, ncol):
+        """tridiagonal n-by-n matrix with entries in the first 5n/8 columns of
+        a row and the first ncol rows of a column (dense for colamd if more
+        than 10*sqrt(n)); the column is empty if ncol is 0
+        """
+        T = cs.cs_spalloc (n, n, 1, True, True)
+        def entry(i, j, x):
+            if j != col or ncol > 0: cs.cs_entry (T, i, j, x)
+        for i in range (n):
+            entry (i, i, 4.0)
+            if i + 1 < n:
+                entry (i + 1, i, -1.0)
+                entry (i, i + 1, -1.0)
+            if row is not None and i < 5 * n // 8: entry (row, i, 1.0)
+            if i < ncol: entry (i, col, 1.0)
+        return cs.cs_compress (T, True)
+
+    def test_dense(self):
+        n = 400 # rows and columns with more than 200 entries are dense
+        A = self.banded (n, 0, 5, n) # dense row 0 and dense column 5
+        q = cs.cs_colamd (A)
+        self.assertEquals (list (range (n)), sorted (q))
+        self.assertEquals (5, q [n - 1]) # dense column last
+        B = self.banded (n, None, 5, n) # the dense row is ignored
+        self.assertEquals (list (q), list (cs.cs_colamd (B)))
+        D = self.banded (n, None, 5, 0) # column 5 empty, ordered first
+        r = [j for j in cs.cs_colamd (D) if j != 5]
+        self.assertEquals (r, list (q [:n - 1])) # column 5 was left out
+        C = self.banded (n, None, 5, 150) # column 5 is not dense
+        self.assertNotEqual (r, [j for j in cs.cs_colamd (C) if j != 5])
+
+
+class CSparseTest25(CSparseTest):
+    """Test reverse Cuthill-McKee ordering and banded factorization.
+    """
+
+    def path(self, n, lu):
+        """tridiagonal matrix in random order, upper part only unless lu"""
+        p = numpy.random.RandomState (0).permutation (n)
+        T = cs.cs_spalloc (n, n, 1, True, True)
+        for k in range (n):
+            cs.cs_entry (T, p [k], p [k], 4.0)
+            if k + 1 < n:
+                i, j = sorted ((p [k], p [k + 1]))
+                cs.cs_entry (T, i, j, -1.0)
+                if lu: cs.cs_entry (T, j, i, -2.0)
+        return cs.cs_compress (T)
+
+    def test_bandwidth(self):
+        T = cs.cs_spalloc (4, 4, 1, True, True)
+        for i, j in ((0, 0), (1, 1), (2, 2), (3, 3), (0, 2), (3, 1), (1, 0)):
+            cs.cs_entry (T, i, j, 1.0)
+        self.assertEquals ((2, 2, 5), cs.cs_bandwidth (cs.cs_compress (T)))
+
+    def test_rcm(self):
+        A = self.path (100, False)
+        P = cs.cs_rcm (A)
+        self.assertEquals (list (range (100)), sorted (P))
+        C = cs.cs_symperm (A, cs.cs_pinv (P, 100), True)
+        self.assertEquals ((0, 1, 99), cs.cs_bandwidth (C))
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        P = cs.cs_rcm (A)
+        C = cs.cs_permute (A, cs.cs_pinv (P, A.n), P, False)
+        self.assertTrue (max (cs.cs_bandwidth (C) [:2]) < max (cs.cs_bandwidth (A) [:2]))
+
+    def test_chol(self):
+        A = self.path (200, False)
+        F = cs.cs_factor ('chol', 6, A)
+        self.assertEquals (1, F.band)
+        self.assertEquals (1, cs.cs_factor ('chol', 1, A).band) # chosen for amd too
+        b = numpy.arange (1.0, 201)
+        x, y = b.copy (), b.copy ()
+        self.assertTrue (F.solve (x))
+        self.assertTrue (cs.cs_cholsol (1, A, y))
+        self.assertTrue (numpy.allclose (x, y))
+        B = numpy.outer (b, [1.0, -2.0])
+        self.assertTrue (F.solve (B))
+        self.assertTrue (numpy.allclose (B [:, 1], -2 * x))
+        A.x [:A.p [A.n]] *= 2
+        self.assertTrue (F.refactor (A))
+        self.assertTrue (F.solve (b))
+        self.assertTrue (numpy.allclose (b, x / 2))
+        A.x [:A.p [A.n]] *= -1 # not positive definite
+        self.assertFalse (F.refactor (A))
+        self.assertEquals (None, cs.cs_factor ('chol', 6, A))
+
+    def test_lu(self):
+        A = self.path (50, True)
+        F = cs.cs_factor ('lu', 1, A)
+        self.assertEquals (1, F.band)
+        self.assertEquals (None, F.spsolve (A))
+        b = numpy.arange (1.0, A.n + 1)
+        x = b.copy ()
+        self.assertTrue (F.solve (x))
+        r = -b
+        cs.cs_gaxpy (A, x, r)
+        self.assertTrue (abs (r).max () < 1e-10 * abs (x).max ())
+        B = numpy.outer (b, [1.0, 3.0])
+        self.assertTrue (F.solve_many (B))
+        self.assertTrue (numpy.allclose (B [:, 1], 3 * x))
+        A.x [:] = 0 # singular
+        self.assertEquals (None, cs.cs_factor ('lu', 6, A))
+
+    def test_ill_conditioned(self):
+        for w, chol in ((20, False), (10, True)):
+            n = 3 * w
+            i, j = numpy.indices ((n, n))
+            U = numpy.where (i == j, 1.0, numpy.where ((j > i) & (j - i <= w), -1.0, 0.0)) # inv(U) grows as 2^w
+            M = U.T.dot (U) if chol else U
+            T = cs.cs_spalloc (n, n, 1, True, True)
+            for r, c in zip (*numpy.nonzero (numpy.triu (M) if chol else M)):
+                cs.cs_entry (T, r, c, M [r, c])
+            A = cs.cs_compress (T)
+            b = M.dot (numpy.random.RandomState (0).rand (n))
+            x, y = b.copy (), b.copy ()
+            self.assertTrue (cs.cs_bandsolve (cs.cs_bandfactor (A, w, chol), x))
+            self.assertTrue (cs.cs_cholsol (0, A, y) if chol else cs.cs_lusol (0, A, y, 1))
+            resid = lambda z: abs (M.dot (z) - b).max () / (abs (M).sum (1).max () * abs (z).max ())
+            self.assertTrue (resid (x) <= 4 * resid (y)) # as stable as the sparse solve
+
+    def test_sparse_band(self):
+        A = self.grid (30) # bandwidth 30 after RCM, but sparse in the band
+        P = cs.cs_rcm (A)
+        C = cs.cs_symperm (A, cs.cs_pinv (P, A.n), False)
+        self.assertTrue (max (cs.cs_bandwidth (C) [:2]) <= 40)
+        F = cs.cs_factor ('chol', 6, A)
+        self.assertEquals (None, F.band) # dense band larger than L
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        F = cs.cs_factor ('lu', 6, A)
+        self.assertEquals (None, F.band)
+        b = numpy.arange (1.0, A.n + 1)
+        x, y = b.copy (), b.copy ()
+        self.assertTrue (F.solve (x))
+        self.assertTrue (cs.cs_lusol (1, A, y, 1))
+        self.assertTrue (numpy.allclose (x, y))
+
+    def test_wide(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.FS_183_1)), True)
+        F = cs.cs_factor ('lu', 6, A) # bandwidth too large, sparse LU
+        self.assertEquals (None, F.band)
+        b = numpy.ones (A.n)
+        x = b.copy ()
+        self.assertTrue (F.solve (x))
+        r = -b
+        cs.cs_gaxpy (A, x, r)
+        self.assertTrue (abs (r).max () < 1e-8 * abs (x).max ())
+
+
+class CSparseTest26(CSparseTest):
+    """Test automatic ordering selection.
+    """
+
+    def test_chol(self):
+        A = self.grid (30)
+        order, S = cs.cs_autoorder ('chol', A)
+        self.assertEquals (min (cs.cs_schol (k, A).lnz for k in (0, 1, 4, 6)), S.lnz)
+        self.assertEquals (S.lnz, cs.cs_schol (7, A).lnz)
+        b = numpy.ones (A.n)
+        self.assertTrue (cs.cs_cholsol (7, A, b))
+        r = -numpy.ones (A.n)
+        cs.cs_gaxpy (A, b, r)
+        cs.cs_gaxpy (cs.cs_transpose (A, True), b, r)
+        r -= 4 * b # diagonal counted twice
+        self.assertTrue (abs (r).max () < 1e-10)
+
+    def test_qr(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        order, S = cs.cs_autoorder ('qr', A)
+        nnz = [cs.cs_sqr (k, A, True) for k in range (7)]
+        self.assertEquals (min (T.lnz + T.unz for T in nnz if T is not None), S.lnz + S.unz)
+        lim = cs.CS_AUTO_MIN
+        try:
+            cs.CS_AUTO_MIN = 0 # use the worker processes
+            self.assertEquals (order, cs.cs_autoorder ('qr', A, False, 2) [0])
+        finally:
+            cs.CS_AUTO_MIN = lim
+        flops = cs.cs_autoorder ('qr', A, True)
+        self.assertTrue (flops is not None)
+        b = numpy.ones (A.m)
+        self.assertTrue (cs.cs_qrsol (7, A, b))
+
+    def test_lu(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        order, S = cs.cs_autoorder ('lu', A)
+        self.assertTrue (0 <= order <= 6)
+        b = numpy.arange (1.0, A.n + 1)
+        x, y = b.copy (), b.copy ()
+        self.assertTrue (cs.cs_lusol (7, A, x, 1))
+        self.assertTrue (cs.cs_lusol (order, A, y, 1))
+        self.assertTrue (numpy.allclose (x, y))
+        self.assertEquals (None, cs.cs_autoorder ('chol', cs.cs_transpose (
+            cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True), True)))
+
+
+class CSparseTest27(CSparseTest):
+    """Test symbolic analysis reports.
+    """
+
+    def test_chol(self):
+        A = self.grid (20)
+        S, R = cs.cs_analyze ('chol', 1, A)
+        N = cs.cs_chol (A, S)
+        c = numpy.diff (N.L.p)
+        self.assertTrue (R.exact)
+        self.assertEquals (N.L.p [A.n], R.lnz)
+        self.assertEquals (float ((c * c).sum ()), R.flops)
+        self.assertEquals (c.max (), R.maxcol)
+        self.assertEquals (self.height (S.parent, A.n), R.height)
+        self.assertEquals (1, R.roots)
+        self.assertEquals (R.nbytes + R.work, R.peak)
+        self.assertTrue (R.nbytes >= 16 * R.lnz)
+
+    def test_qr(self):
+        for name in (CSparseTest.LP_AFIRO, CSparseTest.WEST0067):
+            A = cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+            S, R = cs.cs_analyze ('qr', 3, A)
+            if A.m < A.n:
+                A = cs.cs_transpose (A, True)
+            N = cs.cs_qr (A, S)
+            self.assertEquals (N.L.p [A.n], R.lnz)
+            self.assertEquals (N.U.p [A.n], R.unz)
+            self.assertTrue (R.flops > 0 and R.work > 0)
+
+    def test_lu(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        S, R = cs.cs_analyze ('lu', 3, A)
+        N = cs.cs_lu (A, S, 1)
+        self.assertFalse (R.exact)
+        self.assertTrue (N.L.p [A.n] <= R.lnz)
+        self.assertTrue (N.U.p [A.n] <= R.unz)
+        self.assertTrue (R.height <= A.n and R.leaves >= 1)
+        B = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.ASH219)), True)
+        self.assertEquals (None, cs.cs_analyze ('lu', 3, B))
+
+
+class CSparseTest28(CSparseTest):
+    """Test sparse matrix times dense vector and block products.
+    """
+
+    def dense(self, A):
+        M = numpy.zeros ((A.m, A.n))
+        for j in range (A.n):
+            for p in range (A.p [j], A.p [j + 1]):
+                M [A.i [p], j] += A.x [p] if A.x is not None else 1
+        return M
+
+    def test_gaxpy(self):
+        for name in (CSparseTest.ASH219, CSparseTest.WEST0067, CSparseTest.LP_AFIRO):
+            A = cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+            M = self.dense (A)
+            x, y = numpy.arange (1.0, A.n + 1), numpy.ones (A.m)
+            self.assertTrue (cs.cs_gaxpy (A, x, y))
+            self.assertTrue (numpy.allclose (y, 1 + M.dot (x)))
+            z = [1.0] * A.m # lists are updated in place
+            self.assertTrue (cs.cs_gaxpy (A, list (x), z))
+            self.assertTrue (numpy.allclose (z, y))
+            X = numpy.outer (x, [1.0, -1.0, 0.5])
+            Y = numpy.zeros ((A.m, 3))
+            self.assertTrue (cs.cs_gaxpy (A, X, Y))
+            self.assertTrue (numpy.allclose (Y, M.dot (X)))
+
+    def test_gatxpy(self):
+        for name in (CSparseTest.ASH219, CSparseTest.IBM32A):
+            A = cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+            M = self.dense (A)
+            x, y = numpy.arange (1.0, A.m + 1), numpy.ones (A.n)
+            self.assertTrue (cs.cs_gatxpy (A, x, y))
+            self.assertTrue (numpy.allclose (y, 1 + M.T.dot (x)))
+            X = numpy.outer (x, [2.0, 1.0])
+            Y = numpy.zeros ((A.n, 2))
+            self.assertTrue (cs.cs_gatxpy (A, X, Y))
+            self.assertTrue (numpy.allclose (Y, M.T.dot (X)))
+        self.assertFalse (cs.cs_gatxpy (None, x, y))
+
+    def test_pattern(self):
+        T = cs.cs_spalloc (3, 4, 1, False, True)
+        for i, j in ((0, 0), (2, 0), (1, 3)): # columns 1 and 2 empty
+            cs.cs_entry (T, i, j, 1.0)
+        A = cs.cs_compress (T)
+        y = numpy.zeros (3)
+        self.assertTrue (cs.cs_gaxpy (A, numpy.arange (1.0, 5), y))
+        self.assertEquals ([1.0, 4.0, 1.0], list (y))
+        y = numpy.zeros (4)
+        self.assertTrue (cs.cs_gatxpy (A, numpy.arange (1.0, 4), y))
+        self.assertEquals ([4.0, 0.0, 0.0, 2.0], list (y))
+
+
+class CSparseTest29(CSparseTest):
+    """Test the fixes to the ported ordering, factorization and matching
+    kernels.
+    """
+
+    def dense(self, A):
+        M = numpy.zeros ((A.m, A.n))
+        for j in range (A.n):
+            for p in range (A.p [j], A.p [j + 1]):
+                M [A.i [p], j] += A.x [p]
+        return M
+
+    def test_amd(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        C = self.make_sym (A)
+        for order in range (1, 4):
+            P = cs.cs_amd (order, C)
+            self.assertEquals (range (C.n), sorted (P [:C.n]))
+        self.assertTrue (cs.cs_schol (1, A).lnz < 0.7 * cs.cs_schol (0, A).lnz)
+
+    def test_amd_dense(self):
+        n = 120 # node 0 has degree 105: dense = int(10*sqrt(120)) = 109
+        T = cs.cs_spalloc (n, n, 1, True, True)
+        for i in range (n):
+            cs.cs_entry (T, i, i, 10.0)
+        for i in range (1, 106):
+            cs.cs_entry (T, 0, i, 1.0)
+        for i in range (106, n): # a clique of the other 14 nodes
+            for j in range (i + 1, n):
+                cs.cs_entry (T, i, j, 1.0)
+        P = list (cs.cs_amd (1, cs.cs_compress (T)))
+        self.assertEquals (range (n), sorted (P [:n]))
+        self.assertEquals (105, P.index (0)) # after its neighbors, not last
+
+    def test_chol(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        C = self.dense (self.make_sym (A))
+        for order in range (2):
+            S = cs.cs_schol (order, A)
+            L = self.dense (cs.cs_chol (A, S).L)
+            p = cs.cs_pinv (S.pinv, A.n) if S.pinv is not None else range (A.n)
+            D = L.dot (L.T) - C [numpy.ix_ (p, p)]
+            self.assertTrue (abs (D).max () < 1e-12 * abs (C).max ())
+
+    def test_counts(self):
+        A = cs.cs_transpose (cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.BCSSTK01)), True), True)
+        parent = cs.cs_etree (A, False)
+        post = cs.cs_post (parent, A.n)
+        c = cs.cs_counts (A, parent, post, False)
+        L = cs.cs_chol (A, cs.cs_schol (0, A)).L
+        self.assertEquals (list (numpy.diff (L.p)), list (c))
+
+    def test_lu(self):
+        A = cs.cs_compress (cs.cs_load (self.get_file (CSparseTest.WEST0067)), True)
+        M = self.dense (A)
+        for order in range (3):
+            S = cs.cs_sqr (order, A, False)
+            N = cs.cs_lu (A, S, 1)
+            q = S.q [:A.n] if S.q is not None else range (A.n)
+            p = cs.cs_pinv (N.pinv, A.n)
+            LU = self.dense (N.L).dot (self.dense (N.U))
+            self.assertTrue (numpy.allclose (LU, M [numpy.ix_ (p, q)]))
+            for j in range (A.n): # no stale entries of xi in L
+                rows = list (N.L.i [N.L.p [j]:N.L.p [j + 1]])
+                self.assertEquals (len (rows), len (set (rows)))
+
+    def test_maxtrans(self):
+        T = cs.cs_spalloc (3, 2, 1, True, True) # zero-free diagonal, m > n
+        for i, j in ((0, 0), (1, 1), (2, 0), (2, 1)):
+            cs.cs_entry (T, i, j, 1.0)
+        self.assertEquals ([0, 1, -1, 0, 1], list (cs.cs_maxtrans (cs.cs_compress (T), 0)))
+        for name, rank in ((CSparseTest.ASH219, 85), (CSparseTest.WEST0067, 67),
+                (CSparseTest.IBM32A, 31)):
+            A = cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+            M = self.dense (A)
+            for seed in (0, -1, 1):
+                jimatch = cs.cs_maxtrans (A, seed)
+                jmatch, imatch = jimatch [:A.m], jimatch [A.m:]
+                self.assertEquals (rank, (jmatch >= 0).sum ())
+                for i in range (A.m):
+                    if jmatch [i] >= 0:
+                        self.assertNotEquals (0, M [i, jmatch [i]])
+                        self.assertEquals (i, imatch [jmatch [i]])
+
+    def test_vcount(self):
+        for name in (CSparseTest.ASH219, CSparseTest.IBM32A):
+            A = cs.cs_compress (cs.cs_load (self.get_file (name)), True)
+            S = cs.cs_sqr (0, A, True)
+            self.assertEquals (range (S.m2), sorted (S.pinv [:S.m2]))
+
+    def test_randperm(self):
+        self.assertEquals (None, cs.cs_randperm (5, 0))
+        self.assertEquals ([4, 3, 2, 1, 0], list (cs.cs_randperm (5, -1)))
+        self.assertEquals (range (50), sorted (cs.cs_randperm (50, 1)))
+
+
 if __name__ == "__main__":
     import sys;sys.argv = ['', 'CSparseTest2.test_bcsstk01']
     unittest.main()